@@ -1,21 +1,57 @@
 import os
-import re
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-import anthropic
-from google.cloud import bigquery
-import pandas as pd
 import config
+import bq_client
+import claude_usage
+import cost_guard
+import generation_cache
+import id_generator
+import result_cache
+import rule_history
+import rule_index
+import schema_catalog
+import sql_fingerprint
+import sql_validator
+import telemetry
+import write_buffer
 
 current_dir = os.path.dirname(os.path.abspath(__file__))
 
-anthropic_key_path = os.path.join(current_dir, config.get_config('anthropic.key.file'))
-with open (anthropic_key_path, 'r') as anthropic_key_file:
-    anthropic_key = anthropic_key_file.read()
+def _read_anthropic_key():
+    anthropic_key_path = os.path.join(current_dir, config.get_config('anthropic.key.file'))
+    with open (anthropic_key_path, 'r') as anthropic_key_file:
+        return anthropic_key_file.read()
 
-bigquery_key_path = os.path.join(current_dir, config.get_config('bigquery.key.file'))
-os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = bigquery_key_path
+def _ensure_table(client, dataset_id, table):
+    from google.cloud import bigquery
+
+    # 테이블 참조 생성
+    table_ref = client.dataset(dataset_id).table(table['id'])
+    try:
+        # 테이블이 존재하는지 확인
+        existing = client.get_table(table_ref)
+        print(f"Table {table['id']} already exists.")
+
+    except Exception:
+        # 테이블이 없으면 생성
+        new_table = bigquery.Table(table_ref, schema=table['schema'])
+        new_table = client.create_table(new_table)
+        print(f"Table {table['id']} created.")
+        return
+
+    # 기존 테이블에 없는 컬럼 추가 (NULLABLE 컬럼만 추가 가능)
+    existing_names = {field.name.lower() for field in existing.schema}
+    missing = [field for field in table['schema'] if field.name.lower() not in existing_names]
+    if missing:
+        existing.schema = list(existing.schema) + missing
+        client.update_table(existing, ["schema"])
+        print(f"Table {table['id']} columns added : {', '.join(field.name for field in missing)}")
 
 def on_app_start():
+    from google.cloud import bigquery
+
     print("Check required table exists...")
     dataset_id = "metatron"
     required_table = [
@@ -61,70 +97,157 @@ def on_app_start():
                 bigquery.SchemaField("applied_yn", "STRING", mode="NULLABLE", description="적용 여부"),
                 bigquery.SchemaField("created_at", "TIMESTAMP", mode="NULLABLE"),
                 bigquery.SchemaField("updated_at", "TIMESTAMP", mode="NULLABLE"),
+                bigquery.SchemaField("fingerprint", "STRING", mode="NULLABLE", description="정규화된 SQL 지문"),
             ]
         },
     ]
 
     # Google Cloud BigQuery 클라이언트 설정
-    client = bigquery.Client(location=config.get_config('bigquery.region'))
-    print('Connected to BigQuery!')
+    client = bq_client.get_client()
 
-    for table in required_table:
-        try:
-            # 테이블 참조 생성
-            table_ref = client.dataset(dataset_id).table(table['id'])
+    # 필수 테이블 존재 여부를 동시에 확인
+    with ThreadPoolExecutor(max_workers=len(required_table)) as executor:
+        futures = [executor.submit(_ensure_table, client, dataset_id, table) for table in required_table]
+        for future in futures:
+            future.result()
 
-            # 테이블이 존재하는지 확인
-            client.get_table(table_ref)
-            print(f"Table {table['id']} already exists.")
+def execute_query_arrow(sql_query, params=None, dry_run_job=None):
+    from google.cloud import bigquery
 
-        except Exception:
-            # 테이블이 없으면 생성
-            new_table = bigquery.Table(table_ref, schema=table['schema'])
-            new_table = client.create_table(new_table)
-            print(f"Table {table['id']} created.")
+    try:
+        # Google Cloud BigQuery 클라이언트 설정
+        client = bq_client.get_client()
 
+        # 참조 테이블이 변경되지 않았으면 캐시된 결과 사용
+        cache = result_cache.get_cache()
+        cache_key, tables = result_cache.lookup_key(client, sql_query, params, dry_run_job)
+        table = cache.get(cache_key) if cache_key else None
 
-    client.close()
+        if table is None:
+            # 쿼리 실행
+            print(f"쿼리 실행 : {sql_query}")
+            job_config = cost_guard.apply_limits(bigquery.QueryJobConfig())
+
+            if params:
+                job_config.query_parameters = params
+
+            query_job = client.query(sql_query, job_config=job_config)
+
+            # Storage Read API를 사용할 수 있으면 컬럼 단위로 바로 읽어옴
+            table = query_job.result().to_arrow(
+                bqstorage_client=bq_client.get_bqstorage_client(),
+                create_bqstorage_client=False,
+            )
+
+            if cache_key:
+                cache.put(cache_key, table, tables)
+        else:
+            print(f"Result cache hit : {sql_query}")
+
+        return table
+
+    except Exception as e:
+        print(f"Error: {e}")
+        return None
+
+def iter_query_pages(sql_query, params=None, page_size=None, max_rows=None, dry_run_job=None):
+    import pyarrow as pa
+    from google.cloud import bigquery
+
+    # BigQuery가 돌려주는 페이지 단위로 Arrow RecordBatch를 바로 넘겨줌
+    if page_size is None:
+        page_size = config.get_config('bigquery.page_size')
+    if max_rows is None:
+        max_rows = config.get_config('bigquery.interactive_max_rows')
 
-def execute_query_and_get_results(sql_query, params=None):
     try:
         # Google Cloud BigQuery 클라이언트 설정
-        client = bigquery.Client(location=config.get_config('bigquery.region'))
+        client = bq_client.get_client()
 
-        print('Connected to BigQuery!')
+        cache = result_cache.get_cache()
+        cache_key, tables = result_cache.lookup_key(client, sql_query, params, dry_run_job)
+        table = cache.get(cache_key) if cache_key else None
+
+        if table is not None:
+            print(f"Result cache hit : {sql_query}")
+            for batch in table.slice(0, max_rows).to_batches(max_chunksize=page_size):
+                yield batch
+            return
 
         # 쿼리 실행
         print(f"쿼리 실행 : {sql_query}")
-        job_config = bigquery.QueryJobConfig()
+        job_config = cost_guard.apply_limits(bigquery.QueryJobConfig())
 
         if params:
             job_config.query_parameters = params
 
         query_job = client.query(sql_query, job_config=job_config)
-        results = query_job.result()
-        
-        # 결과 가져오기
-        columns = [field.name for field in results.schema]
-        rows = [list(row.values()) for row in results]
-        return columns, rows
+        results = query_job.result(page_size=page_size, max_results=max_rows)
+
+        batches = []
+        for batch in results.to_arrow_iterable():
+            batches.append(batch)
+            yield batch
+
+        # 행 제한에 걸리지 않은 전체 결과만 캐시
+        if cache_key and batches and results.total_rows is not None and results.total_rows <= max_rows:
+            cache.put(cache_key, pa.Table.from_batches(batches), tables)
 
     except Exception as e:
         print(f"Error: {e}")
+
+def execute_query_and_get_results(sql_query, params=None):
+    # 기존 (columns, rows) 형태 호환용
+    table = execute_query_arrow(sql_query, params)
+    if table is None:
         return None, None
 
-    finally:
-        client.close()
+    columns = table.column_names
+    rows = [list(row.values()) for row in table.to_pylist()]
+    return columns, rows
+
+SYSTEM_PROMPT = "너는 Google BigQuery 전문가야. 답변은 부연설명 없이 개행문자가 포함되지 않고 정렬된 SQL 형태로 답변해줘. 컬럼명은 항상 영문으로 설정하고, 지시하지 않은 타입 변환이나 치환과 불필요한 distinct, order by 하지마. 만약 질문 자체가 SELECT SQL문이라면, 질문 그대로 정렬된 SQL문으로 응답해줘. Let's think step by step."
+
+REPAIR_PROMPT = "위 SQL을 BigQuery에 실행하기 전에 검증했더니 다음 오류가 있었어. 오류를 수정한 SQL만 같은 형식으로 답변해줘.\n{errors}"
+
+PROMPT_CACHING_BETA = "prompt-caching-2024-07-31"
+
+_anthropic_client = None
+
+def get_anthropic_client():
+    global _anthropic_client
+
+    if _anthropic_client is None:
+        import anthropic
+
+        _anthropic_client = anthropic.Anthropic(
+            api_key=_read_anthropic_key()
+        )
+    return _anthropic_client
 
-def get_sql_query_from_claude(natural_language_query, context=None):
+def build_claude_params(natural_language_query, context=None, examples=None):
+    # 시스템 프롬프트와 데이터셋 스키마는 매 요청 동일하므로 캐시 대상으로 표시
+    system = [
+        {
+            "type": "text",
+            "text": SYSTEM_PROMPT
+        }
+    ]
+    if context:
+        system.append({
+            "type": "text",
+            "text": f"사용 가능한 테이블 스키마:\n{context}"
+        })
 
-    client = anthropic.Anthropic(
-        api_key=anthropic_key
-    )
+    # 유사한 이전 룰은 질문마다 달라지므로 캐시 블록이 아닌 사용자 메시지에 포함
+    question = f"{natural_language_query}"
+    if examples:
+        shots = "\n\n".join(f"질문: {user_question}\nSQL: {result_sql}" for _, user_question, result_sql in examples)
+        question = f"참고할 이전 질문과 SQL:\n{shots}\n\n질문: {natural_language_query}"
 
-    params =  {
+    params = {
         "model": config.get_config('anthropic.model'),
-        "system": "너는 Google BigQuery 전문가야. 답변은 부연설명 없이 개행문자가 포함되지 않고 정렬된 SQL 형태로 답변해줘. 컬럼명은 항상 영문으로 설정하고, 지시하지 않은 타입 변환이나 치환과 불필요한 distinct, order by 하지마. 만약 질문 자체가 SELECT SQL문이라면, 질문 그대로 정렬된 SQL문으로 응답해줘. Let's think step by step.",
+        "system": system,
         "max_tokens": 1024,
         "temperature": 0,
         "messages": [
@@ -133,62 +256,209 @@ def get_sql_query_from_claude(natural_language_query, context=None):
                 "content": [
                     {
                         "type": "text",
-                        "text": f"{natural_language_query}"
+                        "text": question
                     }
                 ]
             }
         ]
     }
+
+    if config.get_config('anthropic.prompt_caching'):
+        system[-1]["cache_control"] = {"type": "ephemeral"}
+        params["extra_headers"] = {"anthropic-beta": PROMPT_CACHING_BETA}
+
+    return params
+
+def _prepare_generation(natural_language_query, context=None, ds_id=None, schema_version=None):
+    model = config.get_config('anthropic.model')
+
+    # 데이터셋에 연결된 테이블 스키마를 프롬프트에 포함
+    if context is None and ds_id is not None:
+        context, schema_version = schema_catalog.get_schema_context(ds_id)
+
+    # 이전 룰 중 유사한 질문을 few-shot 예시로 사용
+    matches = []
+    if ds_id is not None:
+        try:
+            matches = rule_index.search(ds_id, natural_language_query)
+        except Exception as e:
+            print(f"Error: {e}")
+
+    params = build_claude_params(natural_language_query, context, matches)
+    system_prompt = "\n\n".join(block["text"] for block in params["system"])
+
+    cache_key = generation_cache.make_key(natural_language_query, ds_id, schema_version, model, system_prompt)
+    return params, cache_key, matches
+
+def get_sql_query_from_claude(natural_language_query, context=None, ds_id=None, schema_version=None):
+    params, cache_key, matches = _prepare_generation(natural_language_query, context, ds_id, schema_version)
+
+    # 동일 질문/데이터셋/모델/프롬프트 조합이면 캐시된 SQL 반환 (temperature 0)
+    cache = generation_cache.get_cache()
+    cached_sql = cache.get(cache_key)
+    if cached_sql is not None:
+        print(f"Generation cache hit : {cache_key}")
+        return cached_sql
+
+    # 거의 같은 질문으로 저장된 룰이 있으면 Claude 호출 없이 재사용
+    reused_sql = rule_index.reusable_sql(natural_language_query, matches)
+    if reused_sql is not None:
+        print(f"Rule index hit : {matches[0][1]} ({matches[0][0]:.3f})")
+        return reused_sql
+
+    client = get_anthropic_client()
+    print(f"Cluade Params : {params}")
+
+    started = time.perf_counter()
+    try:
+        message = client.messages.create(**params)
+    except Exception as e:
+        # 실패한 호출도 지연 시간/오류 건수에 포함
+        telemetry.record_claude(None, (time.perf_counter() - started) * 1000, ds_id=ds_id, error=str(e))
+        raise
+    telemetry.record_claude(message, (time.perf_counter() - started) * 1000, ds_id=ds_id)
+    claude_usage.record(message.usage)
+
+    sql_query = message.content[0].text
+    cache.put(cache_key, sql_query)
+    return sql_query
+
+def stream_sql_query_from_claude(natural_language_query, context=None, ds_id=None, schema_version=None):
+    # 생성되는 SQL 토큰을 도착하는 대로 반환
+    params, cache_key, matches = _prepare_generation(natural_language_query, context, ds_id, schema_version)
+
+    cache = generation_cache.get_cache()
+    cached_sql = cache.get(cache_key)
+    if cached_sql is not None:
+        print(f"Generation cache hit : {cache_key}")
+        yield cached_sql
+        return
+
+    reused_sql = rule_index.reusable_sql(natural_language_query, matches)
+    if reused_sql is not None:
+        print(f"Rule index hit : {matches[0][1]} ({matches[0][0]:.3f})")
+        yield reused_sql
+        return
+
+    client = get_anthropic_client()
+    print(f"Cluade Params : {params}")
+
+    chunks = []
+    started = time.perf_counter()
+    first_token_ms = None
+    try:
+        with client.messages.stream(**params) as stream:
+            for text in stream.text_stream:
+                if first_token_ms is None:
+                    first_token_ms = (time.perf_counter() - started) * 1000
+                chunks.append(text)
+                yield text
+            message = stream.get_final_message()
+    except Exception as e:
+        telemetry.record_claude(None, (time.perf_counter() - started) * 1000, first_token_ms=first_token_ms, ds_id=ds_id, error=str(e))
+        raise
+
+    telemetry.record_claude(message, (time.perf_counter() - started) * 1000, first_token_ms=first_token_ms, ds_id=ds_id)
+    claude_usage.record(message.usage)
+    cache.put(cache_key, "".join(chunks))
+
+def repair_sql_query_with_claude(natural_language_query, sql_query, errors, context=None, ds_id=None):
+    # 생성한 SQL과 검증 오류를 대화로 이어 붙여 수정 요청 (시스템/스키마 블록은 그대로 캐시 사용)
+    if context is None and ds_id is not None:
+        context, _ = schema_catalog.get_schema_context(ds_id)
+
+    params = build_claude_params(natural_language_query, context)
+    params["messages"] += [
+        {"role": "assistant", "content": [{"type": "text", "text": sql_query}]},
+        {"role": "user", "content": [{"type": "text", "text": REPAIR_PROMPT.format(errors="\n".join(f"- {error}" for error in errors))}]},
+    ]
+
+    client = get_anthropic_client()
     print(f"Cluade Params : {params}")
 
-    message = client.messages.create(**params)
+    started = time.perf_counter()
+    try:
+        message = client.messages.create(**params)
+    except Exception as e:
+        telemetry.record_claude(None, (time.perf_counter() - started) * 1000, ds_id=ds_id, error=str(e))
+        raise
+    telemetry.record_claude(message, (time.perf_counter() - started) * 1000, ds_id=ds_id)
+    claude_usage.record(message.usage)
     return message.content[0].text
 
+def validate_and_repair(natural_language_query, sql_query, ds_id=None, max_attempts=None):
+    # 로컬 검증 오류는 BigQuery 실패 작업/사용자 재질의 대신 Claude에 바로 전달해 정해진 횟수만큼 수정
+    if max_attempts is None:
+        max_attempts = config.get_config('validation.max_repair_attempts')
+
+    started = time.perf_counter()
+    errors = sql_validator.validate(sql_query, ds_id)
+    initial_errors = list(errors)
+    attempts = 0
+    caught = 0
+    while errors:
+        # 로컬에서 걸러낸 잘못된 SQL 1건 = BigQuery 왕복 1회 절약
+        caught += 1
+        print(f"SQL 검증 오류 : {errors}")
+        if attempts >= max_attempts:
+            break
+        attempts += 1
+        try:
+            sql_query = repair_sql_query_with_claude(natural_language_query, sql_query, errors, ds_id=ds_id).strip()
+        except Exception as e:
+            print(f"Error: {e}")
+            break
+        errors = sql_validator.validate(sql_query, ds_id)
+
+    if attempts and not errors:
+        # 같은 질문은 다음부터 수정된 SQL로 응답
+        _, cache_key, _ = _prepare_generation(natural_language_query, ds_id=ds_id)
+        generation_cache.get_cache().put(cache_key, sql_query)
+
+    telemetry.record_validation(initial_errors, errors, attempts, caught, (time.perf_counter() - started) * 1000, ds_id=ds_id)
+    return sql_query, errors, attempts
+
 def save_question(ds_id, user_question, result_sql):
         try:
-            # Google Cloud BigQuery 클라이언트 설정
-            client = bigquery.Client()
             result_sql = result_sql.replace("\n", " ")
             current_time = datetime.utcnow()
-            
-            result_table_name = ''
+
+            # 공백/별칭 대소문자/조건 순서만 다른 SQL은 같은 지문
+            fingerprint = sql_fingerprint.fingerprint(result_sql)
+            if rule_history.latest_fingerprint(ds_id) == fingerprint:
+                print(f"동일한 룰이 이미 적용되어 있습니다 : {fingerprint}")
+                return
 
             # Check if result_sql is a CTAS statement and extract the table name
-            pattern = r'^\s*CREATE\s+(OR\s+REPLACE\s+)?TABLE\s+(\S+)\s+AS\s+SELECT'
-            ctas_match = re.match(pattern, result_sql, re.IGNORECASE)
-            if ctas_match:
-                result_table_name = ctas_match.group(2)
+            result_table_name = sql_fingerprint.ctas_target(result_sql) or ''
+            if result_table_name:
+                # CTAS 대상 테이블을 참조하는 캐시된 결과 무효화
+                result_cache.get_cache().invalidate_table(result_table_name)
             print(f"result_table_name: {result_table_name}")
             
             # Get rule id
-            query = """
-                SELECT COALESCE(MAX(rule_id), 0) + 1 AS next_rule_id
-                FROM `metatron.rule`
-            """
-            query_job = client.query(query)
-            next_rule_id = [row.next_rule_id for row in query_job.result()][0]
-
-            df = pd.DataFrame({
-                "rule_id": [next_rule_id],
-                "ds_id": [ds_id],
-                "user_question": [user_question],
-                "result_sql": [result_sql],
-                "result_table_name": [result_table_name],
-                "applied_yn": ['Y'],
-                "created_at": [current_time],
-                "updated_at": [current_time]
-            })
-            
-            table_ref = client.dataset("metatron").table("rule")
-            table = client.get_table(table_ref)
-            # 데이터프레임을 테이블에 삽입
-            client.load_table_from_dataframe(df, table)
+            next_rule_id = id_generator.next_id()
+
+            row = {
+                "rule_id": next_rule_id,
+                "ds_id": ds_id,
+                "user_question": user_question,
+                "result_sql": result_sql,
+                "result_table_name": result_table_name,
+                "applied_yn": 'Y',
+                "created_at": current_time,
+                "updated_at": current_time,
+                "fingerprint": fingerprint
+            }
+
+            # 쓰기 버퍼에 적재 후 바로 반환 (BigQuery 반영은 백그라운드에서 일괄 처리)
+            write_buffer.enqueue("rule", row)
+            rule_history.append(ds_id, next_rule_id, user_question, result_sql, fingerprint, current_time)
 
             if result_table_name:
                 print(f"결과 CTAS TABLE : {result_table_name}")
+            # 관리 테이블은 미리보기/데이터플로우에서 필요할 때 생성 (대화마다 바뀌는 룰을 매번 스캔하지 않음)
 
         except Exception as e:
             print(f"Error: {e}")
-            return None, None
-        finally:
-            client.close()
\ No newline at end of file
+            return None, None
\ No newline at end of file
@@ -0,0 +1,210 @@
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+import config
+
+DATASET_ID = "metatron"
+
+OK = "ok"
+ERROR = "error"
+
+
+class TokenBucket:
+    # 초당 rate개씩 채워지는 토큰 버킷 (최대 capacity개까지 연속 요청 허용)
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens=1):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+def read_questions(path, question_field, default_ds_id):
+    questions = []
+    with open(path, encoding="utf-8") as input_file:
+        for line_no, line in enumerate(input_file, 1):
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            ds_id = record.get("ds_id", default_ds_id)
+            if ds_id is None:
+                raise ValueError(f"{path}:{line_no} ds_id가 없습니다. --ds-id를 지정해 주세요.")
+            questions.append({
+                "id": str(record.get("id", line_no)),
+                "ds_id": int(ds_id),
+                "question": record[question_field],
+            })
+    return questions
+
+
+def read_completed(path):
+    # 이미 성공한 질문은 다시 생성하지 않음 (중단 후 재실행)
+    completed = {}
+    if not os.path.exists(path):
+        return completed
+    with open(path, encoding="utf-8") as output_file:
+        for line in output_file:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # 중단 시 마지막 줄이 잘려 있을 수 있음
+                continue
+            if record.get("status") == OK:
+                completed[record["id"]] = record
+    return completed
+
+
+def generate_one(item, bucket, dry_run):
+    import backend as be
+    import cost_guard
+
+    record = dict(item)
+    started = time.perf_counter()
+    try:
+        bucket.acquire()
+        sql_query = be.get_sql_query_from_claude(item["question"], ds_id=item["ds_id"]).strip()
+        record["result_sql"] = sql_query
+        record["status"] = OK
+
+        if dry_run:
+            estimate = cost_guard.estimate_query(sql_query)
+            record["bytes_processed"] = estimate["bytes_processed"]
+            record["referenced_tables"] = estimate["referenced_tables"]
+            if estimate["error"]:
+                record["status"] = ERROR
+                record["error"] = estimate["error"]
+    except Exception as e:
+        print(f"Error: {e}")
+        record["status"] = ERROR
+        record["error"] = str(e)
+
+    record["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    return record
+
+
+def generate(questions, output_path, max_workers, bucket, dry_run):
+    completed = read_completed(output_path)
+    pending = [item for item in questions if item["id"] not in completed]
+    print(f"전체 {len(questions)}건 / 완료 {len(questions) - len(pending)}건 / 생성 대상 {len(pending)}건")
+
+    write_lock = threading.Lock()
+    with open(output_path, "a", encoding="utf-8") as output_file:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(generate_one, item, bucket, dry_run) for item in pending]
+            for done, future in enumerate(as_completed(futures), 1):
+                record = future.result()
+                # 한 건씩 바로 기록해 중단되어도 완료분은 유지
+                with write_lock:
+                    output_file.write(json.dumps(record, ensure_ascii=False) + "\n")
+                    output_file.flush()
+                if record["status"] == OK:
+                    completed[record["id"]] = record
+                print(f"[{done}/{len(pending)}] {record['id']} {record['status']}")
+
+    return [completed[item["id"]] for item in questions if item["id"] in completed]
+
+
+def to_rule_row(record, current_time):
+    import id_generator
+    import materializer
+    import sql_fingerprint
+
+    result_sql = record["result_sql"].replace("\n", " ")
+    return {
+        "rule_id": id_generator.next_id(),
+        "ds_id": record["ds_id"],
+        "user_question": record["question"],
+        "result_sql": result_sql,
+        "result_table_name": materializer.ctas_target(result_sql) or '',
+        "applied_yn": 'Y',
+        "created_at": current_time,
+        "updated_at": current_time,
+        "fingerprint": sql_fingerprint.fingerprint(result_sql),
+    }
+
+
+def load_rules(records, output_path):
+    # 성공한 결과를 metatron.rule에 한 번의 로드 작업으로 적재 (적재한 id는 별도 파일에 기록)
+    from google.cloud import bigquery
+    import bq_client
+
+    loaded_path = f"{output_path}.loaded"
+    loaded = set()
+    if os.path.exists(loaded_path):
+        with open(loaded_path, encoding="utf-8") as loaded_file:
+            loaded = {line.strip() for line in loaded_file if line.strip()}
+
+    records = [record for record in records if record["id"] not in loaded]
+    if not records:
+        print("적재할 룰이 없습니다.")
+        return 0
+
+    current_time = datetime.utcnow().isoformat()
+    rows = [to_rule_row(record, current_time) for record in records]
+
+    client = bq_client.get_client()
+    table = client.get_table(f"{DATASET_ID}.rule")
+    # 앱 시작 전(컬럼 추가 전) 테이블이면 없는 컬럼은 제외하고 적재
+    columns = {field.name for field in table.schema}
+    rows = [{key: value for key, value in row.items() if key in columns} for row in rows]
+    job_config = bigquery.LoadJobConfig(
+        schema=table.schema,
+        source_format=bigquery.SourceFormat.NEWLINE_DELIMITED_JSON,
+        write_disposition=bigquery.WriteDisposition.WRITE_APPEND,
+    )
+    print(f"룰 적재 : {len(rows)}건")
+    client.load_table_from_json(rows, table, job_config=job_config).result()
+
+    with open(loaded_path, "a", encoding="utf-8") as loaded_file:
+        for record in records:
+            loaded_file.write(f"{record['id']}\n")
+    return len(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="JSONL 질문 파일로 SQL 룰 일괄 생성")
+    parser.add_argument("input", help="질문 JSONL 파일 (한 줄에 {\"id\", \"ds_id\", \"question\"})")
+    parser.add_argument("--output", default=None, help="결과 JSONL 파일 (기본값: <input>.out.jsonl)")
+    parser.add_argument("--ds-id", type=int, default=None, help="ds_id가 없는 질문에 사용할 데이터셋 ID")
+    parser.add_argument("--question-field", default="question")
+    parser.add_argument("--max-workers", type=int, default=config.get_config('batch.max_workers'))
+    parser.add_argument("--requests-per-minute", type=float, default=config.get_config('batch.requests_per_minute'))
+    parser.add_argument("--burst", type=int, default=config.get_config('batch.burst'))
+    parser.add_argument("--dry-run", action="store_true", help="생성된 SQL을 dry run으로 검증")
+    parser.add_argument("--load-rules", action="store_true", help="성공한 결과를 metatron.rule에 적재")
+    args = parser.parse_args()
+
+    output_path = args.output or f"{os.path.splitext(args.input)[0]}.out.jsonl"
+    questions = read_questions(args.input, args.question_field, args.ds_id)
+    bucket = TokenBucket(args.requests_per_minute / 60, args.burst)
+
+    records = generate(questions, output_path, args.max_workers, bucket, args.dry_run)
+    print(f"성공 {len(records)}건 / 실패 {len(questions) - len(records)}건 -> {output_path}")
+
+    if args.load_rules:
+        load_rules(records, output_path)
+
+    sys.exit(0 if len(records) == len(questions) else 1)
+
+
+if __name__ == "__main__":
+    main()
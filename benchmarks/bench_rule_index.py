@@ -0,0 +1,81 @@
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+os.chdir(ROOT_DIR)
+
+from bench_startup import summarize
+
+SUBJECTS = ["이벤트", "사용자", "주문", "상품", "결제", "세션", "페이지", "캠페인", "지역", "기기"]
+METRICS = ["건수", "합계", "평균", "최대값", "최소값", "비율", "순위", "중앙값"]
+GROUPS = ["일별", "주별", "월별", "국가별", "채널별", "연령대별", "성별", "카테고리별"]
+FILTERS = ["최근 7일", "지난달", "올해", "신규 가입자", "구매 고객", "모바일", "VIP 고객", "이탈 고객"]
+
+
+def make_question(rng):
+    return f"{rng.choice(FILTERS)} {rng.choice(SUBJECTS)} {rng.choice(GROUPS)} {rng.choice(METRICS)} 상위 {rng.randint(1, 100)}개"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="rule_index 색인 생성 / 검색 시간 측정 (가상 룰 사용)")
+    parser.add_argument("--rules", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--max-search-ms", type=float, default=None)
+    parser.add_argument("--output", default=None, help="결과 JSON 파일 경로")
+    args = parser.parse_args()
+
+    import rule_index
+
+    rng = random.Random(0)
+    rules = [(f"{i:016x}", make_question(rng), f"SELECT {i} AS rule_id") for i in range(args.rules)]
+
+    index = rule_index.RuleIndex()
+    started = time.perf_counter()
+    index.add_many(rules)
+    build_ms = (time.perf_counter() - started) * 1000
+
+    # 새 룰 1건 추가 (save_question 이후 증분 갱신)
+    add_samples = []
+    for i in range(args.queries):
+        started = time.perf_counter()
+        index.add(f"new-{i}", make_question(rng), "SELECT 1")
+        add_samples.append((time.perf_counter() - started) * 1000)
+
+    search_samples = []
+    for _ in range(args.queries):
+        question = make_question(rng)
+        started = time.perf_counter()
+        index.search(question, args.top_k)
+        search_samples.append((time.perf_counter() - started) * 1000)
+
+    search = summarize(search_samples)
+    search["p95_ms"] = sorted(search_samples)[int(len(search_samples) * 0.95) - 1]
+    result = {
+        "rules": args.rules,
+        "terms": len(index.vocab),
+        "build_ms": build_ms,
+        "add": summarize(add_samples),
+        "search": search,
+    }
+
+    output = json.dumps(result, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as output_file:
+            output_file.write(output)
+
+    # 기준치를 넘으면 실패 코드로 종료
+    failed = args.max_search_ms is not None and result["search"]["p95_ms"] > args.max_search_ms
+    if failed:
+        print(f"검색 시간 기준 초과: {result['search']['p95_ms']:.1f}ms > {args.max_search_ms}ms")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
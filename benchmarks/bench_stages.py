@@ -0,0 +1,230 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+os.chdir(ROOT_DIR)
+
+import config
+from bench_startup import summarize
+from fakes import FakeAnthropicClient, FakeBigQueryClient
+
+EVENT_NAMES = ["app_open", "login", "search", "view_item", "add_to_cart", "purchase", "logout"]
+
+WRANGLED_SQLS = [
+    "SELECT user_id, event_name, event_value FROM metatron.events WHERE event_value > 10",
+    "SELECT event_name, COUNT(*) AS event_count, SUM(event_value) AS total_value FROM metatron.dataset_2 GROUP BY event_name",
+    "SELECT event_name, total_value FROM metatron.dataset_3 WHERE event_count > 100",
+]
+
+
+def configure(work_dir):
+    # 캐시/스풀 파일은 임시 디렉터리에 생성
+    settings = config.load_config()
+    settings["cache"]["dir"] = os.path.join(work_dir, "cache")
+    settings["write_buffer"]["spool_dir"] = os.path.join(work_dir, "spool")
+    settings["result_store"]["spill_dir"] = work_dir
+    settings["local_preview"]["dir"] = os.path.join(work_dir, "local_preview")
+
+
+def responder(params):
+    # 질문과 상관없이 이벤트 집계 SQL 생성
+    return "SELECT event_name, COUNT(*) AS event_count FROM metatron.events GROUP BY event_name"
+
+
+def seed(client, rows):
+    import pandas as pd
+    import backend as be
+
+    be.on_app_start()
+
+    now = datetime.now(timezone.utc)
+    client.load_table_from_dataframe(pd.DataFrame({
+        "user_id": [i % 1000 for i in range(rows)],
+        "event_name": [EVENT_NAMES[i % len(EVENT_NAMES)] for i in range(rows)],
+        "event_value": [float(i % 100) for i in range(rows)],
+    }), "metatron.events")
+
+    datasets = [{"ds_id": 1, "ds_name": "events", "ds_type": "Imported", "table_name": "events", "created_at": now, "updated_at": now}]
+    rules = []
+    for offset, sql_query in enumerate(WRANGLED_SQLS):
+        ds_id = offset + 2
+        updated_at = now + timedelta(seconds=ds_id)
+        datasets.append({"ds_id": ds_id, "ds_name": f"wrangled_{ds_id}", "ds_type": "Wrangled", "table_name": None, "created_at": updated_at, "updated_at": updated_at})
+        rules.append({"rule_id": ds_id, "ds_id": ds_id, "user_question": f"질문 {ds_id}", "result_sql": sql_query, "result_table_name": "", "applied_yn": "Y", "created_at": updated_at, "updated_at": updated_at})
+
+    client.insert_rows_json("metatron.dataset", datasets)
+    client.insert_rows_json("metatron.rule", rules)
+    client.insert_rows_json("metatron.dataflow", [{"df_id": 1, "df_name": "events_flow", "desc": "benchmark", "created_at": now, "updated_at": now}])
+    client.insert_rows_json("metatron.dataset_dataflow", [
+        {"id": dataset["ds_id"], "ds_id": dataset["ds_id"], "df_id": 1, "created_at": now, "updated_at": now} for dataset in datasets
+    ])
+
+
+def measure(client, runs, run, setup=None, warm=False):
+    # setup은 측정에서 제외하고, 실행 1회당 BigQuery 호출 수도 함께 기록
+    if warm:
+        # 캐시 적중 단계는 한 번 실행해 캐시를 채운 뒤 측정
+        with contextlib.redirect_stdout(io.StringIO()):
+            run(-1)
+
+    samples = []
+    calls = {}
+    for i in range(runs):
+        if setup:
+            setup(i)
+        before = dict(client.calls)
+        with contextlib.redirect_stdout(io.StringIO()):
+            started = time.perf_counter()
+            run(i)
+            samples.append((time.perf_counter() - started) * 1000)
+        calls = {name: count - before.get(name, 0) for name, count in client.calls.items() if count != before.get(name, 0)}
+
+    result = summarize(samples)
+    result["bq_calls"] = calls
+    return result
+
+
+def first_chunk(chunks):
+    for chunk in chunks:
+        return chunk
+    return None
+
+
+def build_stages(client):
+    import backend as be
+    import cost_guard
+    import dataflow_dag
+    import dataset_detail
+    import list_loader
+    import result_cache
+    import rule_history
+    import schema_catalog
+
+    sql_query = responder(None)
+
+    def clear_result_cache(i):
+        result_cache.get_cache().clear()
+
+    def consume_pages(i):
+        for _ in be.iter_query_pages(sql_query):
+            pass
+
+    return [
+        # backend.py
+        ("on_app_start", lambda i: be.on_app_start(), None),
+        ("schema_context_cold", lambda i: schema_catalog.SchemaCatalog().render(2, client=client), None),
+        ("schema_context_warm", lambda i: schema_catalog.get_schema_context(2), None, True),
+        ("claude_generate", lambda i: be.get_sql_query_from_claude(f"이벤트별 건수 {i}", ds_id=2), None),
+        ("claude_generate_cached", lambda i: be.get_sql_query_from_claude("이벤트별 건수", ds_id=2), None, True),
+        ("claude_stream_first_token", lambda i: first_chunk(be.stream_sql_query_from_claude(f"이벤트별 합계 {i}", ds_id=2)), None),
+        ("cost_estimate", lambda i: cost_guard.estimate_query(sql_query), None),
+        ("execute_query_arrow", lambda i: be.execute_query_arrow(sql_query), clear_result_cache),
+        ("execute_query_arrow_cached", lambda i: be.execute_query_arrow(sql_query), None, True),
+        ("iter_query_pages_first_page", lambda i: first_chunk(be.iter_query_pages(sql_query)), clear_result_cache),
+        ("iter_query_pages_all", consume_pages, clear_result_cache),
+        ("save_question", lambda i: be.save_question(2, f"저장 질문 {i}", sql_query), None),
+        # 페이지 로더
+        ("dataset_list_page", lambda i: list_loader.load_dataset_page(), None),
+        ("dataflow_list_page", lambda i: list_loader.load_dataflow_page(), None),
+        ("rule_history_cold", lambda i: rule_history.load(2), lambda i: rule_history.invalidate()),
+        ("rule_history_warm", lambda i: rule_history.load(2), None, True),
+        ("dataflow_dag_load", lambda i: dataflow_dag.load_dag(1), None),
+        ("dataflow_dag_execute", lambda i: dataflow_dag.load_dag(1).execute(), None),
+        ("dataset_detail_imported", lambda i: dataset_detail.load_detail(1, "Imported", "events"), lambda i: dataset_detail.invalidate_usage()),
+        ("dataset_detail_wrangled", lambda i: dataset_detail.load_detail(2, "Wrangled", None), lambda i: dataset_detail.invalidate_usage()),
+    ]
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=ROOT_DIR, text=True, stderr=subprocess.DEVNULL).strip()
+    except Exception:
+        return None
+
+
+def compare(result, baseline, max_regression):
+    # 기준 결과보다 median이 max_regression 비율 이상 느려진 단계 목록
+    regressions = []
+    for name, stage in result["stages"].items():
+        base = baseline.get("stages", {}).get(name)
+        if base and stage["median_ms"] > base["median_ms"] * (1 + max_regression):
+            regressions.append((name, base["median_ms"], stage["median_ms"]))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="backend.py 단계별 / 페이지 로더 시간 측정 (BigQuery, Anthropic 대역 사용)")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--rows", type=int, default=50000, help="events 테이블 행 수")
+    parser.add_argument("--query-latency", type=float, default=0.05, help="BigQuery 작업 1회 지연(초)")
+    parser.add_argument("--table-latency", type=float, default=0.02, help="get_table/list_rows 1회 지연(초)")
+    parser.add_argument("--claude-latency", type=float, default=0.5, help="Claude 첫 토큰까지 지연(초)")
+    parser.add_argument("--token-latency", type=float, default=0.005, help="Claude 출력 토큰당 지연(초)")
+    parser.add_argument("--stage", action="append", default=None, help="측정할 단계 (여러 번 지정 가능)")
+    parser.add_argument("--output", default=None, help="결과 JSON 파일 경로")
+    parser.add_argument("--baseline", default=None, help="비교할 이전 결과 JSON 파일")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="기준 대비 허용 지연 비율")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="text2sql-bench-") as work_dir:
+        configure(work_dir)
+
+        import backend as be
+        import bq_client
+
+        client = FakeBigQueryClient(latency=args.table_latency, query_latency=args.query_latency)
+        bq_client.get_client = lambda: client
+        bq_client.get_bqstorage_client = lambda: None
+        be._anthropic_client = FakeAnthropicClient(responder, latency=args.claude_latency, token_latency=args.token_latency)
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            seed(client, args.rows)
+
+        stages = {}
+        for name, run, setup, *warm in build_stages(client):
+            if args.stage and name not in args.stage:
+                continue
+            stages[name] = measure(client, args.runs, run, setup, bool(warm))
+
+    result = {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "git_commit": git_commit(),
+        "settings": {
+            "runs": args.runs,
+            "rows": args.rows,
+            "query_latency_ms": args.query_latency * 1000,
+            "table_latency_ms": args.table_latency * 1000,
+            "claude_latency_ms": args.claude_latency * 1000,
+            "token_latency_ms": args.token_latency * 1000,
+        },
+        "stages": stages,
+    }
+
+    output = json.dumps(result, indent=2, ensure_ascii=False)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as output_file:
+            output_file.write(output)
+
+    # 기준 결과 대비 느려진 단계가 있으면 실패 코드로 종료
+    failed = False
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+        for name, base_ms, current_ms in compare(result, baseline, args.max_regression):
+            print(f"{name} 기준 초과: {current_ms:.1f}ms > {base_ms:.1f}ms")
+            failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
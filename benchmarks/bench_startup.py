@@ -0,0 +1,87 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+os.chdir(ROOT_DIR)
+
+from fakes import FakeBigQueryClient
+
+IMPORT_SNIPPET = "import time; started = time.perf_counter(); import backend; print(time.perf_counter() - started)"
+
+
+def measure_import(runs):
+    # 새 프로세스에서 backend import 시간 측정
+    samples = []
+    for _ in range(runs):
+        output = subprocess.check_output([sys.executable, "-c", IMPORT_SNIPPET], cwd=ROOT_DIR, text=True)
+        samples.append(float(output.strip().splitlines()[-1]) * 1000)
+    return samples
+
+
+def measure_startup(runs, latency):
+    import backend
+    import bq_client
+
+    client = FakeBigQueryClient(latency=latency)
+    original_get_client = bq_client.get_client
+    bq_client.get_client = lambda: client
+    try:
+        samples = []
+        for _ in range(runs):
+            started = time.perf_counter()
+            backend.on_app_start()
+            samples.append((time.perf_counter() - started) * 1000)
+        return samples
+    finally:
+        bq_client.get_client = original_get_client
+
+
+def summarize(samples):
+    return {
+        "runs": len(samples),
+        "median_ms": statistics.median(samples),
+        "min_ms": min(samples),
+        "max_ms": max(samples),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="backend import / on_app_start 시간 측정")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--table-latency", type=float, default=0.2, help="get_table 1회 지연(초)")
+    parser.add_argument("--max-import-ms", type=float, default=None)
+    parser.add_argument("--max-startup-ms", type=float, default=None)
+    parser.add_argument("--output", default=None, help="결과 JSON 파일 경로")
+    args = parser.parse_args()
+
+    result = {
+        "import_backend": summarize(measure_import(args.runs)),
+        "on_app_start": summarize(measure_startup(args.runs, args.table_latency)),
+        "table_latency_ms": args.table_latency * 1000,
+    }
+
+    output = json.dumps(result, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as output_file:
+            output_file.write(output)
+
+    # 기준치를 넘으면 실패 코드로 종료
+    failed = False
+    if args.max_import_ms is not None and result["import_backend"]["median_ms"] > args.max_import_ms:
+        print(f"import 시간 기준 초과: {result['import_backend']['median_ms']:.1f}ms > {args.max_import_ms}ms")
+        failed = True
+    if args.max_startup_ms is not None and result["on_app_start"]["median_ms"] > args.max_startup_ms:
+        print(f"startup 시간 기준 초과: {result['on_app_start']['median_ms']:.1f}ms > {args.max_startup_ms}ms")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
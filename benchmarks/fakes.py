@@ -0,0 +1,584 @@
+import re
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import date, datetime, timezone
+
+DATASET_ID = "metatron"
+
+# BigQuery 타입 -> SQLite 타입
+SQLITE_TYPES = {
+    "INTEGER": "INTEGER",
+    "INT64": "INTEGER",
+    "FLOAT": "REAL",
+    "FLOAT64": "REAL",
+    "NUMERIC": "REAL",
+    "BOOLEAN": "INTEGER",
+    "BOOL": "INTEGER",
+    "TIMESTAMP": "TIMESTAMP",
+}
+
+BACKTICK_PATTERN = re.compile(r"`([^`]*)`")
+PROJECT_PATTERN = re.compile(rf"\b[\w-]+\.({DATASET_ID}\.)", re.IGNORECASE)
+INFORMATION_SCHEMA_PATTERN = re.compile(rf"\b{DATASET_ID}\.INFORMATION_SCHEMA\.(\w+)", re.IGNORECASE)
+TABLES_META_PATTERN = re.compile(rf"\b{DATASET_ID}\.__TABLES__", re.IGNORECASE)
+TABLE_REF_PATTERN = re.compile(rf"\b{DATASET_ID}\.(\w+)", re.IGNORECASE)
+CTAS_PATTERN = re.compile(
+    r"^\s*CREATE\s+(?:OR\s+REPLACE\s+)?TABLE\s+(?P<name>\S+)\s*(?:OPTIONS\s*\((?P<options>.*?)\)\s*)?AS\s+(?P<select>.*)$",
+    re.IGNORECASE | re.DOTALL,
+)
+# TABLESAMPLE은 샘플링 없이 전체 행 반환
+TABLESAMPLE_PATTERN = re.compile(r"\bTABLESAMPLE\s+SYSTEM\s*\([^)]*\)", re.IGNORECASE)
+DESCRIPTION_PATTERN = re.compile(r"description\s*=\s*'([^']*)'", re.IGNORECASE)
+# DAG_QUERY에서 사용하는 "QUALIFY <window> = 1" 형태만 지원
+QUALIFY_PATTERN = re.compile(
+    r"SELECT\s+(?P<columns>(?:(?!SELECT).)+?)\s+FROM\s+(?P<source>(?:(?!SELECT).)+?)\s+QUALIFY\s+(?P<window>.+?)\s*=\s*1\b",
+    re.IGNORECASE | re.DOTALL,
+)
+
+
+def _sql_value(value):
+    # 타임스탬프는 UTC 기준 ISO 문자열로 저장해 문자열 비교로 정렬되도록 함
+    if isinstance(value, datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        return value.isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, bool):
+        return int(value)
+    return value
+
+
+def _timestamp(value):
+    # TIMESTAMP 컬럼은 BigQuery처럼 UTC datetime으로 반환
+    return datetime.fromisoformat(value.decode("utf-8")).replace(tzinfo=timezone.utc)
+
+
+sqlite3.register_converter("TIMESTAMP", _timestamp)
+
+
+def _field_type(value):
+    if isinstance(value, bool):
+        return "BOOLEAN"
+    if isinstance(value, int):
+        return "INTEGER"
+    if isinstance(value, float):
+        return "FLOAT"
+    if isinstance(value, datetime):
+        return "TIMESTAMP"
+    return "STRING"
+
+
+def translate(sql_query):
+    # BigQuery SQL 중 이 저장소에서 사용하는 구문만 SQLite 구문으로 변환
+    def unquote(match):
+        name = match.group(1)
+        return name if "." in name else f'"{name}"'
+
+    sql_query = BACKTICK_PATTERN.sub(unquote, sql_query)
+    sql_query = PROJECT_PATTERN.sub(r"\1", sql_query)
+    sql_query = INFORMATION_SCHEMA_PATTERN.sub(lambda match: f"main.INFORMATION_SCHEMA_{match.group(1).upper()}", sql_query)
+    sql_query = TABLES_META_PATTERN.sub("main.__TABLES__", sql_query)
+    sql_query = TABLESAMPLE_PATTERN.sub("", sql_query)
+    sql_query = re.sub(r"CURRENT_TIMESTAMP\(\)", "CURRENT_TIMESTAMP", sql_query, flags=re.IGNORECASE)
+    sql_query = QUALIFY_PATTERN.sub(
+        lambda match: f"SELECT {match.group('columns')} FROM (SELECT *, {match.group('window')} AS _QUALIFY_RANK FROM {match.group('source')}) WHERE _QUALIFY_RANK = 1",
+        sql_query,
+    )
+    return sql_query.strip().rstrip(";")
+
+
+def statement_type(sql_query):
+    keyword = sql_query.strip().split(None, 1)[0].upper() if sql_query.strip() else ""
+    if keyword in ("SELECT", "WITH"):
+        return "SELECT"
+    if keyword == "CREATE":
+        return "CREATE_TABLE_AS_SELECT"
+    if keyword in ("INSERT", "UPDATE", "DELETE", "MERGE"):
+        return keyword
+    return "SCRIPT"
+
+
+class FakeTableReference:
+
+    def __init__(self, dataset_id, table_id, project="fake-project"):
+        self.project = project
+        self.dataset_id = dataset_id
+        self.table_id = table_id
+
+    def __str__(self):
+        return f"{self.project}.{self.dataset_id}.{self.table_id}"
+
+    def to_api_repr(self):
+        return {"projectId": self.project, "datasetId": self.dataset_id, "tableId": self.table_id}
+
+
+class FakeDatasetReference:
+
+    def __init__(self, dataset_id):
+        self.dataset_id = dataset_id
+
+    def table(self, table_id):
+        return FakeTableReference(self.dataset_id, table_id)
+
+
+class FakeSchemaField:
+
+    def __init__(self, name, field_type="STRING", mode="NULLABLE", description=None):
+        self.name = name
+        self.field_type = field_type
+        self.mode = mode
+        self.description = description
+
+    def to_api_repr(self):
+        return {"name": self.name, "type": self.field_type, "mode": self.mode, "description": self.description}
+
+
+class FakeTable:
+
+    def __init__(self, reference, schema, modified, num_rows, description=None):
+        self.reference = reference
+        self.project = reference.project
+        self.dataset_id = reference.dataset_id
+        self.table_id = reference.table_id
+        self.schema = schema
+        self.modified = modified
+        self.num_rows = num_rows
+        self.description = description
+
+
+class FakeRow:
+    # google.cloud.bigquery.Row 처럼 인덱스/컬럼명(대소문자 무시)으로 조회
+
+    def __init__(self, names, values):
+        self._names = names
+        self._values = values
+        self._index = {name.lower(): i for i, name in enumerate(names)}
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return self._values[self._index[key.lower()]]
+        return self._values[key]
+
+    def get(self, key, default=None):
+        index = self._index.get(key.lower())
+        return default if index is None else self._values[index]
+
+    def keys(self):
+        return list(self._names)
+
+    def values(self):
+        return tuple(self._values)
+
+    def items(self):
+        return list(zip(self._names, self._values))
+
+
+class FakeRowIterator:
+
+    def __init__(self, names, rows, page_size=None, max_results=None):
+        if max_results is not None:
+            rows = rows[:max_results]
+        self.schema = [FakeSchemaField(name) for name in names]
+        self.total_rows = len(rows)
+        self._names = names
+        self._rows = rows
+        self._page_size = page_size or max(len(rows), 1)
+
+    def __iter__(self):
+        return (FakeRow(self._names, row) for row in self._rows)
+
+    def _to_batch(self, rows):
+        import pyarrow as pa
+
+        columns = list(zip(*rows)) if rows else [[] for _ in self._names]
+        return pa.RecordBatch.from_arrays([pa.array(list(column)) for column in columns], names=self._names)
+
+    def to_arrow_iterable(self, **kwargs):
+        for start in range(0, len(self._rows), self._page_size):
+            yield self._to_batch(self._rows[start:start + self._page_size])
+
+    def to_arrow(self, **kwargs):
+        import pyarrow as pa
+
+        batches = list(self.to_arrow_iterable())
+        if not batches:
+            batches = [self._to_batch([])]
+        return pa.Table.from_batches(batches)
+
+    def to_dataframe(self, **kwargs):
+        return self.to_arrow().to_pandas()
+
+
+class FakeQueryJob:
+
+    def __init__(self, client, sql_query, params, dry_run):
+        self.job_id = uuid.uuid4().hex
+        self.query = sql_query
+        self.statement_type = statement_type(sql_query)
+        self.cache_hit = False
+        self.dry_run = dry_run
+        self.referenced_tables = client._referenced_tables(sql_query)
+        self.total_bytes_processed = client._estimate_bytes(self.referenced_tables)
+        self.total_bytes_billed = 0 if dry_run else self.total_bytes_processed
+        self.slot_millis = 0
+        self._client = client
+        self._params = params
+        self._result = None
+
+        if dry_run:
+            # BigQuery dry run처럼 SQL 오류는 바로 예외 발생
+            client._validate(sql_query, params)
+        else:
+            started = time.perf_counter()
+            self._result = client._execute(sql_query, params)
+            self.slot_millis = int((time.perf_counter() - started) * 1000)
+
+    def result(self, page_size=None, max_results=None, **kwargs):
+        if self.dry_run:
+            return FakeRowIterator([], [])
+        names, rows = self._result
+        return FakeRowIterator(names, rows, page_size=page_size, max_results=max_results)
+
+
+class FakeLoadJob:
+
+    def __init__(self, output_rows):
+        self.job_id = uuid.uuid4().hex
+        self.output_rows = output_rows
+
+    def result(self, **kwargs):
+        return self
+
+
+class FakeBigQueryClient:
+    # 이 저장소에서 사용하는 bigquery.Client 기능만 SQLite 메모리 DB로 구현한 대역
+
+    def __init__(self, latency=0.0, query_latency=0.0, project="fake-project"):
+        self.project = project
+        self.latency = latency
+        self.query_latency = query_latency
+        self.calls = {}
+        self._lock = threading.RLock()
+        self._tables = {}
+        self._connection = sqlite3.connect(":memory:", check_same_thread=False, detect_types=sqlite3.PARSE_DECLTYPES)
+        self._connection.execute(f"ATTACH DATABASE ':memory:' AS {DATASET_ID}")
+        self._connection.create_function("STRPOS", 2, lambda value, search: 0 if value is None or search is None else value.find(search) + 1)
+        self._connection.create_function("TIMESTAMP_SECONDS", 1, lambda seconds: _sql_value(datetime.fromtimestamp(seconds, timezone.utc)))
+
+    def _count(self, name):
+        with self._lock:
+            self.calls[name] = self.calls.get(name, 0) + 1
+
+    def _table_key(self, table):
+        if isinstance(table, str):
+            parts = table.strip("`").split(".")
+            return parts[-2].lower(), parts[-1].lower()
+        return table.dataset_id.lower(), table.table_id.lower()
+
+    def _touch(self, key):
+        self._tables[key]["modified"] = datetime.now(timezone.utc)
+
+    def _sync_tables(self):
+        # CTAS/DROP 등 SQL로 바뀐 테이블 목록을 반영
+        names = {row[0].lower() for row in self._connection.execute(f"SELECT name FROM {DATASET_ID}.sqlite_master WHERE type = 'table'")}
+        for key in list(self._tables):
+            if key[0] == DATASET_ID and key[1] not in names:
+                del self._tables[key]
+        for name in names:
+            key = (DATASET_ID, name)
+            if key not in self._tables:
+                columns = self._connection.execute(f'PRAGMA {DATASET_ID}.table_info("{name}")').fetchall()
+                schema = [FakeSchemaField(column[1], (column[2] or "STRING").upper()) for column in columns]
+                self._tables[key] = {"schema": schema, "description": None, "modified": datetime.now(timezone.utc)}
+
+    def _row_count(self, key):
+        return self._connection.execute(f'SELECT COUNT(*) FROM {key[0]}."{key[1]}"').fetchone()[0]
+
+    def _refresh_metadata(self):
+        # INFORMATION_SCHEMA / __TABLES__ 조회용 메타데이터 테이블 재생성
+        connection = self._connection
+        connection.execute("DROP TABLE IF EXISTS main.INFORMATION_SCHEMA_COLUMNS")
+        connection.execute("DROP TABLE IF EXISTS main.INFORMATION_SCHEMA_COLUMN_FIELD_PATHS")
+        connection.execute("DROP TABLE IF EXISTS main.__TABLES__")
+        connection.execute("CREATE TABLE main.INFORMATION_SCHEMA_COLUMNS (TABLE_NAME, COLUMN_NAME, ORDINAL_POSITION, DATA_TYPE)")
+        connection.execute("CREATE TABLE main.INFORMATION_SCHEMA_COLUMN_FIELD_PATHS (TABLE_NAME, COLUMN_NAME, FIELD_PATH, DATA_TYPE, DESCRIPTION)")
+        connection.execute("CREATE TABLE main.__TABLES__ (TABLE_ID, ROW_COUNT, LAST_MODIFIED_TIME)")
+        for key, table in self._tables.items():
+            if key[0] != DATASET_ID:
+                continue
+            for position, field in enumerate(table["schema"], 1):
+                connection.execute("INSERT INTO main.INFORMATION_SCHEMA_COLUMNS VALUES (?, ?, ?, ?)", (key[1], field.name, position, field.field_type))
+                connection.execute("INSERT INTO main.INFORMATION_SCHEMA_COLUMN_FIELD_PATHS VALUES (?, ?, ?, ?, ?)", (key[1], field.name, field.name, field.field_type, field.description))
+            connection.execute("INSERT INTO main.__TABLES__ VALUES (?, ?, ?)", (key[1], self._row_count(key), int(table["modified"].timestamp() * 1000)))
+
+    def _params(self, params):
+        return {param.name: _sql_value(param.value) for param in params or []}
+
+    def _referenced_tables(self, sql_query):
+        names = []
+        for match in TABLE_REF_PATTERN.finditer(sql_query):
+            name = match.group(1).lower()
+            if name not in ("information_schema", "__tables__") and name not in names:
+                names.append(name)
+        return [FakeTableReference(DATASET_ID, name, self.project) for name in names]
+
+    def _estimate_bytes(self, references):
+        # 참조 테이블의 행 수 x 컬럼 수 x 8바이트로 처리량 추정
+        total = 0
+        with self._lock:
+            for reference in references:
+                table = self._tables.get((DATASET_ID, reference.table_id))
+                if table:
+                    total += self._row_count((DATASET_ID, reference.table_id)) * len(table["schema"]) * 8
+        return total
+
+    def _validate(self, sql_query, params):
+        if statement_type(sql_query) != "SELECT":
+            return
+        with self._lock:
+            if "INFORMATION_SCHEMA" in sql_query.upper() or "__TABLES__" in sql_query.upper():
+                self._refresh_metadata()
+            self._connection.execute(f"EXPLAIN QUERY PLAN {translate(sql_query)}", self._params(params))
+
+    def _execute(self, sql_query, params):
+        with self._lock:
+            if "INFORMATION_SCHEMA" in sql_query.upper() or "__TABLES__" in sql_query.upper():
+                self._refresh_metadata()
+
+            ctas_match = CTAS_PATTERN.match(sql_query)
+            if ctas_match:
+                key = self._table_key(ctas_match.group("name"))
+                self._connection.execute(f'DROP TABLE IF EXISTS {key[0]}."{key[1]}"')
+                self._connection.execute(f'CREATE TABLE {key[0]}."{key[1]}" AS {translate(ctas_match.group("select"))}')
+                self._tables.pop(key, None)
+                self._sync_tables()
+                description = DESCRIPTION_PATTERN.search(ctas_match.group("options") or "")
+                self._tables[key]["description"] = description.group(1) if description else None
+                return [], []
+
+            cursor = self._connection.execute(translate(sql_query), self._params(params))
+            names = [column[0] for column in cursor.description] if cursor.description else []
+            rows = cursor.fetchall()
+            if statement_type(sql_query) != "SELECT":
+                self._sync_tables()
+                for reference in self._referenced_tables(sql_query):
+                    if (DATASET_ID, reference.table_id) in self._tables:
+                        self._touch((DATASET_ID, reference.table_id))
+            return names, rows
+
+    def close(self):
+        pass
+
+    def dataset(self, dataset_id):
+        return FakeDatasetReference(dataset_id)
+
+    def query(self, sql_query, job_config=None, **kwargs):
+        dry_run = bool(job_config is not None and job_config.dry_run)
+        self._count("dry_run" if dry_run else "query")
+        time.sleep(self.query_latency)
+        params = job_config.query_parameters if job_config is not None else None
+        return FakeQueryJob(self, sql_query, params, dry_run)
+
+    def get_table(self, table):
+        self._count("get_table")
+        time.sleep(self.latency)
+        key = self._table_key(table)
+        with self._lock:
+            if key not in self._tables:
+                raise LookupError(f"Not found: Table {key[0]}.{key[1]}")
+            info = self._tables[key]
+            return FakeTable(FakeTableReference(key[0], key[1], self.project), info["schema"], info["modified"], self._row_count(key), info["description"])
+
+    def _create(self, key, schema, description=None):
+        columns = ", ".join(f'"{field.name}" {SQLITE_TYPES.get(field.field_type.upper(), "TEXT")}' for field in schema)
+        self._connection.execute(f'CREATE TABLE {key[0]}."{key[1]}" ({columns})')
+        self._tables[key] = {"schema": schema, "description": description, "modified": datetime.now(timezone.utc)}
+
+    def create_table(self, table, exists_ok=False):
+        self._count("create_table")
+        key = self._table_key(table)
+        schema = [FakeSchemaField(field.name, field.field_type, field.mode, field.description) for field in table.schema]
+        with self._lock:
+            if key in self._tables:
+                if exists_ok:
+                    return self.get_table(table)
+                raise ValueError(f"Already Exists: Table {key[0]}.{key[1]}")
+            self._create(key, schema, getattr(table, "description", None))
+        return self.get_table(table)
+
+    def update_table(self, table, fields):
+        # 스키마 변경은 컬럼 추가만 지원 (BigQuery와 동일)
+        self._count("update_table")
+        time.sleep(self.latency)
+        key = self._table_key(table)
+        with self._lock:
+            info = self._tables[key]
+            if "schema" in fields:
+                existing = {field.name.lower() for field in info["schema"]}
+                for field in table.schema:
+                    if field.name.lower() not in existing:
+                        self._connection.execute(f'ALTER TABLE {key[0]}."{key[1]}" ADD COLUMN "{field.name}" {SQLITE_TYPES.get(field.field_type.upper(), "TEXT")}')
+                        info["schema"] = info["schema"] + [FakeSchemaField(field.name, field.field_type, field.mode, field.description)]
+            if "description" in fields:
+                info["description"] = table.description
+            self._touch(key)
+        return self.get_table(table)
+
+    def _insert_rows(self, table, rows):
+        key = self._table_key(table)
+        with self._lock:
+            names = [field.name for field in self._tables[key]["schema"]]
+            placeholders = ", ".join("?" for _ in names)
+            quoted = ", ".join(f'"{name}"' for name in names)
+            self._connection.executemany(
+                f'INSERT INTO {key[0]}."{key[1]}" ({quoted}) VALUES ({placeholders})',
+                [[_sql_value(row.get(name)) for name in names] for row in rows],
+            )
+            self._touch(key)
+        return len(rows)
+
+    def _ensure_loaded_table(self, table, row):
+        # 로드 대상 테이블이 없으면 첫 행의 값으로 스키마 생성
+        key = self._table_key(table)
+        with self._lock:
+            if key not in self._tables:
+                self._create(key, [FakeSchemaField(name, _field_type(value)) for name, value in row.items()])
+
+    def insert_rows_json(self, table, json_rows, row_ids=None, **kwargs):
+        self._count("insert_rows_json")
+        time.sleep(self.query_latency)
+        self._insert_rows(table, list(json_rows))
+        return []
+
+    def load_table_from_json(self, json_rows, destination, job_config=None, **kwargs):
+        self._count("load_table_from_json")
+        time.sleep(self.query_latency)
+        json_rows = list(json_rows)
+        if json_rows:
+            self._ensure_loaded_table(destination, json_rows[0])
+        return FakeLoadJob(self._insert_rows(destination, json_rows))
+
+    def load_table_from_dataframe(self, dataframe, destination, job_config=None, **kwargs):
+        self._count("load_table_from_dataframe")
+        time.sleep(self.query_latency)
+        rows = dataframe.to_dict("records")
+        if rows:
+            self._ensure_loaded_table(destination, rows[0])
+        return FakeLoadJob(self._insert_rows(destination, rows))
+
+    def list_rows(self, table, max_results=None, **kwargs):
+        self._count("list_rows")
+        time.sleep(self.latency)
+        key = self._table_key(table)
+        with self._lock:
+            limit = "" if max_results is None else f" LIMIT {int(max_results)}"
+            cursor = self._connection.execute(f'SELECT * FROM {key[0]}."{key[1]}"{limit}')
+            names = [column[0] for column in cursor.description]
+            return FakeRowIterator(names, cursor.fetchall())
+
+
+class FakeUsage:
+
+    def __init__(self, input_tokens, output_tokens, cache_creation_input_tokens=0, cache_read_input_tokens=0):
+        self.input_tokens = input_tokens
+        self.output_tokens = output_tokens
+        self.cache_creation_input_tokens = cache_creation_input_tokens
+        self.cache_read_input_tokens = cache_read_input_tokens
+
+
+class FakeTextBlock:
+
+    def __init__(self, text):
+        self.type = "text"
+        self.text = text
+
+
+class FakeMessage:
+
+    def __init__(self, text, usage, model):
+        self.id = f"msg_{uuid.uuid4().hex}"
+        self.model = model
+        self.content = [FakeTextBlock(text)]
+        self.usage = usage
+        self.stop_reason = "end_turn"
+
+
+class FakeMessageStream:
+
+    def __init__(self, messages, params):
+        self._messages = messages
+        self._params = params
+        self._text = messages.responder(params)
+        self._chunks = re.findall(r"\S+\s*", self._text) or [self._text]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    @property
+    def text_stream(self):
+        # 첫 토큰까지 latency, 이후 토큰마다 token_latency 지연
+        time.sleep(self._messages.latency)
+        for chunk in self._chunks:
+            time.sleep(self._messages.token_latency)
+            yield chunk
+
+    def get_final_message(self):
+        return self._messages._message(self._params, self._text, len(self._chunks))
+
+
+class FakeMessages:
+
+    def __init__(self, responder, latency, token_latency):
+        self.responder = responder
+        self.latency = latency
+        self.token_latency = token_latency
+        self.calls = 0
+        self._cached_prefixes = set()
+        self._lock = threading.Lock()
+
+    def _message(self, params, text, output_tokens):
+        # cache_control이 붙은 시스템 블록은 두 번째 호출부터 캐시 읽기로 계산
+        system = params.get("system") or []
+        if isinstance(system, str):
+            system = [{"type": "text", "text": system}]
+        system_tokens = sum(len(block["text"].encode("utf-8")) // 4 + 1 for block in system)
+        user_tokens = sum(len(str(message["content"]).encode("utf-8")) // 4 + 1 for message in params.get("messages", []))
+        cached = any("cache_control" in block for block in system)
+        prefix = "".join(block["text"] for block in system)
+
+        with self._lock:
+            self.calls += 1
+            hit = cached and prefix in self._cached_prefixes
+            if cached:
+                self._cached_prefixes.add(prefix)
+
+        if not cached:
+            usage = FakeUsage(system_tokens + user_tokens, output_tokens)
+        elif hit:
+            usage = FakeUsage(user_tokens, output_tokens, cache_read_input_tokens=system_tokens)
+        else:
+            usage = FakeUsage(user_tokens, output_tokens, cache_creation_input_tokens=system_tokens)
+        return FakeMessage(text, usage, params.get("model"))
+
+    def create(self, **params):
+        text = self.responder(params)
+        output_tokens = len(re.findall(r"\S+\s*", text)) or 1
+        time.sleep(self.latency + self.token_latency * output_tokens)
+        return self._message(params, text, output_tokens)
+
+    def stream(self, **params):
+        return FakeMessageStream(self, params)
+
+
+class FakeAnthropicClient:
+    # messages.create / messages.stream 만 지연 시간을 설정해 흉내 내는 Anthropic 클라이언트 대역
+
+    def __init__(self, responder=None, latency=0.5, token_latency=0.01):
+        self.messages = FakeMessages(responder or (lambda params: "SELECT 1"), latency, token_latency)
+
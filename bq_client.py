@@ -0,0 +1,144 @@
+import os
+import threading
+import time
+import config
+import telemetry
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+
+BIGQUERY_SCOPES = ["https://www.googleapis.com/auth/cloud-platform"]
+
+# 프로세스 전체에서 공유하는 BigQuery 클라이언트
+_lock = threading.Lock()
+_client = None
+_bqstorage_client = None
+_adapter = None
+_last_checked_at = 0.0
+_stats = {
+    "created": 0,
+    "reused": 0,
+    "health_checks": 0,
+    "health_failures": 0,
+}
+
+
+def _load_credentials():
+    # SDK import와 인증 정보 로딩은 클라이언트를 처음 만들 때 수행
+    import google.auth
+
+    bigquery_key_path = os.path.join(current_dir, config.get_config('bigquery.key.file'))
+    os.environ.setdefault("GOOGLE_APPLICATION_CREDENTIALS", bigquery_key_path)
+    return google.auth.default(scopes=BIGQUERY_SCOPES)
+
+
+def _create_client():
+    global _adapter
+
+    from google.auth.transport.requests import AuthorizedSession
+    from google.cloud import bigquery
+    from requests.adapters import HTTPAdapter
+
+    credentials, project = _load_credentials()
+
+    # 커넥션 풀을 가진 HTTP 세션 (TLS 핸드셰이크 재사용)
+    pool_size = config.get_config('bigquery.pool.size')
+    session = AuthorizedSession(credentials)
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=3)
+    session.mount("https://", adapter)
+    _adapter = adapter
+
+    client = bigquery.Client(
+        project=project,
+        credentials=credentials,
+        location=config.get_config('bigquery.region'),
+        _http=session,
+    )
+    _stats["created"] += 1
+    print('Connected to BigQuery!')
+    # 모든 쿼리/로드 작업의 시간, 처리량, 슬롯 사용량 기록
+    return telemetry.instrument_bigquery(client)
+
+
+def _is_healthy(client):
+    from google.cloud import bigquery
+
+    _stats["health_checks"] += 1
+    try:
+        job_config = bigquery.QueryJobConfig(dry_run=True, use_query_cache=False)
+        client.query("SELECT 1", job_config=job_config)
+        return True
+    except Exception as e:
+        print(f"BigQuery health check failed: {e}")
+        _stats["health_failures"] += 1
+        return False
+
+
+def get_client():
+    global _client, _last_checked_at
+
+    with _lock:
+        now = time.monotonic()
+        if _client is not None:
+            # 일정 시간 사용하지 않은 클라이언트만 상태 확인
+            interval = config.get_config('bigquery.pool.health_check_interval')
+            if now - _last_checked_at > interval and not _is_healthy(_client):
+                _close(_client)
+                _client = None
+
+        if _client is None:
+            _client = _create_client()
+        else:
+            _stats["reused"] += 1
+
+        _last_checked_at = now
+        return _client
+
+
+def get_bqstorage_client():
+    global _bqstorage_client
+
+    # google-cloud-bigquery-storage 가 설치된 경우에만 Storage Read API 사용
+    try:
+        from google.cloud import bigquery_storage
+    except ImportError:
+        return None
+
+    with _lock:
+        if _bqstorage_client is None:
+            credentials, _ = _load_credentials()
+            _bqstorage_client = bigquery_storage.BigQueryReadClient(credentials=credentials)
+        return _bqstorage_client
+
+
+def reset_client():
+    global _client
+
+    with _lock:
+        if _client is not None:
+            _close(_client)
+            _client = None
+
+
+def _close(client):
+    try:
+        client.close()
+    except Exception as e:
+        print(f"Error: {e}")
+
+
+def get_pool_stats():
+    with _lock:
+        stats = dict(_stats)
+        stats["connections_created"] = 0
+        stats["idle_connections"] = 0
+
+        if _adapter is not None:
+            pools = _adapter.poolmanager.pools
+            for key in list(pools.keys()):
+                pool = pools.get(key)
+                if pool is None:
+                    continue
+                stats["connections_created"] += pool.num_connections
+                stats["idle_connections"] += sum(1 for conn in list(pool.pool.queue) if conn is not None)
+
+        return stats
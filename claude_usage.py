@@ -0,0 +1,62 @@
+import threading
+
+# 프롬프트 캐시 토큰 단가 배율 (기본 입력 토큰 대비)
+CACHE_WRITE_MULTIPLIER = 1.25
+CACHE_READ_MULTIPLIER = 0.1
+
+_lock = threading.Lock()
+_totals = {
+    "calls": 0,
+    "input_tokens": 0,
+    "output_tokens": 0,
+    "cache_creation_input_tokens": 0,
+    "cache_read_input_tokens": 0,
+}
+_last_usage = None
+
+
+def usage_to_dict(usage):
+    return {
+        "input_tokens": getattr(usage, "input_tokens", 0) or 0,
+        "output_tokens": getattr(usage, "output_tokens", 0) or 0,
+        "cache_creation_input_tokens": getattr(usage, "cache_creation_input_tokens", 0) or 0,
+        "cache_read_input_tokens": getattr(usage, "cache_read_input_tokens", 0) or 0,
+    }
+
+
+def record(usage):
+    global _last_usage
+
+    call_usage = usage_to_dict(usage)
+    with _lock:
+        _totals["calls"] += 1
+        for key, value in call_usage.items():
+            _totals[key] += value
+        _last_usage = call_usage
+
+    print(f"Claude Usage : {call_usage}")
+    return call_usage
+
+
+def _savings(usage):
+    # 캐시가 없었다면 모두 일반 입력 토큰으로 과금되었을 양과 비교
+    cache_write = usage["cache_creation_input_tokens"]
+    cache_read = usage["cache_read_input_tokens"]
+    uncached = usage["input_tokens"] + cache_write + cache_read
+    billed = usage["input_tokens"] + cache_write * CACHE_WRITE_MULTIPLIER + cache_read * CACHE_READ_MULTIPLIER
+    return {
+        "uncached_input_tokens": uncached,
+        "billed_input_tokens": billed,
+        "saved_input_tokens": uncached - billed,
+        "saved_ratio": (uncached - billed) / uncached if uncached else 0.0,
+    }
+
+
+def get_stats():
+    with _lock:
+        stats = dict(_totals)
+        last_usage = dict(_last_usage) if _last_usage else None
+
+    stats.update(_savings(stats))
+    stats["last_call"] = last_usage
+    return stats
@@ -0,0 +1,62 @@
+import config
+import bq_client
+
+ALLOW = "allow"
+CONFIRM = "confirm"
+BLOCK = "block"
+
+
+def dry_run(sql_query, params=None, client=None):
+    from google.cloud import bigquery
+
+    if client is None:
+        client = bq_client.get_client()
+
+    job_config = bigquery.QueryJobConfig(dry_run=True, use_query_cache=False)
+    if params:
+        job_config.query_parameters = params
+    return client.query(sql_query, job_config=job_config)
+
+
+def estimate_query(sql_query, params=None, client=None):
+    # 실행 전 dry run으로 예상 처리 바이트와 참조 테이블 확인
+    try:
+        job = dry_run(sql_query, params, client)
+    except Exception as e:
+        print(f"Error: {e}")
+        return {"error": str(e), "bytes_processed": None, "referenced_tables": [], "statement_type": None, "job": None}
+
+    return {
+        "error": None,
+        "bytes_processed": job.total_bytes_processed or 0,
+        "referenced_tables": [f"{ref.dataset_id}.{ref.table_id}" for ref in job.referenced_tables],
+        "statement_type": job.statement_type,
+        "job": job,
+    }
+
+
+def check_cost(estimate):
+    if estimate["error"]:
+        return BLOCK
+
+    bytes_processed = estimate["bytes_processed"]
+    if bytes_processed > config.get_config('bigquery.cost.block_bytes'):
+        return BLOCK
+    if bytes_processed > config.get_config('bigquery.cost.confirm_bytes'):
+        return CONFIRM
+    return ALLOW
+
+
+def apply_limits(job_config):
+    # 실제 실행되는 모든 쿼리에 과금 상한 설정
+    job_config.maximum_bytes_billed = config.get_config('bigquery.cost.maximum_bytes_billed')
+    return job_config
+
+
+def format_bytes(num_bytes):
+    if num_bytes is None:
+        return "-"
+    for unit in ["B", "KB", "MB", "GB", "TB"]:
+        if num_bytes < 1024 or unit == "TB":
+            return f"{num_bytes:.1f} {unit}" if unit != "B" else f"{num_bytes} B"
+        num_bytes /= 1024
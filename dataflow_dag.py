@@ -0,0 +1,231 @@
+from concurrent.futures import ThreadPoolExecutor
+import config
+import bq_client
+import materializer
+import sql_fingerprint
+import telemetry
+
+DATASET_ID = "metatron"
+
+# 데이터플로우에 속한 데이터셋과 각 데이터셋의 최신 적용 룰을 한 번에 조회
+DAG_QUERY = f"""
+    SELECT
+        DSDF.DF_ID,
+        DS.DS_ID,
+        DS.DS_NAME,
+        DS.DS_TYPE,
+        DS.TABLE_NAME,
+        R.RULE_ID,
+        R.RESULT_SQL,
+        R.RESULT_TABLE_NAME
+    FROM {DATASET_ID}.dataset_dataflow AS DSDF
+      JOIN {DATASET_ID}.dataset AS DS
+        ON DSDF.DS_ID = DS.DS_ID
+      LEFT JOIN (
+        SELECT DS_ID, RULE_ID, RESULT_SQL, RESULT_TABLE_NAME
+        FROM {DATASET_ID}.rule
+        WHERE APPLIED_YN = 'Y'
+        QUALIFY ROW_NUMBER() OVER (PARTITION BY DS_ID ORDER BY UPDATED_AT DESC, RULE_ID DESC) = 1
+      ) AS R
+        ON DS.DS_ID = R.DS_ID
+    WHERE DSDF.DF_ID = @df_id
+    ORDER BY DS.DS_ID
+    """
+
+SUCCESS = "success"
+FAILED = "failed"
+SKIPPED = "skipped"
+
+
+def referenced_tables(sql_query):
+    # metatron 데이터셋에서 읽는 테이블명 (CTE, CTAS 대상 제외)
+    tables = sql_fingerprint.referenced_tables(sql_query)
+    return {table_id.split(".")[-1] for table_id in tables if table_id.startswith(f"{DATASET_ID}.")}
+
+
+def _short_table_name(table_name):
+    if not table_name:
+        return None
+    return table_name.strip("`").split(".")[-1].lower()
+
+
+class DataflowNode:
+
+    def __init__(self, ds_id, ds_name, ds_type, table_name=None, rule_id=None, result_sql=None, result_table_name=None):
+        self.ds_id = ds_id
+        self.ds_name = ds_name
+        self.ds_type = ds_type
+        self.table_name = table_name
+        self.rule_id = rule_id
+        self.result_sql = result_sql
+        self.result_table_name = result_table_name
+
+    @property
+    def output_table(self):
+        # 노드 결과가 저장되는 테이블 (Imported는 원본, Wrangled는 CTAS 대상 또는 관리 테이블)
+        if self.ds_type == 'Imported':
+            return _short_table_name(self.table_name)
+        if self.result_table_name:
+            return _short_table_name(self.result_table_name)
+        if self.result_sql:
+            return _short_table_name(materializer.output_table(self.ds_id, self.result_sql))
+        return None
+
+    @property
+    def runnable(self):
+        return self.ds_type == 'Wrangled' and bool(self.result_sql)
+
+
+class DataflowDag:
+
+    def __init__(self, df_id, nodes):
+        self.df_id = df_id
+        self.nodes = {node.ds_id: node for node in nodes}
+        self.parents = {ds_id: set() for ds_id in self.nodes}
+        self.children = {ds_id: set() for ds_id in self.nodes}
+
+        # 룰 SQL이 참조하는 테이블을 만드는 노드를 부모로 연결
+        producers = {node.output_table: node.ds_id for node in nodes if node.output_table}
+        for node in nodes:
+            if node.ds_type != 'Wrangled':
+                continue
+            for table_name in referenced_tables(node.result_sql):
+                parent_id = producers.get(table_name)
+                if parent_id is not None and parent_id != node.ds_id:
+                    self.parents[node.ds_id].add(parent_id)
+                    self.children[parent_id].add(node.ds_id)
+
+    @property
+    def edges(self):
+        return [(parent_id, child_id) for parent_id, child_ids in self.children.items() for child_id in sorted(child_ids)]
+
+    def levels(self, ds_ids=None):
+        # 위상 정렬 결과를 같은 단계끼리 묶어 반환 (같은 단계는 서로 독립)
+        targets = set(self.nodes) if ds_ids is None else set(ds_ids)
+        in_degree = {ds_id: len(self.parents[ds_id] & targets) for ds_id in targets}
+        current = sorted(ds_id for ds_id, degree in in_degree.items() if degree == 0)
+        levels = []
+        visited = set()
+
+        while current:
+            levels.append(current)
+            visited.update(current)
+            following = []
+            for ds_id in current:
+                for child_id in self.children[ds_id] & targets:
+                    in_degree[child_id] -= 1
+                    if in_degree[child_id] == 0:
+                        following.append(child_id)
+            current = sorted(following)
+
+        if len(visited) != len(targets):
+            raise ValueError(f"Dataflow {self.df_id} has a cycle : {sorted(targets - visited)}")
+        return levels
+
+    def downstream(self, ds_ids):
+        # 변경된 노드와 그 하위 노드 전체
+        result = set()
+        stack = list(ds_ids)
+        while stack:
+            ds_id = stack.pop()
+            if ds_id in result or ds_id not in self.nodes:
+                continue
+            result.add(ds_id)
+            stack.extend(self.children[ds_id])
+        return result
+
+    def execute(self, changed=None, run_node=None, max_workers=None):
+        # 단계별로 독립된 Wrangled 데이터셋을 동시에 실행
+        if run_node is None:
+            run_node = run_rule_sql
+        if max_workers is None:
+            max_workers = config.get_config('dataflow.max_workers')
+
+        targets = set(self.nodes) if changed is None else self.downstream(changed)
+        status = {}
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for level in self.levels(targets):
+                futures = {}
+                for ds_id in level:
+                    node = self.nodes[ds_id]
+                    if any(status.get(parent_id) in (FAILED, SKIPPED) for parent_id in self.parents[ds_id]):
+                        status[ds_id] = SKIPPED
+                    elif node.runnable:
+                        futures[ds_id] = telemetry.submit(executor, run_node, node)
+
+                for ds_id, future in futures.items():
+                    try:
+                        future.result()
+                        status[ds_id] = SUCCESS
+                    except Exception as e:
+                        print(f"Error: {e}")
+                        status[ds_id] = FAILED
+
+        return status
+
+
+def run_rule_sql(node):
+    # 룰 결과를 관리 테이블(또는 CTAS 대상)에 다시 생성
+    with telemetry.context(ds_id=node.ds_id):
+        materializer.materialize(node.ds_id, node.result_sql)
+
+
+def load_dag(df_id, client=None):
+    from google.cloud import bigquery
+
+    if client is None:
+        client = bq_client.get_client()
+
+    job_config = bigquery.QueryJobConfig(
+        query_parameters=[
+            bigquery.ScalarQueryParameter("df_id", "INT64", df_id)
+        ]
+    )
+    print(f"쿼리 실행 : {DAG_QUERY}")
+    nodes = []
+    for row in client.query(DAG_QUERY, job_config=job_config).result():
+        nodes.append(DataflowNode(
+            row["DS_ID"],
+            row["DS_NAME"],
+            row["DS_TYPE"],
+            table_name=row["TABLE_NAME"],
+            rule_id=row["RULE_ID"],
+            result_sql=row["RESULT_SQL"],
+            result_table_name=row["RESULT_TABLE_NAME"],
+        ))
+    return DataflowDag(df_id, nodes)
+
+
+def to_flow_elements(dag, status=None):
+    # streamlit_flow 그래프 요소 생성 (단계별로 왼쪽에서 오른쪽으로 배치)
+    from streamlit_flow.elements import StreamlitFlowNode, StreamlitFlowEdge
+
+    status = status or {}
+    try:
+        levels = dag.levels()
+    except ValueError as e:
+        # 순환 참조가 있으면 단계 구분 없이 한 열로 배치
+        print(f"Error: {e}")
+        levels = [sorted(dag.nodes)]
+
+    nodes = []
+    for x, level in enumerate(levels):
+        for y, ds_id in enumerate(level):
+            node = dag.nodes[ds_id]
+            label = node.ds_name
+            if ds_id in status:
+                label = f"{label} ({status[ds_id]})"
+            nodes.append(StreamlitFlowNode(
+                str(ds_id),
+                (x * 275, y * 100),
+                {'label': label, 'type': node.ds_type, 'table': node.output_table},
+                'input' if not dag.parents[ds_id] else ('output' if not dag.children[ds_id] else 'default'),
+                'right',
+                'left',
+                draggable=False,
+            ))
+
+    edges = [StreamlitFlowEdge(f"{parent_id}-{child_id}", str(parent_id), str(child_id), animated=True) for parent_id, child_id in dag.edges]
+    return nodes, edges
+
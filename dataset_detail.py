@@ -0,0 +1,95 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import config
+import bq_client
+import materializer
+import telemetry
+
+DATASET_ID = "metatron"
+
+LATEST_RULE_QUERY = f"""
+    SELECT result_sql FROM `{DATASET_ID}.rule`
+    WHERE ds_id = @ds_id
+      AND applied_yn = 'Y'
+    ORDER BY updated_at DESC, rule_id DESC
+    LIMIT 1
+    """
+
+USAGE_QUERY = f"""
+    SELECT * FROM `{DATASET_ID}.dataflow`
+    WHERE df_id IN (SELECT df_id FROM `{DATASET_ID}.dataset_dataflow` WHERE ds_id = @ds_id)
+    """
+
+_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="dataset-detail")
+
+# ds_id별 사용처(데이터플로우) 목록 캐시
+_usage_lock = threading.Lock()
+_usage_cache = {}
+
+
+def _ds_id_config(ds_id):
+    from google.cloud import bigquery
+
+    return bigquery.QueryJobConfig(
+        query_parameters=[
+            bigquery.ScalarQueryParameter("ds_id", "INT64", ds_id)
+        ]
+    )
+
+
+def load_preview(ds_id, ds_type, table_name, max_results=10, client=None):
+    if client is None:
+        client = bq_client.get_client()
+
+    if ds_type == 'Imported':
+        # 테이블에서 바로 읽으므로 쿼리 작업/스캔 비용 없음
+        return client.list_rows(f"{DATASET_ID}.{table_name}", max_results=max_results).to_arrow()
+
+    # 적용된 룰의 결과 테이블(없거나 오래되었으면 새로 생성)에서 미리보기
+    print(f"쿼리 실행 : {LATEST_RULE_QUERY}")
+    for row in client.query(LATEST_RULE_QUERY, job_config=_ds_id_config(ds_id)).result():
+        return materializer.preview(ds_id, row["result_sql"], max_results=max_results, client=client)
+    return None
+
+
+def load_usage(ds_id, client=None):
+    now = time.monotonic()
+    with _usage_lock:
+        cached = _usage_cache.get(ds_id)
+        if cached and cached[0] > now:
+            return cached[1], cached[2]
+
+    if client is None:
+        client = bq_client.get_client()
+
+    print(f"쿼리 실행 : {USAGE_QUERY}")
+    results = client.query(USAGE_QUERY, job_config=_ds_id_config(ds_id)).result()
+    columns = [field.name for field in results.schema]
+    rows = [list(row.values()) for row in results]
+
+    with _usage_lock:
+        _usage_cache[ds_id] = (now + config.get_config('dataset_detail.usage_ttl'), columns, rows)
+    return columns, rows
+
+
+def invalidate_usage(ds_id=None):
+    with _usage_lock:
+        if ds_id is None:
+            _usage_cache.clear()
+        else:
+            _usage_cache.pop(ds_id, None)
+
+
+def load_detail(ds_id, ds_type, table_name, max_results=10):
+    # 미리보기와 사용처 조회는 서로 독립이므로 동시에 실행
+    client = bq_client.get_client()
+    preview_future = telemetry.submit(_executor, load_preview, ds_id, ds_type, table_name, max_results, client)
+    usage_future = telemetry.submit(_executor, load_usage, ds_id, client)
+
+    usage_columns, usage_rows = usage_future.result()
+    return {
+        "data": preview_future.result(),
+        "usage_columns": usage_columns,
+        "usage_rows": usage_rows,
+    }
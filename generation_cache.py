@@ -0,0 +1,162 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+import config
+import sql_fingerprint
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+
+
+# 따옴표로 감싼 값 (BigQuery 문자열 비교는 대소문자를 구분하므로 그대로 유지)
+QUOTED_PATTERN = re.compile(r"""('(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*"|`[^`]*`|‘[^’]*’|“[^”]*”)""")
+WHITESPACE_PATTERN = re.compile(r"\s+")
+# 질문 정규화 방식이 바뀌면 올려서 이전 키로 저장된 디스크 캐시를 사용하지 않음
+KEY_VERSION = 2
+
+
+def normalize_question(question):
+    # SQL 그대로 입력한 질문은 정규화된 SQL로, 그 외는 따옴표 밖의 공백/대소문자 차이만 같은 질문으로 취급
+    if sql_fingerprint.is_query(question):
+        return sql_fingerprint.canonicalize(question)
+    parts = QUOTED_PATTERN.split(question)
+    return "".join(part if i % 2 else WHITESPACE_PATTERN.sub(" ", part).casefold() for i, part in enumerate(parts)).strip()
+
+
+def make_key(question, ds_id=None, schema_version=None, model=None, system_prompt=None):
+    system_hash = hashlib.sha256((system_prompt or "").encode("utf-8")).hexdigest()
+    payload = json.dumps({
+        "version": KEY_VERSION,
+        "question": normalize_question(question),
+        "ds_id": ds_id,
+        "schema_version": schema_version,
+        "model": model,
+        "system": system_hash,
+    }, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class GenerationCache:
+    # 메모리 LRU + SQLite 디스크 2단 캐시
+
+    def __init__(self, path, memory_entries=256, disk_entries=10000, ttl=None):
+        self.path = path
+        self.memory_entries = memory_entries
+        self.disk_entries = disk_entries
+        self.ttl = ttl
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "puts": 0, "evictions": 0}
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS generation_cache (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+            """)
+        self._conn.commit()
+
+    def _expired(self, created_at, now):
+        return self.ttl is not None and now - created_at > self.ttl
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                value, created_at = entry
+                if not self._expired(created_at, now):
+                    self._memory.move_to_end(key)
+                    self._stats["memory_hits"] += 1
+                    return value
+                del self._memory[key]
+
+            row = self._conn.execute(
+                "SELECT value, created_at FROM generation_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self._stats["misses"] += 1
+                return None
+
+            value, created_at = row
+            if self._expired(created_at, now):
+                self._conn.execute("DELETE FROM generation_cache WHERE key = ?", (key,))
+                self._conn.commit()
+                self._stats["misses"] += 1
+                return None
+
+            self._conn.execute("UPDATE generation_cache SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self._put_memory(key, value, created_at)
+            self._stats["disk_hits"] += 1
+            return value
+
+    def put(self, key, value):
+        now = time.time()
+        with self._lock:
+            self._put_memory(key, value, now)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO generation_cache (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, value, now, now),
+            )
+            # 디스크 용량 초과 시 가장 오래 사용되지 않은 항목부터 삭제
+            cursor = self._conn.execute("""
+                DELETE FROM generation_cache
+                WHERE key IN (
+                    SELECT key FROM generation_cache
+                    ORDER BY accessed_at DESC
+                    LIMIT -1 OFFSET ?
+                )
+                """, (self.disk_entries,))
+            self._stats["evictions"] += max(cursor.rowcount, 0)
+            self._conn.commit()
+            self._stats["puts"] += 1
+
+    def _put_memory(self, key, value, created_at):
+        self._memory[key] = (value, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._conn.execute("DELETE FROM generation_cache")
+            self._conn.commit()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["memory_size"] = len(self._memory)
+            stats["disk_size"] = self._conn.execute("SELECT COUNT(*) FROM generation_cache").fetchone()[0]
+            hits = stats["memory_hits"] + stats["disk_hits"]
+            total = hits + stats["misses"]
+            stats["hit_rate"] = hits / total if total else 0.0
+            return stats
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    global _cache
+
+    with _cache_lock:
+        if _cache is None:
+            cache_dir = os.path.join(current_dir, config.get_config('cache.dir'))
+            _cache = GenerationCache(
+                os.path.join(cache_dir, "generation_cache.sqlite3"),
+                memory_entries=config.get_config('cache.generation.memory_entries'),
+                disk_entries=config.get_config('cache.generation.disk_entries'),
+                ttl=config.get_config('cache.generation.ttl'),
+            )
+        return _cache
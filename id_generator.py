@@ -0,0 +1,73 @@
+import os
+import socket
+import threading
+import time
+import zlib
+import config
+
+# Snowflake 형태의 64bit ID
+# [1bit 부호(0)][41bit 타임스탬프(ms)][10bit 워커 ID][12bit 시퀀스]
+EPOCH_MS = 1704067200000  # 2024-01-01T00:00:00Z
+WORKER_ID_BITS = 10
+SEQUENCE_BITS = 12
+MAX_WORKER_ID = (1 << WORKER_ID_BITS) - 1
+MAX_SEQUENCE = (1 << SEQUENCE_BITS) - 1
+
+
+def _now_ms():
+    return int(time.time() * 1000)
+
+
+class IdGenerator:
+
+    def __init__(self, worker_id):
+        if not 0 <= worker_id <= MAX_WORKER_ID:
+            raise ValueError(f"worker_id must be between 0 and {MAX_WORKER_ID}: {worker_id}")
+        self.worker_id = worker_id
+        self._lock = threading.Lock()
+        self._last_ms = -1
+        self._sequence = 0
+
+    def next_id(self):
+        with self._lock:
+            now = _now_ms()
+
+            # 시계가 뒤로 간 경우 마지막 발급 시각까지 대기
+            while now < self._last_ms:
+                time.sleep((self._last_ms - now) / 1000)
+                now = _now_ms()
+
+            if now == self._last_ms:
+                self._sequence = (self._sequence + 1) & MAX_SEQUENCE
+                if self._sequence == 0:
+                    # 같은 ms 안에서 시퀀스를 모두 사용하면 다음 ms까지 대기
+                    while now <= self._last_ms:
+                        now = _now_ms()
+            else:
+                self._sequence = 0
+
+            self._last_ms = now
+            return ((now - EPOCH_MS) << (WORKER_ID_BITS + SEQUENCE_BITS)) | (self.worker_id << SEQUENCE_BITS) | self._sequence
+
+
+def _default_worker_id():
+    worker_id = config.get_config('id.worker_id')
+    if worker_id is not None:
+        return int(worker_id)
+
+    # 설정이 없으면 호스트명과 PID로 워커 ID 생성
+    seed = f"{socket.gethostname()}:{os.getpid()}".encode("utf-8")
+    return zlib.crc32(seed) & MAX_WORKER_ID
+
+
+_generator = None
+_generator_lock = threading.Lock()
+
+
+def next_id():
+    global _generator
+
+    with _generator_lock:
+        if _generator is None:
+            _generator = IdGenerator(_default_worker_id())
+    return _generator.next_id()
@@ -0,0 +1,85 @@
+from datetime import datetime, timezone
+import config
+import bq_client
+
+DATASET_ID = "metatron"
+# UPDATED_AT이 비어 있는 행은 가장 오래된 행으로 정렬 (쿼리의 TIMESTAMP_SECONDS(0)과 같은 값)
+EMPTY_UPDATED_AT = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+DATASET_PAGE_QUERY = f"""
+    SELECT
+        DS_ID,
+        DS_NAME,
+        DS_TYPE,
+        TABLE_NAME,
+        CREATED_AT,
+        UPDATED_AT
+    FROM {DATASET_ID}.dataset
+    WHERE (@search IS NULL
+           OR STRPOS(LOWER(DS_NAME), LOWER(@search)) > 0
+           OR STRPOS(LOWER(IFNULL(TABLE_NAME, '')), LOWER(@search)) > 0)
+      AND (@ds_type IS NULL OR DS_TYPE = @ds_type)
+      AND (@first_page
+           OR IFNULL(UPDATED_AT, TIMESTAMP_SECONDS(0)) < @cursor_updated_at
+           OR (IFNULL(UPDATED_AT, TIMESTAMP_SECONDS(0)) = @cursor_updated_at AND DS_ID < @cursor_id))
+    ORDER BY IFNULL(UPDATED_AT, TIMESTAMP_SECONDS(0)) DESC, DS_ID DESC
+    LIMIT @limit
+    """
+
+DATAFLOW_PAGE_QUERY = f"""
+    SELECT
+        DF_ID,
+        DF_NAME,
+        `DESC`,
+        CREATED_AT,
+        UPDATED_AT
+    FROM {DATASET_ID}.dataflow
+    WHERE (@search IS NULL
+           OR STRPOS(LOWER(DF_NAME), LOWER(@search)) > 0
+           OR STRPOS(LOWER(IFNULL(`DESC`, '')), LOWER(@search)) > 0)
+      AND (@first_page
+           OR IFNULL(UPDATED_AT, TIMESTAMP_SECONDS(0)) < @cursor_updated_at
+           OR (IFNULL(UPDATED_AT, TIMESTAMP_SECONDS(0)) = @cursor_updated_at AND DF_ID < @cursor_id))
+    ORDER BY IFNULL(UPDATED_AT, TIMESTAMP_SECONDS(0)) DESC, DF_ID DESC
+    LIMIT @limit
+    """
+
+
+def _load_page(query, id_column, cursor, page_size, extra_params, client):
+    from google.cloud import bigquery
+
+    if client is None:
+        client = bq_client.get_client()
+    if page_size is None:
+        page_size = config.get_config('list.page_size')
+
+    cursor_updated_at, cursor_id = cursor if cursor else (None, None)
+    # 다음 페이지 존재 여부 확인을 위해 1건 더 조회
+    job_config = bigquery.QueryJobConfig(
+        query_parameters=[
+            bigquery.ScalarQueryParameter("first_page", "BOOL", cursor is None),
+            bigquery.ScalarQueryParameter("cursor_updated_at", "TIMESTAMP", cursor_updated_at),
+            bigquery.ScalarQueryParameter("cursor_id", "INT64", cursor_id),
+            bigquery.ScalarQueryParameter("limit", "INT64", page_size + 1),
+        ] + [
+            bigquery.ScalarQueryParameter(name, "STRING", value or None) for name, value in extra_params.items()
+        ]
+    )
+    print(f"쿼리 실행 : {query}")
+    table = client.query(query, job_config=job_config).result().to_arrow()
+
+    next_cursor = None
+    if table.num_rows > page_size:
+        table = table.slice(0, page_size)
+        last = table.slice(page_size - 1, 1).to_pylist()[0]
+        next_cursor = (last["UPDATED_AT"] or EMPTY_UPDATED_AT, last[id_column])
+    return table, next_cursor
+
+
+def load_dataset_page(cursor=None, search=None, ds_type=None, page_size=None, client=None):
+    # UPDATED_AT 기준 키셋 페이지네이션 (검색/필터는 SQL에서 처리)
+    return _load_page(DATASET_PAGE_QUERY, "DS_ID", cursor, page_size, {"search": search, "ds_type": ds_type}, client)
+
+
+def load_dataflow_page(cursor=None, search=None, page_size=None, client=None):
+    return _load_page(DATAFLOW_PAGE_QUERY, "DF_ID", cursor, page_size, {"search": search}, client)
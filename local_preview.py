@@ -0,0 +1,193 @@
+import json
+import os
+import threading
+import time
+import config
+import bq_client
+import cost_guard
+import sql_fingerprint
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+
+DATASET_ID = "metatron"
+
+# 블록 단위 임의 샘플 (선택된 블록만 스캔, 테이블 전체 기간에서 고르게 추출)
+SAMPLE_QUERY = """
+    SELECT *
+    FROM `{dataset_id}.{table_name}` TABLESAMPLE SYSTEM ({percent} PERCENT)
+    LIMIT {rows}
+    """
+
+_duckdb_available = None
+
+
+def is_available():
+    # duckdb, sqlglot은 선택 설치 (없으면 BigQuery로만 실행), import 실패는 매번 시도하지 않도록 결과 보관
+    global _duckdb_available
+
+    if _duckdb_available is None:
+        try:
+            import duckdb  # noqa: F401
+            _duckdb_available = True
+        except ImportError:
+            _duckdb_available = False
+    return _duckdb_available and sql_fingerprint.is_available()
+
+
+def transpile(sql_query):
+    # BigQuery SQL을 DuckDB SQL로 변환하고 참조하는 metatron 테이블 목록을 반환
+    import sqlglot
+    from sqlglot import exp
+    from sqlglot.errors import ErrorLevel
+
+    expression = sqlglot.parse_one(sql_query, read="bigquery")
+    if not isinstance(expression, exp.Query):
+        raise ValueError("SELECT 문만 로컬에서 실행할 수 있습니다.")
+
+    cte_names = {cte.alias_or_name.lower() for cte in expression.find_all(exp.CTE)}
+    tables = []
+    for table in expression.find_all(exp.Table):
+        if not table.db and table.name.lower() in cte_names:
+            continue
+        if table.db.lower() != DATASET_ID:
+            raise ValueError(f"{table.sql(dialect='bigquery')} 은(는) {DATASET_ID} 데이터셋 테이블이 아닙니다.")
+        # 프로젝트 이름은 로컬에서 사용하지 않음
+        table.set("catalog", None)
+        if table.name.lower() not in tables:
+            tables.append(table.name.lower())
+
+    return expression.sql(dialect="duckdb", unsupported_level=ErrorLevel.RAISE), tables
+
+
+class SampleStore:
+    # 테이블별 샘플을 Parquet으로 보관하고 max_age 동안 재사용 (계속 적재되는 테이블도 미리보기마다 다시 받지 않음)
+    # 샘플 행 수보다 작은 테이블은 tabledata.list로 전체를, 큰 테이블은 TABLESAMPLE로 임의 블록을 가져옴
+
+    def __init__(self, directory, sample_rows=100000, max_age=86400):
+        self.directory = directory
+        self.sample_rows = sample_rows
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._table_locks = {}
+
+    def _table_lock(self, table_name):
+        with self._lock:
+            return self._table_locks.setdefault(table_name, threading.Lock())
+
+    def path(self, table_name):
+        return os.path.join(self.directory, f"{table_name}.parquet")
+
+    def _read_meta(self, table_name):
+        try:
+            with open(f"{self.path(table_name)}.json", encoding="utf-8") as meta_file:
+                return json.load(meta_file)
+        except (OSError, ValueError):
+            return None
+
+    def _is_fresh(self, meta):
+        if meta is None or not os.path.exists(meta["path"]):
+            return False
+        return time.time() - meta["sampled_at"] <= self.max_age
+
+    def _sample(self, source, client):
+        from google.cloud import bigquery
+
+        if not source.num_rows or source.num_rows <= self.sample_rows:
+            return client.list_rows(source, max_results=self.sample_rows).to_arrow(create_bqstorage_client=False)
+
+        # 블록 단위 샘플이라 행 수가 모자랄 수 있으므로 여유 있게 뽑고 LIMIT으로 자름
+        percent = min(100.0, self.sample_rows * 2 * 100 / source.num_rows)
+        sql_query = SAMPLE_QUERY.format(dataset_id=DATASET_ID, table_name=source.table_id, percent=f"{percent:.6f}", rows=self.sample_rows)
+        print(f"쿼리 실행 : {sql_query}")
+        job_config = cost_guard.apply_limits(bigquery.QueryJobConfig())
+        sample = client.query(sql_query, job_config=job_config).result().to_arrow(
+            bqstorage_client=bq_client.get_bqstorage_client(),
+            create_bqstorage_client=False,
+        )
+        if sample.num_rows == 0:
+            # 선택된 블록이 없으면 앞부분이라도 사용
+            return client.list_rows(source, max_results=self.sample_rows).to_arrow(create_bqstorage_client=False)
+        return sample
+
+    def ensure(self, table_name, client):
+        import pyarrow.parquet as pq
+
+        with self._table_lock(table_name):
+            meta = self._read_meta(table_name)
+            if self._is_fresh(meta):
+                return meta
+
+            print(f"로컬 샘플 생성 : {DATASET_ID}.{table_name} ({self.sample_rows}행)")
+            source = client.get_table(f"{DATASET_ID}.{table_name}")
+            os.makedirs(self.directory, exist_ok=True)
+            sample = self._sample(source, client)
+            path = self.path(table_name)
+            pq.write_table(sample, f"{path}.tmp")
+            os.replace(f"{path}.tmp", path)
+
+            meta = {
+                "path": path,
+                "rows": sample.num_rows,
+                "source_rows": source.num_rows,
+                "sampled_at": time.time(),
+            }
+            with open(f"{path}.json", "w", encoding="utf-8") as meta_file:
+                json.dump(meta, meta_file)
+            return meta
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    global _store
+
+    with _store_lock:
+        if _store is None:
+            _store = SampleStore(
+                os.path.join(current_dir, config.get_config('local_preview.dir')),
+                config.get_config('local_preview.sample_rows'),
+                config.get_config('local_preview.max_age'),
+            )
+        return _store
+
+
+def preview_query(sql_query, max_rows=None, client=None):
+    # 샘플 테이블로 DuckDB에서 실행, 실패하면 error에 사유를 담아 반환 (호출 측에서 BigQuery로 실행)
+    if max_rows is None:
+        max_rows = config.get_config('local_preview.max_rows')
+    result = {"error": None, "table": None, "sample_rows": {}, "local_sql": None}
+
+    if not is_available():
+        result["error"] = "duckdb/sqlglot이 설치되어 있지 않습니다."
+        return result
+
+    try:
+        result["local_sql"], tables = transpile(sql_query)
+    except Exception as e:
+        result["error"] = f"SQL 변환 실패 : {e}"
+        return result
+
+    import duckdb
+
+    if client is None:
+        client = bq_client.get_client()
+
+    connection = duckdb.connect()
+    try:
+        connection.execute(f"CREATE SCHEMA {DATASET_ID}")
+        for table_name in tables:
+            meta = get_store().ensure(table_name, client)
+            result["sample_rows"][table_name] = meta["rows"]
+            parquet_path = meta["path"].replace("'", "''")
+            connection.execute(f"CREATE VIEW {DATASET_ID}.\"{table_name}\" AS SELECT * FROM read_parquet('{parquet_path}')")
+
+        print(f"로컬 미리보기 실행 : {result['local_sql']}")
+        result["table"] = connection.execute(result["local_sql"]).fetch_arrow_table().slice(0, max_rows)
+    except Exception as e:
+        print(f"Error: {e}")
+        result["error"] = f"로컬 실행 실패 : {e}"
+    finally:
+        connection.close()
+    return result
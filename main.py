@@ -8,10 +8,13 @@ st.set_page_config(
     layout="wide",
 )
 
-# 앱이 실행될 때 한 번만 호출되도록 설정
-if 'initialized' not in st.session_state:
+# 앱이 실행될 때 한 번만 호출되도록 설정 (세션이 아닌 프로세스 단위)
+@st.cache_resource
+def bootstrap():
     be.on_app_start()
-    st.session_state['initialized'] = True
+    return True
+
+bootstrap()
 
 
 st.title("Text2SQL Generator")
@@ -0,0 +1,105 @@
+import config
+import bq_client
+import cost_guard
+import result_cache
+import sql_fingerprint
+
+DATASET_ID = "metatron"
+TABLE_PREFIX = "dataset_"
+
+def table_name_for(ds_id):
+    # get_filtered_tables에서 제외되는 DATASET_ 접두어 사용
+    return f"{TABLE_PREFIX}{ds_id}"
+
+
+def sql_hash(sql_query):
+    # 표기만 다른 룰은 같은 결과 테이블로 취급
+    return sql_fingerprint.fingerprint(sql_query)
+
+
+def ctas_target(sql_query):
+    return sql_fingerprint.ctas_target(sql_query)
+
+
+def output_table(ds_id, sql_query):
+    # CTAS 룰은 CTAS 대상 테이블, 그 외는 관리 테이블에 결과 저장
+    return ctas_target(sql_query) or f"{DATASET_ID}.{table_name_for(ds_id)}"
+
+
+def _description(sql_query):
+    return f"rule_sql_hash={sql_hash(sql_query)}"
+
+
+def materialize(ds_id, sql_query, client=None):
+    from google.cloud import bigquery
+
+    if client is None:
+        client = bq_client.get_client()
+
+    target = output_table(ds_id, sql_query)
+    if ctas_target(sql_query):
+        statement = sql_query
+    else:
+        expiration_hours = config.get_config('materialize.expiration_hours')
+        statement = f"""
+            CREATE OR REPLACE TABLE `{target}`
+            OPTIONS(
+                expiration_timestamp = TIMESTAMP_ADD(CURRENT_TIMESTAMP(), INTERVAL {expiration_hours} HOUR),
+                description = '{_description(sql_query)}'
+            )
+            AS {sql_query.strip().rstrip(';')}
+            """
+
+    # 미리보기/데이터플로우 실행도 대화형 실행과 같은 비용 기준 적용 (확인 단계는 없으므로 차단 기준만 확인)
+    estimate = cost_guard.estimate_query(sql_query, client=client)
+    if cost_guard.check_cost(estimate) == cost_guard.BLOCK:
+        raise ValueError(estimate["error"] or f"예상 처리량({cost_guard.format_bytes(estimate['bytes_processed'])})이 허용 한도를 초과하여 {target} 을(를) 생성하지 않았습니다.")
+
+    print(f"쿼리 실행 : {statement}")
+    client.query(statement, job_config=cost_guard.apply_limits(bigquery.QueryJobConfig())).result()
+    # 결과 테이블을 참조하는 캐시된 결과 무효화
+    result_cache.get_cache().invalidate_table(target)
+    return target
+
+
+def is_fresh(ds_id, sql_query, client=None):
+    # 결과 테이블이 현재 룰로 만들어졌고, 원본 테이블보다 나중에 갱신되었는지 확인
+    if client is None:
+        client = bq_client.get_client()
+
+    target = output_table(ds_id, sql_query)
+    try:
+        table = client.get_table(target)
+    except Exception:
+        return False
+
+    # CTAS 룰은 실행 시점에 대상 테이블이 만들어지므로 존재 여부만 확인
+    if ctas_target(sql_query):
+        return True
+    if table.description != _description(sql_query):
+        return False
+
+    dry_run_job = cost_guard.dry_run(sql_query, client=client)
+    for table_ref in dry_run_job.referenced_tables:
+        source = client.get_table(table_ref)
+        if source.modified and table.modified and source.modified > table.modified:
+            return False
+    return True
+
+
+def ensure_materialized(ds_id, sql_query, client=None):
+    if client is None:
+        client = bq_client.get_client()
+
+    if is_fresh(ds_id, sql_query, client):
+        return output_table(ds_id, sql_query)
+    return materialize(ds_id, sql_query, client)
+
+
+def preview(ds_id, sql_query, max_results=10, client=None):
+    # 결과 테이블에서 tabledata.list로 읽으므로 쿼리 작업/스캔 비용 없음
+    if client is None:
+        client = bq_client.get_client()
+
+    target = ensure_materialized(ds_id, sql_query, client)
+    return client.list_rows(target, max_results=max_results).to_arrow()
@@ -1,8 +1,14 @@
 import streamlit as st
-import config
+import bq_client
+import dataflow_dag
+import dataset_detail
+import list_loader
+import id_generator
+import schema_catalog
+import telemetry
+import write_buffer
 from google.cloud import bigquery
 from streamlit_flow import streamlit_flow
-from streamlit_flow.elements import StreamlitFlowNode, StreamlitFlowEdge
 from datetime import datetime, timezone
 import pandas as pd
 import pytz
@@ -17,64 +23,45 @@ st.set_page_config(
 if 'page' not in st.session_state:
     st.session_state['page'] = 'list'
 
+# 이 세션에서 실행되는 BigQuery 작업을 세션 단위로 집계
+telemetry.bind_session(st.session_state)
+
 # BigQuery 클라이언트 설정
 def get_bq_client():
-    print('Connected to BigQuery!')
-    return bigquery.Client(location=config.get_config('bigquery.region'))
+    return bq_client.get_client()
 
-def load_dataflow_list():
+def load_dataflow_list(cursor=None, search=None):
     try:
-        client = get_bq_client()
-        query = """
-            SELECT
-                DF_ID,
-                DF_NAME,
-                `DESC`,
-                CREATED_AT,
-                UPDATED_AT
-            FROM metatron.dataflow
-            ORDER BY UPDATED_AT DESC
-            """
-        print(f'쿼리 실행 : {query}')
-        query_job = client.query(query)
-        results = query_job.result()
-        
-        # 쿼리 결과 출력
-        # df = pd.DataFrame([dict(row) for row in results])
-        # print(df)
-
-        if results:
-            columns = [field.name for field in results.schema]
-            rows = [list(row.values()) for row in results]
+        return list_loader.load_dataflow_page(cursor, search)
 
-        return columns, rows
-    
     except Exception as e:
         print(f"Error: {e}")
         return None, None
-    
-    finally:
-        client.close()
 
-def show_dataflow_list(columns, rows):
-    if rows:
-        dataflow_grid = st.columns((1,2,2,2,1))
-        fields = ["ID", "이름", "설명", "최종 수정일시", "상세"]
-        # header
-        for col, field_name in zip(dataflow_grid, fields):
-            col.write(field_name)
-        # rows
-        for index, row in enumerate(rows):
-            col1, col2, col3, col4, col5 = st.columns((1,2,2,2,1))
-            col1.write(row[columns.index('DF_ID')])
-            col2.write(row[columns.index('DF_NAME')])
-            col3.write(row[columns.index('DESC')])
-            updated_at_kst = row[columns.index('UPDATED_AT')].astimezone(pytz.timezone('Asia/Seoul'))
-            col4.write(updated_at_kst.strftime('%Y-%m-%d %H:%M:%S'))
-            detail_button_phold = col5.empty()
-            show_detail = detail_button_phold.button("상세", key=f"dataflow_detail_{index}")
-            if show_detail:
-                st.session_state['selected_id'] = row[columns.index('DF_ID')]
+def show_dataflow_list(table):
+    if table is not None and table.num_rows:
+        # 위젯을 행마다 만들지 않고 하나의 그리드에서 행 선택
+        df = table.to_pandas()
+        df['UPDATED_AT'] = df['UPDATED_AT'].dt.tz_convert(pytz.timezone('Asia/Seoul')).dt.strftime('%Y-%m-%d %H:%M:%S')
+        event = st.dataframe(
+            df[['DF_ID', 'DF_NAME', 'DESC', 'UPDATED_AT']],
+            column_config={
+                'DF_ID': st.column_config.TextColumn("ID"),
+                'DF_NAME': "이름",
+                'DESC': "설명",
+                'UPDATED_AT': "최종 수정일시",
+            },
+            hide_index=True,
+            use_container_width=True,
+            on_select="rerun",
+            selection_mode="single-row",
+            key="dataflow_grid",
+        )
+
+        if event.selection.rows:
+            selected = table.slice(event.selection.rows[0], 1).to_pylist()[0]
+            if st.button("상세", key="dataflow_detail"):
+                st.session_state['selected_id'] = selected['DF_ID']
                 st.session_state['page'] = 'details'
                 st.rerun()
 
@@ -110,8 +97,6 @@ def load_dataset_list(df_id):
         print(f"Error: {e}")
         return None, None
     
-    finally:
-        client.close()
 
 def show_dataset_list(columns, rows):
     if rows:
@@ -165,23 +150,35 @@ def get_dataset_list():
     except Exception as e:
         print(f"Error: {e}")
         return None, None
-    finally:
-        client.close()
 
 def show_list():
     st.title('Dataflow 설정')
 
-    if 'dataflow_list_columns' not in st.session_state or 'dataflow_list_rows' not in st.session_state:
-        columns, rows = load_dataflow_list()
-        st.session_state.dataflow_list_columns = columns
-        st.session_state.dataflow_list_rows = rows
-    else:
-        columns = st.session_state.dataflow_list_columns
-        rows = st.session_state.dataflow_list_rows
-    
-    st.write(f'{len(rows)}개의 데이터가 있습니다.')
-
-    show_dataflow_list(columns, rows)
+    # 검색 (SQL 조건으로 처리)
+    search = st.text_input("검색", key="dataflow_search")
+    if st.session_state.get('dataflow_list_search') != search:
+        st.session_state.dataflow_list_search = search
+        st.session_state.dataflow_list_cursors = [None]
+    if 'dataflow_list_pages' not in st.session_state:
+        st.session_state.dataflow_list_pages = {}
+
+    # 조회한 페이지는 세션에 보관하고 다시 그릴 때 재사용
+    cursors = st.session_state.dataflow_list_cursors
+    page_key = (search, cursors[-1])
+    if page_key not in st.session_state.dataflow_list_pages:
+        st.session_state.dataflow_list_pages[page_key] = load_dataflow_list(cursors[-1], search)
+    table, next_cursor = st.session_state.dataflow_list_pages[page_key]
+
+    show_dataflow_list(table)
+
+    prev_col, page_col, next_col = st.columns((1,6,1))
+    page_col.write(f"{len(cursors)} 페이지")
+    if prev_col.button("이전", disabled=len(cursors) == 1, key="dataflow_list_prev"):
+        cursors.pop()
+        st.rerun()
+    if next_col.button("다음", disabled=next_cursor is None, key="dataflow_list_next"):
+        cursors.append(next_cursor)
+        st.rerun()
     
     if st.button("데이터플로우 추가"):
         @st.experimental_dialog("Dataflow 생성")
@@ -202,65 +199,42 @@ def show_list():
                 else:
                     try:
                         # dataflow 추가
-                        query = """
-                            SELECT COALESCE(MAX(df_id), 0) + 1 AS next_df_id
-                            FROM `metatron.dataflow`
-                        """
-                        print(f'쿼리 실행 : {query}')
-                        client = get_bq_client()
-                        query_job = client.query(query)
-                        next_df_id = [row.next_df_id for row in query_job.result()][0]
+                        next_df_id = id_generator.next_id()
                         print(f'next_df_id : {next_df_id}')
                         current_time = datetime.now(timezone.utc)
-                        df = pd.DataFrame({
-                            "df_id": [next_df_id],
-                            "df_name": [dataflow_name],
-                            "desc": [dataflow_desc],
-                            "created_at": [current_time],
-                            "updated_at": [current_time]
+                        write_buffer.enqueue("dataflow", {
+                            "df_id": next_df_id,
+                            "df_name": dataflow_name,
+                            "desc": dataflow_desc,
+                            "created_at": current_time,
+                            "updated_at": current_time
                         })
 
                         # dataset_dataflow 추가
-                        query = """
-                            SELECT COALESCE(MAX(id), 0) + 1 AS next_id
-                            FROM `metatron.dataset_dataflow`
-                        """
-                        print(f'쿼리 실행 : {query}')
-                        df_table_ref = client.dataset("metatron").table("dataflow")
-                        df_table = client.get_table(df_table_ref)
-
-                        query_job = client.query(query)
-                        next_id = [row.next_id for row in query_job.result()][0]
+                        next_id = id_generator.next_id()
                         print(f'next_id : {next_id}')
-                        dsdf = pd.DataFrame({
-                            "id": [next_id],
-                            "df_id": [next_df_id],
-                            "ds_id": [selected_dataset["id"]],
-                            "created_at": [current_time],
-                            "updated_at": [current_time]
+                        write_buffer.enqueue("dataset_dataflow", {
+                            "id": next_id,
+                            "df_id": next_df_id,
+                            "ds_id": selected_dataset["id"],
+                            "created_at": current_time,
+                            "updated_at": current_time
                         })
 
-                        df_table_ref = client.dataset("metatron").table("dataflow")
-                        df_table = client.get_table(df_table_ref)
-
-                        dsdf_table_ref = client.dataset("metatron").table("dataset_dataflow")
-                        dsdf_table = client.get_table(dsdf_table_ref)
-
+                        # 목록을 다시 읽기 전에 버퍼를 바로 반영
                         with st.spinner("데이터플로우를 추가하는 중..."):
-                            df_load_job = client.load_table_from_dataframe(df, df_table)
-                            dsdf_load_job_ = client.load_table_from_dataframe(dsdf, dsdf_table)
-                            df_load_job.result()
-                            dsdf_load_job_.result()
+                            write_buffer.flush()
                             
-                        del st.session_state.dataflow_list_columns
-                        del st.session_state.dataflow_list_rows
+                        st.session_state.pop('dataflow_list_pages', None)
+                        st.session_state.dataflow_list_cursors = [None]
+                        dataset_detail.invalidate_usage()
+                        # 같은 데이터플로우의 데이터셋은 프롬프트/검증에 사용할 테이블 목록이 바뀜
+                        schema_catalog.get_catalog().invalidate()
                         
                         st.rerun()
                     except Exception as e:
                         print(f"Error: {e}")
                         return None, None
-                    finally:
-                        client.close()
                     
         modal_dialog()
 
@@ -282,113 +256,82 @@ def show_details():
                 else:
                     try:
                         # dataset 추가
-                        query = """
-                            SELECT COALESCE(MAX(ds_id), 0) + 1 AS next_ds_id
-                            FROM `metatron.dataset`
-                        """
-                        print(f'쿼리 실행 : {query}')
-                        client = get_bq_client()
-                        query_job = client.query(query)
-                        next_ds_id = [row.next_ds_id for row in query_job.result()][0]
+                        next_ds_id = id_generator.next_id()
                         print(f'next_ds_id : {next_ds_id}')
                         current_time = datetime.now(timezone.utc)
-                        ds = pd.DataFrame({
-                            "ds_id": [next_ds_id],
-                            "ds_name": [dataset_name],
-                            "ds_type": ["Wrangled"],
-                            "created_at": [current_time],
-                            "updated_at": [current_time]
+                        write_buffer.enqueue("dataset", {
+                            "ds_id": next_ds_id,
+                            "ds_name": dataset_name,
+                            "ds_type": "Wrangled",
+                            "created_at": current_time,
+                            "updated_at": current_time
                         })
 
                         # dataset_dataflow 추가
-                        query = """
-                            SELECT COALESCE(MAX(id), 0) + 1 AS next_id
-                            FROM `metatron.dataset_dataflow`
-                        """
-                        print(f'쿼리 실행 : {query}')
-                        df_table_ref = client.dataset("metatron").table("dataflow")
-                        df_table = client.get_table(df_table_ref)
-
-                        query_job = client.query(query)
-                        next_id = [row.next_id for row in query_job.result()][0]
+                        next_id = id_generator.next_id()
                         print(f'next_id : {next_id}')
-                        dsdf = pd.DataFrame({
-                            "id": [next_id],
-                            "df_id": [selected_df_id], # TODO: 현재 df_id 맞는지?
-                            "ds_id": [next_ds_id],
-                            "created_at": [current_time],
-                            "updated_at": [current_time]
+                        write_buffer.enqueue("dataset_dataflow", {
+                            "id": next_id,
+                            "df_id": selected_df_id, # TODO: 현재 df_id 맞는지?
+                            "ds_id": next_ds_id,
+                            "created_at": current_time,
+                            "updated_at": current_time
                         })
 
-                        ds_table_ref = client.dataset("metatron").table("dataset")
-                        ds_table = client.get_table(ds_table_ref)
-
-                        dsdf_table_ref = client.dataset("metatron").table("dataset_dataflow")
-                        dsdf_table = client.get_table(dsdf_table_ref)
-
+                        # 목록을 다시 읽기 전에 버퍼를 바로 반영
                         with st.spinner("데이터셋을 추가하는 중..."):
-                            ds_load_job = client.load_table_from_dataframe(ds, ds_table)
-                            dsdf_load_job_ = client.load_table_from_dataframe(dsdf, dsdf_table)
-                            ds_load_job.result()
-                            dsdf_load_job_.result()
+                            write_buffer.flush()
                             
-                        del st.session_state.dataflow_list_columns
-                        del st.session_state.dataflow_list_rows
+                        st.session_state.pop('dataflow_list_pages', None)
+                        st.session_state.dataflow_list_cursors = [None]
+                        dataset_detail.invalidate_usage()
+                        # 같은 데이터플로우의 데이터셋은 프롬프트/검증에 사용할 테이블 목록이 바뀜
+                        schema_catalog.get_catalog().invalidate()
                         
                         st.rerun()
                     except Exception as e:
                         print(f"Error: {e}")
                         return None, None
-                    finally:
-                        client.close()
                     
         modal_dialog()
 
-    # 임시 하드코딩 영역
-    # nodes = [StreamlitFlowNode(id='1', pos=(100, 100), data={'id': 'text2sql-0', 'label': 'adot_applog_prd_all', 'type': 'IMPORTED', 'database': 'metatron', 'table': 'adot_applog_prd_all'}, node_type='input', source_position='right', draggable=False),
-    #         StreamlitFlowNode('2', (275, 50), {'id': 'text2sql-1', 'label': '01. 데이터 클렌징', 'type': 'WRANGLED'}, 'default', 'right', 'left', draggable=False),
-    #         StreamlitFlowNode('3', (275, 150), {'id': 'text2sql-2', 'label': '02. 데이터 집계', 'type': 'WRANGLED'}, 'default', 'right', 'left', draggable=False)]
-
-    # edges = [StreamlitFlowEdge('1-2', '1', '2', animated=True),
-    #         StreamlitFlowEdge('1-3', '1', '3', animated=True)]
-
-    # selected_id = streamlit_flow('ret_val_flow',
-    #                 nodes,
-    #                 edges,
-    #                 fit_view=True,
-    #                 get_node_on_click=True,
-    #                 get_edge_on_click=True)
-
-    # # TODO
-    # def add_new_dataset():
-    #     print()
-
-    # def display_node_info(node_id):
-    #     node = next((node for node in nodes if node.id == node_id), None)
-    #     data = []
-    #     if node:
-    #         node_data = {
-    #             '이름': node.data['label'],
-    #             '타입': node.data['type']
-    #         }
-    #         if node.data['type'] == 'IMPORTED':
-    #             node_data['데이터베이스'] = node.data['database']
-    #             node_data['테이블'] = node.data['table']
-
-    #         data.append(node_data)
-    #         df = pd.DataFrame(data)
-
-    #         st.dataframe(df)
-
-    #         if node.data['type'] == 'IMPORTED':
-    #             st.button("새로운 데이터셋 생성", type="primary", on_click=add_new_dataset)
-    #         elif node.data['type'] == 'WRANGLED':
-    #             id = node.data['id']
-    #             link = st.link_button("룰 편집", type="primary", url=f"http://localhost:8501/sql_generator/?workflow_name={id}")
-
-    # if selected_id:
-    #     display_node_info(selected_id)
-    # 임시 하드코딩 영역 끝
+    # 데이터플로우 그래프
+    dag = dataflow_dag.load_dag(selected_df_id)
+    if 'dataflow_status' not in st.session_state:
+        st.session_state['dataflow_status'] = {}
+    status = st.session_state['dataflow_status'].get(selected_df_id)
+
+    # 룰끼리 서로의 결과 테이블을 참조하면 실행 순서를 정할 수 없음
+    try:
+        dag.levels()
+    except ValueError as e:
+        st.error(f"데이터플로우에 순환 참조가 있어 실행 순서를 정할 수 없습니다. ({e})")
+
+    flow_nodes, flow_edges = dataflow_dag.to_flow_elements(dag, status)
+    selected_node_id = None
+    if flow_nodes:
+        selected_node_id = streamlit_flow('dataflow_graph',
+                        flow_nodes,
+                        flow_edges,
+                        fit_view=True,
+                        get_node_on_click=True)
+
+    # 전체 실행 또는 선택한 노드와 그 하위 노드만 재실행
+    changed = None
+    run_flow = st.button('전체 실행')
+    if selected_node_id and selected_node_id.isdigit():
+        if st.button('선택 데이터셋부터 재실행'):
+            changed = [int(selected_node_id)]
+            run_flow = True
+
+    if run_flow:
+        try:
+            with st.spinner("데이터플로우를 실행하는 중..."):
+                status = dag.execute(changed=changed)
+            st.session_state['dataflow_status'][selected_df_id] = status
+            st.rerun()
+        except ValueError as e:
+            st.error(f"데이터플로우를 실행하지 않았습니다. ({e})")
     
     # show grid
     columns, rows = load_dataset_list(selected_df_id)
@@ -1,7 +1,11 @@
 import streamlit as st
 import pandas as pd
-from google.cloud import bigquery
-import config
+import bq_client
+import id_generator
+import list_loader
+import dataset_detail
+import telemetry
+import write_buffer
 from datetime import datetime, timezone
 import pytz
 
@@ -14,9 +18,12 @@ st.set_page_config(
 
 kst = pytz.timezone('Asia/Seoul')
 
+# 이 세션에서 실행되는 BigQuery 작업을 세션 단위로 집계
+telemetry.bind_session(st.session_state)
+
 # BigQuery 클라이언트 설정
 def get_bq_client():
-    return bigquery.Client(location=config.get_config('bigquery.region'))
+    return bq_client.get_client()
 
 # @st.cache_data(ttl=300)
 def get_filtered_tables():
@@ -39,37 +46,14 @@ def get_filtered_tables():
     except Exception as e:
         print(f"Error: {e}")
         return None, None
-    finally:
-        client.close()
 
-def load_dataset_list():
+def load_dataset_list(cursor=None, search=None, ds_type=None):
     try:
-        client = get_bq_client()
-        query = """
-            SELECT
-                DS_ID,
-                DS_NAME,
-                DS_TYPE,
-                TABLE_NAME,
-                CREATED_AT,
-                UPDATED_AT
-            FROM metatron.dataset
-            ORDER BY UPDATED_AT DESC
-            """
-        query_job = client.query(query)
-        results = query_job.result()
+        return list_loader.load_dataset_page(cursor, search, ds_type)
 
-        columns = [field.name for field in results.schema]
-        rows = [list(row.values()) for row in results]
-
-        return columns, rows
-    
     except Exception as e:
         print(f"Error: {e}")
         return None, None
-    
-    finally:
-        client.close()
 
 def show_dataset_detail_usage(columns, rows):
     if rows:
@@ -110,97 +94,86 @@ def show_dataset_detail(columns, row):
             ds_type = row[columns.index('DS_TYPE')]
             ds_id = row[columns.index('DS_ID')]
 
-            client = get_bq_client()
-            if ds_type == 'Imported':
-                query1 = f"""
-                SELECT * FROM `metatron.{table_name}` LIMIT 10
-                """
-            elif ds_type == 'Wrangled':
-                pre_query = f"""
-                SELECT result_sql FROM `metatron.rule`
-                # WHERE ds_id = {ds_id}
-                ORDER BY rule_id DESC
-                LIMIT 1
-                """
-
-                with st.spinner("데이터를 불러오는 중..."):
-                    pre_query_job = client.query(pre_query)
-                    pre_result = pre_query_job.result()
-
-                for data in pre_result:
-                    query1 = data["result_sql"]
-                if 'LIMIT' not in query1.upper():
-                    query1 += ' LIMIT 10'    
-
+            # 미리보기와 사용처를 한 번에 조회
             with st.spinner("데이터를 불러오는 중..."):
-                query_job1 = client.query(query1)
-                results1 = query_job1.result()
-
-                df1 = results1.to_dataframe()
-                st.session_state.dataset_detail_data = df1
+                detail = dataset_detail.load_detail(ds_id, ds_type, table_name)
+                st.session_state.dataset_detail_data = detail["data"]
 
                 st.write("데이터")
-                # st.write(df1)
                 st.write(st.session_state.dataset_detail_data)
 
-            query2 = f"""
-                SELECT * FROM `metatron.dataflow`
-                WHERE df_id IN (SELECT df_id FROM `metatron.dataset_dataflow` WHERE ds_id = {ds_id})
-            """
-            print(query2)
-
-            with st.spinner("데이터를 불러오는 중..."):
-                query_job2 = client.query(query2)
-                results2 = query_job2.result()
-
-            columns2 = [field.name for field in results2.schema]
-            rows2 = [list(row2.values()) for row2 in results2]
+            columns2 = detail["usage_columns"]
+            rows2 = detail["usage_rows"]
 
             show_dataset_detail_usage(columns2, rows2)
 
         except Exception as e:
             print(f"Error: {e}")
             return None, None
-        finally:
-            client.close()
 
     modal_dialog()
 
-def show_dataset_list(columns, rows):
-    if rows:
-        df = pd.DataFrame(rows, columns=columns)
-        colms = st.columns((2,1,2,2,1))
-        fields = ["이름", "타입", "소스", "최종 수정일시", "상세"]
-        for col, field_name in zip(colms, fields):
-            #header
-            col.write(field_name)
-        
-        for index, row in enumerate(rows):
-            col1, col2, col3, col4, col5 = st.columns((2,1,2,2,1))
-            col1.write(row[columns.index('DS_NAME')])
-            col2.write(row[columns.index('DS_TYPE')])
-            col3.write(row[columns.index('TABLE_NAME')])
-            updated_at_kst = row[columns.index('UPDATED_AT')].astimezone(kst)
-            col4.write(updated_at_kst.strftime('%Y-%m-%d %H:%M:%S'))
-            detail_button_phold = col5.empty()
-            show_detail = detail_button_phold.button("상세", key=f"dataset_detail_{index}")
-            if show_detail:
-                show_dataset_detail(columns, row)
+def show_dataset_list(table):
+    if table is not None and table.num_rows:
+        # 위젯을 행마다 만들지 않고 하나의 그리드에서 행 선택
+        df = table.to_pandas()
+        df['UPDATED_AT'] = df['UPDATED_AT'].dt.tz_convert(kst).dt.strftime('%Y-%m-%d %H:%M:%S')
+        event = st.dataframe(
+            df[['DS_NAME', 'DS_TYPE', 'TABLE_NAME', 'UPDATED_AT']],
+            column_config={
+                'DS_NAME': "이름",
+                'DS_TYPE': "타입",
+                'TABLE_NAME': "소스",
+                'UPDATED_AT': "최종 수정일시",
+            },
+            hide_index=True,
+            use_container_width=True,
+            on_select="rerun",
+            selection_mode="single-row",
+            key="dataset_grid",
+        )
+
+        if event.selection.rows:
+            columns = table.column_names
+            selected = table.slice(event.selection.rows[0], 1).to_pylist()[0]
+            if st.button("상세", key="dataset_detail"):
+                show_dataset_detail(columns, [selected[column] for column in columns])
 
 
 def main():
     st.title("Dataset 설정")
 
-    if 'dataset_list_columns' not in st.session_state or 'dataset_list_rows' not in st.session_state:
-        columns, rows = load_dataset_list()
-        st.session_state.dataset_list_columns = columns
-        st.session_state.dataset_list_rows = rows
-    else:
-        columns = st.session_state.dataset_list_columns
-        rows = st.session_state.dataset_list_rows
-    
-    # show_dataset_list(columns, rows)
-    show_dataset_list(columns, rows)
+    # 검색/필터 (SQL 조건으로 처리)
+    search_col, type_col = st.columns((3,1))
+    search = search_col.text_input("검색", key="dataset_search")
+    ds_type = type_col.selectbox("타입", ["전체", "Imported", "Wrangled"], key="dataset_type")
+    if ds_type == "전체":
+        ds_type = None
+
+    filters = (search, ds_type)
+    if st.session_state.get('dataset_list_filters') != filters:
+        st.session_state.dataset_list_filters = filters
+        st.session_state.dataset_list_cursors = [None]
+    if 'dataset_list_pages' not in st.session_state:
+        st.session_state.dataset_list_pages = {}
+
+    # 조회한 페이지는 세션에 보관하고 다시 그릴 때 재사용
+    cursors = st.session_state.dataset_list_cursors
+    page_key = (filters, cursors[-1])
+    if page_key not in st.session_state.dataset_list_pages:
+        st.session_state.dataset_list_pages[page_key] = load_dataset_list(cursors[-1], search, ds_type)
+    table, next_cursor = st.session_state.dataset_list_pages[page_key]
+
+    show_dataset_list(table)
+
+    prev_col, page_col, next_col = st.columns((1,6,1))
+    page_col.write(f"{len(cursors)} 페이지")
+    if prev_col.button("이전", disabled=len(cursors) == 1, key="dataset_list_prev"):
+        cursors.pop()
+        st.rerun()
+    if next_col.button("다음", disabled=next_cursor is None, key="dataset_list_next"):
+        cursors.append(next_cursor)
+        st.rerun()
 
     # "데이터셋 추가" 버튼 클릭 시 다이얼로그 표시
     if st.button("데이터셋 추가", type='primary'):
@@ -216,39 +189,28 @@ def main():
                     st.error("데이터셋 이름을 입력해주세요.")
                 else:
                     try:
-                        query = """
-                            SELECT COALESCE(MAX(ds_id), 0) + 1 AS next_ds_id
-                            FROM `metatron.dataset`
-                        """
-                        client = get_bq_client()
-                        query_job = client.query(query)
-                        next_ds_id = [row.next_ds_id for row in query_job.result()][0]
+                        next_ds_id = id_generator.next_id()
                         current_time = datetime.now(timezone.utc)
-                        df = pd.DataFrame({
-                            "ds_id": [next_ds_id],
-                            "ds_name": [dataset_name],
-                            "ds_type": ['Imported'],
-                            "table_name": [selected_table],
-                            "created_at": [current_time],
-                            "updated_at": [current_time]
+                        write_buffer.enqueue("dataset", {
+                            "ds_id": next_ds_id,
+                            "ds_name": dataset_name,
+                            "ds_type": 'Imported',
+                            "table_name": selected_table,
+                            "created_at": current_time,
+                            "updated_at": current_time
                         })
 
-                        table_ref = client.dataset("metatron").table("dataset")
-                        table = client.get_table(table_ref)
-
+                        # 목록을 다시 읽기 전에 버퍼를 바로 반영
                         with st.spinner("데이터셋을 추가하는 중..."):
-                            load_job = client.load_table_from_dataframe(df, table)
-                            load_job.result()
+                            write_buffer.flush()
 
-                        del st.session_state.dataset_list_columns
-                        del st.session_state.dataset_list_rows
+                        del st.session_state.dataset_list_pages
+                        st.session_state.dataset_list_cursors = [None]
                         
                         st.rerun()
                     except Exception as e:
                         print(f"Error: {e}")
                         return None, None
-                    finally:
-                        client.close()
                     
         modal_dialog()
     
@@ -0,0 +1,71 @@
+import streamlit as st
+import pandas as pd
+import telemetry
+
+# Streamlit 설정
+st.set_page_config(
+    page_title="Text2SQL Generator",
+    page_icon="🤖",
+    layout="wide",
+)
+
+session_id = telemetry.bind_session(st.session_state, ds_id=st.session_state.get('ds_id'))
+recorder = telemetry.get_telemetry()
+
+
+def format_ms(value):
+    return "-" if value is None else f"{value:,.0f} ms"
+
+
+def show_summary(kind, title, scope_session_id):
+    st.subheader(title)
+
+    overall = recorder.summary(kind, session_id=scope_session_id)
+    if not overall:
+        st.write("기록이 없습니다.")
+        return
+
+    total = overall[0]
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("호출 수", f"{total['count']:,}")
+    col2.metric("p50", format_ms(total['p50_ms']))
+    col3.metric("p95", format_ms(total['p95_ms']))
+    if kind == telemetry.BIGQUERY:
+        col4.metric("처리량", f"{total['bytes_processed'] / 1024 ** 3:,.2f} GB")
+    elif kind == telemetry.CLAUDE:
+        col4.metric("출력 토큰", f"{total['output_tokens']:,}")
+    else:
+        col4.metric("절약한 BigQuery 왕복", f"{total['round_trips_saved']:,}")
+
+    # 데이터셋별 / 세션별 집계
+    by_ds, by_session = st.columns(2)
+    with by_ds:
+        st.caption("데이터셋별")
+        st.dataframe(pd.DataFrame(recorder.summary(kind, group_by="ds_id", session_id=scope_session_id)), use_container_width=True, hide_index=True)
+    with by_session:
+        st.caption("세션별")
+        st.dataframe(pd.DataFrame(recorder.summary(kind, group_by="session_id", session_id=scope_session_id)), use_container_width=True, hide_index=True)
+
+
+def main():
+    st.title("Performance")
+
+    scope = st.radio("범위", ["전체", "현재 세션"], horizontal=True)
+    scope_session_id = session_id if scope == "현재 세션" else None
+
+    show_summary(telemetry.BIGQUERY, "BigQuery 작업", scope_session_id)
+    show_summary(telemetry.CLAUDE, "Claude 호출", scope_session_id)
+    show_summary(telemetry.VALIDATION, "SQL 검증/수정", scope_session_id)
+
+    st.subheader("최근 기록")
+    events = recorder.events(session_id=scope_session_id)[-200:]
+    if events:
+        st.dataframe(pd.DataFrame(reversed(events)), use_container_width=True, hide_index=True)
+
+    col1, col2, _ = st.columns([1, 1, 4])
+    col1.download_button("JSONL 내보내기", recorder.events_jsonl(session_id=scope_session_id), file_name="telemetry.jsonl")
+    col2.download_button("Prometheus 내보내기", recorder.to_prometheus(), file_name="text2sql.prom")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,7 +1,13 @@
 import streamlit as st
-import pandas as pd
 import backend as be
-from google.cloud import bigquery
+import config
+import cost_guard
+import local_preview
+import result_store
+import rule_history
+import sql_fingerprint
+import telemetry
+import pyarrow as pa
 
 # Streamlit 설정
 st.set_page_config(
@@ -20,9 +26,28 @@ else:
     st.warning('Dataset을 선택해 주세요.', icon="⚠️")
     # st.switch_page("pages/dataset.py")
 
-# 세션 초기화
-st.session_state.queries = []
-st.session_state.results = []
+# 이후 BigQuery 작업/Claude 호출을 세션, 데이터셋 단위로 집계
+telemetry.bind_session(st.session_state, ds_id=ds_id)
+
+# 세션 초기화 (데이터셋이 바뀔 때만, 재실행 간에는 유지)
+if st.session_state.get('queries_ds_id') != ds_id or 'queries' not in st.session_state:
+    st.session_state.queries_ds_id = ds_id
+    st.session_state.queries = []
+
+# 실행 확인을 받은 고비용 SQL
+if 'cost_confirmed' not in st.session_state:
+    st.session_state.cost_confirmed = set()
+
+# 비용 확인 대기로 실행하지 않은 새 질의 (SQL -> 질문), 확인 후 실행되면 룰로 저장
+if 'unsaved_rules' not in st.session_state:
+    st.session_state.unsaved_rules = {}
+
+# 로컬 미리보기 대신 BigQuery 전체 결과를 요청한 SQL
+if 'full_results' not in st.session_state:
+    st.session_state.full_results = set()
+
+# 조회 결과는 세션 결과 저장소에 SQL 지문을 키로 보관 (룰 이력 순서가 바뀌어도 SQL로 찾음)
+store = result_store.get_session_store(st.session_state)
 
 
 def sql_generator():
@@ -36,6 +61,12 @@ def sql_generator():
 
     with rule:
         st.header("Rule")
+        local_mode = st.toggle(
+            "로컬 샘플로 미리보기",
+            value=config.get_config('local_preview.enabled'),
+            key="local_preview_enabled",
+            disabled=not local_preview.is_available(),
+        ) and local_preview.is_available()
 
     # 사용자 정의 CSS 삽입
     st.markdown("""
@@ -46,31 +77,104 @@ def sql_generator():
         </style>
         """, unsafe_allow_html=True)
 
+    def result_key(sql_query):
+        return sql_fingerprint.fingerprint(sql_query)
+
+    def show_result(table):
+        grid.write(f"{table.num_columns} Columns | {table.num_rows} Rows")
+        grid.dataframe(table, use_container_width=True)
+
+    rendered = set()
+
+    def render_result(sql_query, dry_run_job=None):
+        # 첫 페이지가 도착하면 바로 그리고, 이후 페이지는 도착하는 대로 갱신
+        rendered.add(sql_query)
+        summary = grid.empty()
+        result_grid = grid.empty()
+        batches = []
+        for batch in be.iter_query_pages(sql_query, dry_run_job=dry_run_job):
+            batches.append(batch)
+            table = pa.Table.from_batches(batches)
+            summary.write(f"{table.num_columns} Columns | {table.num_rows} Rows")
+            result_grid.dataframe(table, use_container_width=True)
+
+        if not batches:
+            return None
+        return pa.Table.from_batches(batches)
+
+    def confirm_cost(sql_query):
+        st.session_state.cost_confirmed.add(sql_query)
+        st.session_state.pending_sql = sql_query
+
+    def run_anyway(sql_query):
+        # 검증 오류가 잘못 검출된 경우 사용자가 확인하고 그대로 실행
+        st.session_state.pending_sql = sql_query
+
+    def request_full_result(sql_query):
+        st.session_state.full_results.add(sql_query)
+        st.session_state.pending_sql = sql_query
+
+    def run_query(sql_query, key):
+        # 로컬 샘플로 먼저 실행 (BigQuery 작업/슬롯 사용 없음), 변환/실행이 안 되면 BigQuery로 실행
+        if local_mode and sql_query not in st.session_state.full_results:
+            preview = local_preview.preview_query(sql_query)
+            if preview["error"] is None:
+                samples = ", ".join(f"{table_name} {rows:,}행" for table_name, rows in preview["sample_rows"].items())
+                rule.caption(f"로컬 샘플 미리보기 결과입니다. (샘플 : {samples or '-'})")
+                rule.button("전체 결과 실행", key=f"full_result_{key}", on_click=request_full_result, args=(sql_query,))
+                rendered.add(sql_query)
+                show_result(preview["table"])
+                return preview["table"]
+            rule.caption(f"BigQuery로 실행합니다. ({preview['error']})")
+
+        # 실행 전 dry run으로 예상 처리량 확인
+        estimate = cost_guard.estimate_query(sql_query)
+        tables = ", ".join(estimate["referenced_tables"]) or "-"
+        rule.caption(f"예상 처리량 : {cost_guard.format_bytes(estimate['bytes_processed'])} | 참조 테이블 : {tables}")
+
+        decision = cost_guard.check_cost(estimate)
+        if decision == cost_guard.BLOCK:
+            rule.error(estimate["error"] or "예상 처리량이 허용 한도를 초과하여 실행하지 않았습니다.")
+            return None
+        if decision == cost_guard.CONFIRM and sql_query not in st.session_state.cost_confirmed:
+            rule.warning("예상 처리량이 많습니다. 실행하시겠습니까?")
+            rule.button("실행", key=f"cost_confirm_{key}", on_click=confirm_cost, args=(sql_query,))
+            return None
+
+        table = render_result(sql_query, estimate["job"])
+        if table is not None:
+            store.put(result_key(sql_query), table)
+        return table
+
     # 이전 질의 표시
     if ds_id:
         print('Display previous question.')
-        # Get previous questions and sqls
-        query = f"""
-            SELECT user_question, result_sql
-            FROM metatron.rule 
-            WHERE DS_ID = {ds_id} 
-              AND APPLIED_YN = 'Y' 
-            ORDER BY UPDATED_AT DESC
-            """
-        columns, results = be.execute_query_and_get_results(query)
-        
-        for row in results:
-            st.session_state.queries.append((row[0], row[1]))
-        
+        # 룰 이력은 ds_id별 캐시에서 가져오고, 새 룰이 저장된 경우에만 추가분을 조회
+        st.session_state.queries = rule_history.load(ds_id)
+
         if len(st.session_state.queries) != 0:
-            user_question, sql_query = st.session_state.queries[len(st.session_state.queries)-1]
+            user_question, sql_query = st.session_state.queries[-1]
             print(f"질의 : {user_question}")
-            columns, results = be.execute_query_and_get_results(sql_query)
+            # 세션 결과 저장소에 남아 있으면 다시 실행하지 않음
+            table = store.get(result_key(sql_query))
+            if table is not None:
+                rendered.add(sql_query)
+                show_result(table)
+            else:
+                table = run_query(sql_query, "latest")
+
+    # 실행 확인을 받은 SQL 실행
+    pending_sql = st.session_state.pop('pending_sql', None)
+    if pending_sql and pending_sql not in rendered:
+        rule.code(pending_sql, language='sql')
+        table = run_query(pending_sql, "pending")
 
-            st.session_state.results.append((columns, results))
-            grid.write(f"{len(columns)} Columns | {len(results)} Rows")
-            df = pd.DataFrame(results, columns=columns)
-            grid.dataframe(df, use_container_width=True)
+        # 실행 확인 후 실행된 새 질의는 이제 룰로 저장
+        if pending_sql in rendered and pending_sql in st.session_state.unsaved_rules:
+            user_question = st.session_state.unsaved_rules.pop(pending_sql)
+            st.session_state.queries.append((user_question, pending_sql))
+            if ds_id:
+                be.save_question(ds_id, user_question, pending_sql.strip())
 
 
     # 사용자 입력
@@ -80,62 +184,63 @@ def sql_generator():
     if "queries" not in st.session_state:
         st.session_state.queries = []
 
-    if "results" not in st.session_state:
-        st.session_state.results = []
-
     def handle_execute_button(sql_query, idx):
         user_query = ''
         sql_query = ''
-        columns = ''
-        results = ''
-
-        # 이전 질의 최초 실행
-        if idx != '' and len(st.session_state.results) == 0:
-            user_query, sql_query = st.session_state.queries[idx]
-
-            if sql_query:
-                columns, results = be.execute_query_and_get_results(sql_query)
-
-                if len(st.session_state.results) <= idx:
-                    # idx에 해당하는 인덱스가 없으면 빈 리스트로 초기화
-                    while len(st.session_state.results) <= idx:
-                        st.session_state.results.append([])
-
-                    st.session_state.results[idx] = (columns, results)
+        table = None
 
         # 이전 질의 재실행
-        elif idx != '':
+        if idx != '':
             user_query, sql_query = st.session_state.queries[idx]
-            columns, results = st.session_state.results[idx]
 
             print(f"질의 : {user_query}")
             print(f"쿼리 실행 : {sql_query}")
+            rule.code(sql_query, language='sql')
+            # 디스크로 내린 결과는 memory map으로 읽고, 저장소에 없는 결과만 다시 조회
+            table = store.get(result_key(sql_query)) if sql_query else None
+            if table is None and sql_query:
+                table = run_query(sql_query, f"previous_{idx}")
+            elif table is not None and table.num_rows:
+                show_result(table)
         # 새로운 질의 실행
         else: 
             print(f"질의 : {query}")
 
-            # Claude API 호출하여 SQL 쿼리 생성
+            # Claude API 호출하여 SQL 쿼리 생성 (생성되는 대로 Rule 영역에 표시)
             user_query = query
-            sql_query = be.get_sql_query_from_claude(user_query)
+            sql_placeholder = rule.empty()
+            sql_query = ''
+            for chunk in be.stream_sql_query_from_claude(user_query, ds_id=ds_id):
+                sql_query += chunk
+                sql_placeholder.code(sql_query, language='sql')
 
+            # 실행 전에 로컬 스키마로 검증하고, 오류가 있으면 Claude에 오류를 전달해 수정
+            errors = []
             if sql_query:
-                columns, results = be.execute_query_and_get_results(sql_query)
-
-                st.session_state.queries.append((query, sql_query))
-                st.session_state.results.append((columns, results))
-
-                # Save question and relative sql
-                if idx and idx != "" and st.session_state.results[idx]:
-                    # TODO: 기존 사용자 질의 최초 실행 시 세션에 넣는 작업
-                    print()
-                elif ds_id:
-                    be.save_question(ds_id, user_query, sql_query.strip())
-        
-        rule.code(sql_query, language='sql')
-        if results:
-            grid.write(f"{len(columns)} Columns | {len(results)} Rows")
-            df = pd.DataFrame(results, columns=columns)
-            grid.dataframe(df, use_container_width=True)
+                sql_query, errors, attempts = be.validate_and_repair(user_query, sql_query, ds_id=ds_id)
+                if attempts:
+                    sql_placeholder.code(sql_query, language='sql')
+                    rule.caption(f"검증 오류 수정을 {attempts}회 요청했습니다.")
+                if errors:
+                    # 로컬 검증은 스키마 캐시 기준이라 잘못 검출할 수 있으므로 확인 후 그대로 실행 가능 (실행되면 룰로 저장)
+                    rule.warning("생성된 SQL에서 검증 오류가 발견되어 실행하지 않았습니다. 오류가 아니라면 그대로 실행할 수 있습니다.\n\n" + "\n".join(f"- {error}" for error in errors))
+                    rule.button("그래도 실행", key="validation_override", on_click=run_anyway, args=(sql_query,))
+                    st.session_state.unsaved_rules[sql_query] = user_query
+
+            if sql_query and not errors:
+                table = run_query(sql_query, "new")
+
+                # 비용 한도로 차단되었거나 실행 확인을 기다리는 SQL은 룰로 저장하지 않음
+                if sql_query not in rendered:
+                    st.session_state.unsaved_rules[sql_query] = user_query
+                else:
+                    st.session_state.queries.append((query, sql_query))
+
+                    # Save question and relative sql
+                    if ds_id:
+                        be.save_question(ds_id, user_query, sql_query.strip())
+
+        if table is not None and table.num_rows:
             print("Successfully Queried!")
 
     if query:
@@ -0,0 +1,205 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import config
+import cost_guard
+import sql_fingerprint
+
+# 데이터셋의 테이블별 최종 수정 시각 (메타 테이블 조회, 처리 바이트 없음)
+TABLES_MODIFIED_QUERY = """
+    SELECT table_id, last_modified_time
+    FROM `{project}.{dataset_id}.__TABLES__`
+"""
+
+
+def canonical_sql(sql_query):
+    # 공백/주석/대소문자/조건 순서 차이는 같은 쿼리로 취급
+    return sql_fingerprint.canonicalize(sql_query)
+
+
+def _table_id(table_name):
+    # `project.dataset.table`, dataset.table 모두 dataset.table 형태로 비교
+    parts = table_name.strip("`").split(".")
+    return ".".join(parts[-2:]).lower()
+
+
+def _params_repr(params):
+    if not params:
+        return []
+    return [param.to_api_repr() for param in params]
+
+
+def _ref_id(table_ref):
+    return f"{table_ref.dataset_id}.{table_ref.table_id}".lower()
+
+
+def _modified_ms(table):
+    return int(table.modified.timestamp() * 1000) if table.modified else None
+
+
+def _query_modified(client, project, dataset_id):
+    # 데이터셋 전체 테이블의 수정 시각을 쿼리 한 번으로 조회 (와일드카드 샤드가 많을 때)
+    sql_query = TABLES_MODIFIED_QUERY.format(project=project, dataset_id=dataset_id)
+    return {row["table_id"].lower(): row["last_modified_time"] for row in client.query(sql_query).result()}
+
+
+def _fetch_modified(client, table_refs):
+    # 데이터셋별로 테이블이 많으면 __TABLES__ 한 번, 적으면 테이블 메타데이터를 동시에 조회
+    by_dataset = {}
+    for table_ref in table_refs:
+        by_dataset.setdefault((table_ref.project, table_ref.dataset_id), []).append(table_ref)
+
+    modified = {}
+    single_refs = []
+    for (project, dataset_id), refs in by_dataset.items():
+        if len(refs) < config.get_config('cache.result.metadata_query_min_tables'):
+            single_refs.extend(refs)
+            continue
+        try:
+            dataset_modified = _query_modified(client, project, dataset_id)
+        except Exception as e:
+            # 메타 테이블 권한이 없으면 테이블별 조회
+            print(f"Error: {e}")
+            single_refs.extend(refs)
+            continue
+        for table_ref in refs:
+            modified[_ref_id(table_ref)] = dataset_modified.get(table_ref.table_id.lower())
+
+    if single_refs:
+        with ThreadPoolExecutor(max_workers=min(len(single_refs), 8)) as executor:
+            tables = executor.map(client.get_table, single_refs)
+            for table_ref, table in zip(single_refs, tables):
+                modified[_ref_id(table_ref)] = _modified_ms(table)
+    return modified
+
+
+def _table_versions(client, table_refs):
+    # 수정 시각은 짧은 시간 동안 재사용 (캐시 적중 때마다 테이블 수만큼 메타데이터를 조회하지 않도록)
+    ttl = config.get_config('cache.result.metadata_ttl')
+    now = time.monotonic()
+    versions = {}
+    missing = []
+    with _modified_lock:
+        for table_ref in table_refs:
+            cached = _modified.get(_ref_id(table_ref))
+            if cached is not None and now - cached[1] < ttl:
+                versions[_ref_id(table_ref)] = cached[0]
+            else:
+                missing.append(table_ref)
+
+    if missing:
+        fetched = _fetch_modified(client, missing)
+        with _modified_lock:
+            for table_id, modified in fetched.items():
+                _modified[table_id] = (modified, now)
+        versions.update(fetched)
+    return sorted(versions.items())
+
+
+def lookup_key(client, sql_query, params=None, dry_run_job=None):
+    # dry run으로 참조 테이블을 구하고 각 테이블의 최종 수정 시각을 키에 포함
+    if dry_run_job is None:
+        dry_run_job = cost_guard.dry_run(sql_query, params, client)
+
+    if dry_run_job.statement_type != "SELECT":
+        return None, []
+
+    versions = _table_versions(client, dry_run_job.referenced_tables)
+
+    payload = json.dumps({
+        "sql": sql_fingerprint.fingerprint(sql_query),
+        "params": _params_repr(params),
+        "tables": versions,
+    }, sort_keys=True, ensure_ascii=False, default=str)
+    key = hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    return key, [table_id for table_id, _ in versions]
+
+
+class ResultCache:
+    # 결과를 압축된 Arrow IPC 버퍼로 저장하는 바이트 예산 기반 LRU
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "puts": 0, "evictions": 0, "invalidations": 0}
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            buffer = entry[0]
+
+        import pyarrow as pa
+        return pa.ipc.open_stream(buffer).read_all()
+
+    def put(self, key, table, tables):
+        import pyarrow as pa
+
+        sink = pa.BufferOutputStream()
+        options = pa.ipc.IpcWriteOptions(compression="zstd")
+        with pa.ipc.new_stream(sink, table.schema, options=options) as writer:
+            writer.write_table(table)
+        buffer = sink.getvalue()
+
+        if buffer.size > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)[0].size
+            self._entries[key] = (buffer, set(tables))
+            self._bytes += buffer.size
+            self._stats["puts"] += 1
+
+            while self._bytes > self.max_bytes:
+                _, (evicted, _) = self._entries.popitem(last=False)
+                self._bytes -= evicted.size
+                self._stats["evictions"] += 1
+
+    def invalidate_table(self, table_name):
+        table_id = _table_id(table_name)
+        with _modified_lock:
+            _modified.pop(table_id, None)
+        with self._lock:
+            for key in [key for key, (_, tables) in self._entries.items() if table_id in tables]:
+                self._bytes -= self._entries.pop(key)[0].size
+                self._stats["invalidations"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+        with _modified_lock:
+            _modified.clear()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+            stats["bytes"] = self._bytes
+            return stats
+
+
+_cache = None
+_cache_lock = threading.Lock()
+# dataset.table -> (최종 수정 시각 ms, 조회 시각)
+_modified = {}
+_modified_lock = threading.Lock()
+
+
+def get_cache():
+    global _cache
+
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResultCache(config.get_config('cache.result.max_bytes'))
+        return _cache
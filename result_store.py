@@ -0,0 +1,237 @@
+import os
+import shutil
+import tempfile
+import threading
+import uuid
+import weakref
+from collections import OrderedDict
+import config
+
+
+def _copy_head(table, num_rows):
+    import pyarrow as pa
+
+    # slice는 원본 버퍼를 참조하므로 앞부분 행만 새 버퍼로 복사 (디스크로 내린 뒤 원본 메모리가 해제되도록)
+    return table.take(pa.array(range(min(num_rows, table.num_rows)), type=pa.int64()))
+
+
+class _Entry:
+
+    def __init__(self, preview, table, nbytes):
+        self.preview = preview
+        self.table = table
+        self.nbytes = nbytes
+        self.path = None
+
+    @property
+    def memory_bytes(self):
+        # 미리보기는 디스크로 내린 뒤에도 메모리에 남음
+        return self.preview.nbytes + (self.nbytes if self.in_memory else 0)
+
+    @property
+    def in_memory(self):
+        return self.table is not None
+
+
+class ResultStoreManager:
+    # 전체 세션의 메모리 사용량을 합산해 전역 예산 초과 시 오래된 결과부터 디스크로 내림
+
+    def __init__(self, global_memory_bytes, spill_dir=None):
+        self.global_memory_bytes = global_memory_bytes
+        self.spill_dir = spill_dir or tempfile.gettempdir()
+        self._lock = threading.RLock()
+        self._stores = weakref.WeakValueDictionary()
+        self._access = 0
+
+    def create_store(self, session_memory_bytes, session_disk_bytes, preview_rows):
+        store_id = uuid.uuid4().hex
+        store_dir = os.path.join(self.spill_dir, f"text2sql-results-{store_id}")
+        store = SessionResultStore(self, store_dir, session_memory_bytes, session_disk_bytes, preview_rows)
+        with self._lock:
+            self._stores[store_id] = store
+        # 세션 상태가 사라지면(세션 종료) 스풀 디렉터리 삭제
+        weakref.finalize(store, shutil.rmtree, store_dir, True)
+        return store
+
+    def _next_access(self):
+        with self._lock:
+            self._access += 1
+            return self._access
+
+    def memory_bytes(self):
+        # 종료된 세션의 저장소는 WeakValueDictionary에서 자동으로 빠짐
+        return sum(store.memory_bytes() for store in list(self._stores.values()))
+
+    def enforce_budget(self):
+        with self._lock:
+            while self.memory_bytes() > self.global_memory_bytes:
+                if not self._spill_oldest():
+                    break
+
+    def _spill_oldest(self):
+        oldest = None
+        for store in list(self._stores.values()):
+            candidate = store._oldest_in_memory()
+            if candidate and (oldest is None or candidate[0] < oldest[0]):
+                oldest = (candidate[0], store, candidate[1])
+        if oldest is None:
+            return False
+        oldest[1]._spill(oldest[2])
+        return True
+
+    def stats(self):
+        with self._lock:
+            return {"sessions": len(self._stores), "memory_bytes": self.memory_bytes()}
+
+
+class SessionResultStore:
+    # 세션별 결과 저장소: 미리보기는 메모리에, 전체 결과는 예산 초과 시 Arrow 파일로 내려 memory map으로 읽음
+
+    def __init__(self, manager, store_dir, session_memory_bytes, session_disk_bytes, preview_rows):
+        self.manager = manager
+        self.store_dir = store_dir
+        self.session_memory_bytes = session_memory_bytes
+        self.session_disk_bytes = session_disk_bytes
+        self.preview_rows = preview_rows
+        self._lock = threading.RLock()
+        self._entries = OrderedDict()
+        self._last_access = {}
+        self._memory_bytes = 0
+        self._disk_bytes = 0
+
+    def put(self, key, table):
+        self.remove(key)
+        entry = _Entry(_copy_head(table, self.preview_rows), table, table.nbytes)
+        access = self.manager._next_access()
+        with self._lock:
+            self._entries[key] = entry
+            self._last_access[key] = access
+            self._memory_bytes += entry.memory_bytes
+
+        # 세션 예산 초과 시 가장 오래 사용하지 않은 결과부터 디스크로 내림
+        while True:
+            with self._lock:
+                if self._memory_bytes <= self.session_memory_bytes:
+                    break
+                oldest = self._oldest_in_memory()
+            if oldest is None:
+                break
+            self._spill(oldest[1])
+
+        self.manager.enforce_budget()
+        return key
+
+    def get(self, key):
+        import pyarrow as pa
+
+        access = self.manager._next_access()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            self._last_access[key] = access
+            if entry.in_memory:
+                return entry.table
+            path = entry.path
+
+        # 디스크에 내린 결과는 memory map으로 읽어 복사 없이 반환
+        return pa.ipc.open_file(pa.memory_map(path, "r")).read_all()
+
+    def preview(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry.preview if entry else None
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def remove(self, key):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            self._last_access.pop(key, None)
+            if entry is None:
+                return
+            self._memory_bytes -= entry.memory_bytes
+            if not entry.in_memory:
+                self._disk_bytes -= entry.nbytes
+                os.remove(entry.path)
+
+    def clear(self):
+        with self._lock:
+            keys = list(self._entries)
+        for key in keys:
+            self.remove(key)
+
+    def _oldest_in_memory(self):
+        with self._lock:
+            for key, entry in self._entries.items():
+                if entry.in_memory:
+                    return self._last_access[key], key
+        return None
+
+    def _spill(self, key):
+        import pyarrow as pa
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or not entry.in_memory:
+                return
+
+            os.makedirs(self.store_dir, exist_ok=True)
+            path = os.path.join(self.store_dir, f"{uuid.uuid4().hex}.arrow")
+            with pa.OSFile(path, "wb") as sink:
+                with pa.ipc.new_file(sink, entry.table.schema) as writer:
+                    writer.write_table(entry.table)
+
+            entry.table = None
+            entry.path = path
+            self._memory_bytes -= entry.nbytes
+            self._disk_bytes += entry.nbytes
+
+            # 디스크 예산 초과 시 가장 오래된 결과부터 삭제
+            while self._disk_bytes > self.session_disk_bytes:
+                oldest = next((old_key for old_key, old in self._entries.items() if not old.in_memory), None)
+                if oldest is None:
+                    break
+                self.remove(oldest)
+
+    def memory_bytes(self):
+        with self._lock:
+            return self._memory_bytes
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "memory_bytes": self._memory_bytes,
+                "disk_bytes": self._disk_bytes,
+            }
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+def get_manager():
+    global _manager
+
+    with _manager_lock:
+        if _manager is None:
+            _manager = ResultStoreManager(
+                config.get_config('result_store.global_memory_bytes'),
+                config.get_config('result_store.spill_dir'),
+            )
+        return _manager
+
+
+def get_session_store(session_state):
+    # 세션 상태에 저장소를 보관하므로 세션이 종료되면 함께 정리됨
+    if 'result_store' not in session_state:
+        session_state['result_store'] = get_manager().create_store(
+            config.get_config('result_store.session_memory_bytes'),
+            config.get_config('result_store.session_disk_bytes'),
+            config.get_config('result_store.preview_rows'),
+        )
+    return session_state['result_store']
@@ -0,0 +1,165 @@
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+import config
+import bq_client
+import sql_fingerprint
+
+DATASET_ID = "metatron"
+
+# 마지막으로 읽은 룰의 updated_at에서 safety_window만큼 앞선 시각 이후의 적용 룰 조회
+# (쓰기 버퍼 재전송, 다른 프로세스 등으로 늦게 반영된 행을 놓치지 않도록 다시 읽고 rule_id로 중복 제거)
+HISTORY_QUERY = f"""
+    SELECT rule_id, user_question, result_sql, fingerprint, updated_at
+    FROM `{DATASET_ID}.rule`
+    WHERE ds_id = @ds_id
+      AND applied_yn = 'Y'
+      AND (@since IS NULL OR updated_at >= @since)
+    ORDER BY updated_at, rule_id
+    """
+
+_MIN_TIME = datetime.min.replace(tzinfo=timezone.utc)
+
+
+class _History:
+
+    def __init__(self):
+        # 지문별 최신 룰 (같은 지문의 이전 룰은 제거), (updated_at, rule_id) 순서
+        self.rules = OrderedDict()
+        self.order = {}
+        self.last_key = None
+        # 추가된 순서대로 쌓이는 (지문, 질문, SQL) 로그 (rule_index 증분 갱신용)
+        self.log = []
+        self.log_id = next(_log_ids)
+        self.rule_ids = set()
+        self.high_water_mark = None
+        self.checked_at = None
+        self.loaded = False
+        self.stale = True
+
+
+# ds_id별 룰 이력 캐시 (Streamlit 재실행 간에 유지, save_question 또는 refresh_interval 경과 시 새 룰 조회)
+_lock = threading.Lock()
+_histories = {}
+_log_ids = itertools.count(1)
+
+
+def _sort_key(updated_at, rule_id):
+    if updated_at is None:
+        return _MIN_TIME, rule_id
+    # save_question의 UTC 시각(timezone 없음)과 BigQuery 조회 결과를 같은 기준으로 비교
+    if updated_at.tzinfo is None:
+        updated_at = updated_at.replace(tzinfo=timezone.utc)
+    return updated_at, rule_id
+
+
+def _add(history, rule_id, user_question, result_sql, fingerprint=None, updated_at=None):
+    # 새로 추가된 룰이 기존 룰보다 앞선 순서면 True (늦게 도착한 행)
+    if rule_id in history.rule_ids:
+        return False
+    history.rule_ids.add(rule_id)
+    # 지문 컬럼 추가 전에 저장된 룰은 조회 시 계산
+    if fingerprint is None:
+        fingerprint = sql_fingerprint.fingerprint(result_sql or "")
+
+    key = _sort_key(updated_at, rule_id)
+    if fingerprint in history.order and history.order[fingerprint] > key:
+        # 같은 지문의 더 최신 룰이 이미 있으면 유지
+        return False
+    history.rules.pop(fingerprint, None)
+    history.rules[fingerprint] = (user_question, result_sql)
+    history.order[fingerprint] = key
+    history.log.append((fingerprint, user_question, result_sql))
+
+    if history.last_key is not None and history.last_key > key:
+        return True
+    history.last_key = key
+    return False
+
+
+def _resort(history):
+    history.rules = OrderedDict(sorted(history.rules.items(), key=lambda item: history.order[item[0]]))
+
+
+def _refresh(ds_id, client=None):
+    from google.cloud import bigquery
+
+    now = time.monotonic()
+    with _lock:
+        history = _histories.setdefault(ds_id, _History())
+        expired = history.checked_at is None or now - history.checked_at >= config.get_config('rule_history.refresh_interval')
+        if not history.stale and not expired:
+            return history
+        since = None
+        if history.high_water_mark is not None:
+            since = history.high_water_mark - timedelta(seconds=config.get_config('rule_history.safety_window'))
+
+    if client is None:
+        client = bq_client.get_client()
+
+    job_config = bigquery.QueryJobConfig(
+        query_parameters=[
+            bigquery.ScalarQueryParameter("ds_id", "INT64", ds_id),
+            bigquery.ScalarQueryParameter("since", "TIMESTAMP", since),
+        ]
+    )
+    print(f"쿼리 실행 : {HISTORY_QUERY}")
+    rows = list(client.query(HISTORY_QUERY, job_config=job_config).result())
+
+    with _lock:
+        out_of_order = False
+        for row in rows:
+            out_of_order |= _add(history, row["rule_id"], row["user_question"], row["result_sql"], row["fingerprint"], row["updated_at"])
+            if row["updated_at"] is not None:
+                updated_at = _sort_key(row["updated_at"], 0)[0]
+                if history.high_water_mark is None or updated_at > history.high_water_mark:
+                    history.high_water_mark = updated_at
+        if out_of_order:
+            _resort(history)
+        history.checked_at = now
+        history.loaded = True
+        history.stale = False
+    return history
+
+
+def load(ds_id, client=None):
+    history = _refresh(ds_id, client)
+    with _lock:
+        return list(history.rules.values())
+
+
+def changes(ds_id, log_id=None, position=0, client=None):
+    # position 이후에 추가된 룰 로그 (이력 캐시가 새로 만들어졌으면 처음부터 반환)
+    history = _refresh(ds_id, client)
+    with _lock:
+        if log_id != history.log_id:
+            position = 0
+        return history.log_id, history.log[position:], len(history.log)
+
+
+def latest_fingerprint(ds_id):
+    # 이미 조회한 이력의 마지막 룰 지문 (조회 전이면 None)
+    with _lock:
+        history = _histories.get(ds_id)
+        if history is None or not history.loaded or not history.rules:
+            return None
+        return next(reversed(history.rules))
+
+
+def append(ds_id, rule_id, user_question, result_sql, fingerprint=None, updated_at=None):
+    # 쓰기 버퍼에 있는 룰은 아직 조회되지 않으므로 캐시에 바로 추가하고, 다음 조회 때 새 룰을 확인
+    with _lock:
+        history = _histories.setdefault(ds_id, _History())
+        if history.loaded and _add(history, rule_id, user_question, result_sql, fingerprint, updated_at):
+            _resort(history)
+        history.stale = True
+
+
+def invalidate(ds_id=None):
+    with _lock:
+        if ds_id is None:
+            _histories.clear()
+        elif ds_id in _histories:
+            _histories[ds_id].stale = True
@@ -0,0 +1,340 @@
+import math
+import threading
+from array import array
+from collections import Counter
+import config
+import generation_cache
+import rule_history
+
+# 질문 끝의 문장 부호 (비교 연산자/부호는 의미가 있으므로 끝에 있는 것만 제거)
+TRAILING_PUNCTUATION = " .?!。？！"
+
+
+def _ngrams(text, ngram_range):
+    # 공백/대소문자 정규화 후 앞뒤 공백을 붙인 문자 n-gram (한글 어절 변형에도 일부 일치)
+    text = f" {' '.join((text or '').split()).casefold()} "
+    low, high = ngram_range
+    return Counter(text[i:i + n] for n in range(low, high + 1) for i in range(len(text) - n + 1))
+
+
+def _grow(values, size):
+    import numpy as np
+
+    if size <= len(values):
+        return values
+    grown = np.zeros(max(size, len(values) * 2, 1024), dtype=values.dtype)
+    grown[:len(values)] = values
+    return grown
+
+
+class RuleIndex:
+    # 질문 문자 n-gram TF-IDF 역색인 (추가만 가능, 같은 지문의 이전 룰은 검색에서 제외)
+    # 단어별 문서 목록은 CSR 배열로 압축해 두고, 압축 이후 추가된 룰만 단어별 리스트로 보관
+
+    def __init__(self, ngram_range=(2, 3), renormalize_growth=0.1, max_delta_rules=1000, max_postings=100000):
+        import numpy as np
+
+        self.ngram_range = tuple(ngram_range)
+        self.renormalize_growth = renormalize_growth
+        self.max_delta_rules = max_delta_rules
+        self.max_postings = max_postings
+        self._lock = threading.Lock()
+        self.vocab = {}
+        self.rules = []
+        self._fingerprints = {}
+        self._df = []
+        # 1 / 문서 norm (검색에서 제외된 룰은 0)
+        self._alive = np.zeros(0, dtype=bool)
+        self._inv_norms = np.zeros(0)
+        # 전체 (룰, 단어, 가중치) 목록 - 압축/norm 재계산, 후보 재채점용 (룰 순서대로 연속 저장)
+        self._rule_offsets = array("q", [0])
+        self._entry_rules = array("i")
+        self._entry_terms = array("i")
+        self._entry_weights = array("f")
+        # 압축된 색인
+        self._indptr = np.zeros(1, dtype=np.int64)
+        self._posting_rules = np.zeros(0, dtype=np.int32)
+        self._posting_weights = np.zeros(0, dtype=np.float32)
+        self._compacted_rules = 0
+        self._compacted_terms = 0
+        # 압축된 룰의 (단어, 가중치) 목록 - 룰 순서
+        self._rule_offsets_array = np.zeros(1, dtype=np.int64)
+        self._rule_terms = np.zeros(0, dtype=np.int32)
+        self._rule_weights = np.zeros(0, dtype=np.float32)
+        # 압축 이후 추가된 룰
+        self._delta = {}
+        self._delta_arrays = {}
+        # rule_history 로그 동기화 위치
+        self.sync_lock = threading.Lock()
+        self.log_id = None
+        self.position = 0
+
+    def __len__(self):
+        return len(self.rules)
+
+    def _add(self, fingerprint, user_question, result_sql, track_delta=True):
+        rule_no = len(self.rules)
+        self.rules.append((user_question, result_sql))
+        self._alive = _grow(self._alive, rule_no + 1)
+        self._inv_norms = _grow(self._inv_norms, rule_no + 1)
+        self._alive[rule_no] = True
+
+        # 같은 SQL의 이전 룰은 최신 질문으로 대체
+        previous = self._fingerprints.get(fingerprint)
+        if previous is not None:
+            self._alive[previous] = False
+            self._inv_norms[previous] = 0
+        self._fingerprints[fingerprint] = rule_no
+
+        term_ids = []
+        weights = []
+        for gram, count in _ngrams(user_question, self.ngram_range).items():
+            term_id = self.vocab.get(gram)
+            if term_id is None:
+                term_id = self.vocab[gram] = len(self._df)
+                self._df.append(0)
+            self._df[term_id] += 1
+            term_ids.append(term_id)
+            weights.append(1 + math.log(count))
+
+        # 바로 압축할 대량 추가는 단어별 추가분 목록을 만들지 않음
+        if track_delta:
+            for term_id, weight in zip(term_ids, weights):
+                if term_id not in self._delta:
+                    self._delta[term_id] = ([], [])
+                self._delta[term_id][0].append(rule_no)
+                self._delta[term_id][1].append(weight)
+                self._delta_arrays.pop(term_id, None)
+
+        self._entry_rules.extend([rule_no] * len(term_ids))
+        self._entry_terms.extend(term_ids)
+        self._entry_weights.extend(weights)
+        self._rule_offsets.append(len(self._entry_terms))
+        return rule_no, term_ids, weights
+
+    def add_many(self, rules):
+        import numpy as np
+
+        # rules : (지문, 질문, SQL) 목록
+        rules = list(rules)
+        with self._lock:
+            # 압축 이후 추가된 룰이 일정 수를 넘으면 다시 압축 (IDF 변화도 전체 norm에 반영)
+            delta_rules = len(self.rules) + len(rules) - self._compacted_rules
+            compact = delta_rules > min(self.max_delta_rules, self._compacted_rules * self.renormalize_growth)
+
+            added = [self._add(fingerprint, user_question, result_sql, not compact) for fingerprint, user_question, result_sql in rules]
+            if compact:
+                self._compact()
+                return
+
+            df = np.array(self._df, dtype=np.float32)
+            for rule_no, term_ids, weights in added:
+                idf = self._idf(df[term_ids])
+                norm = np.sqrt(np.sum((idf * np.array(weights, dtype=np.float32)) ** 2))
+                self._inv_norms[rule_no] = 1 / norm if norm > 0 and self._alive[rule_no] else 0
+
+    def add(self, fingerprint, user_question, result_sql):
+        self.add_many([(fingerprint, user_question, result_sql)])
+
+    def _idf(self, df):
+        import numpy as np
+
+        return np.log((1 + len(self.rules)) / (1 + df)) + 1
+
+    def _compact(self):
+        import numpy as np
+
+        rule_count = len(self.rules)
+        term_count = len(self._df)
+        entry_rules = np.array(self._entry_rules, dtype=np.int32)
+        entry_terms = np.array(self._entry_terms, dtype=np.int32)
+        entry_weights = np.array(self._entry_weights, dtype=np.float32)
+
+        order = np.argsort(entry_terms, kind="stable")
+        self._indptr = np.zeros(term_count + 1, dtype=np.int64)
+        np.cumsum(np.bincount(entry_terms, minlength=term_count), out=self._indptr[1:])
+        self._posting_rules = entry_rules[order]
+        self._posting_weights = entry_weights[order]
+        self._rule_offsets_array = np.array(self._rule_offsets, dtype=np.int64)
+        self._rule_terms = entry_terms
+        self._rule_weights = entry_weights
+
+        idf = self._idf(np.array(self._df, dtype=np.float32))
+        squares = (idf[entry_terms] * entry_weights) ** 2
+        norms = np.sqrt(np.bincount(entry_rules, weights=squares, minlength=rule_count))
+        self._inv_norms[:rule_count] = np.divide(1, norms, out=np.zeros(rule_count), where=(norms > 0) & self._alive[:rule_count])
+
+        self._compacted_rules = rule_count
+        self._compacted_terms = term_count
+        self._delta.clear()
+        self._delta_arrays.clear()
+
+    def _delta_posting(self, term_id):
+        import numpy as np
+
+        arrays = self._delta_arrays.get(term_id)
+        if arrays is None and term_id in self._delta:
+            delta_rules, delta_weights = self._delta[term_id]
+            arrays = self._delta_arrays[term_id] = (np.array(delta_rules, dtype=np.int32), np.array(delta_weights, dtype=np.float32))
+        return arrays
+
+    def _postings(self, term_id):
+        # 압축된 목록과 압축 이후 추가분
+        postings = []
+        if term_id < self._compacted_terms:
+            start, end = self._indptr[term_id], self._indptr[term_id + 1]
+            postings.append((self._posting_rules[start:end], self._posting_weights[start:end]))
+        delta = self._delta_posting(term_id)
+        if delta is not None:
+            postings.append(delta)
+        return postings
+
+    def _exact_scores(self, candidates, query_terms):
+        import numpy as np
+
+        # 후보 룰의 전체 단어로 질의와의 내적 계산
+        scores = np.zeros(len(candidates))
+        compacted = candidates < self._compacted_rules
+        if compacted.any():
+            rule_nos = candidates[compacted]
+            starts = self._rule_offsets_array[rule_nos]
+            lengths = self._rule_offsets_array[rule_nos + 1] - starts
+            positions = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+
+            query_ids = np.array(sorted(query_terms), dtype=np.int32)
+            query_weights = np.array([query_terms[term_id] for term_id in query_ids])
+            terms = self._rule_terms[positions]
+            found = np.minimum(np.searchsorted(query_ids, terms), len(query_ids) - 1)
+            contributions = np.where(query_ids[found] == terms, query_weights[found], 0) * self._rule_weights[positions]
+            scores[compacted] = np.bincount(np.repeat(np.arange(len(rule_nos)), lengths), weights=contributions, minlength=len(rule_nos))
+
+        for i in np.flatnonzero(~compacted):
+            start, end = self._rule_offsets[candidates[i]], self._rule_offsets[candidates[i] + 1]
+            scores[i] = sum(query_terms.get(term_id, 0.0) * weight for term_id, weight in zip(self._entry_terms[start:end], self._entry_weights[start:end]))
+        return scores
+
+    def search(self, question, top_k=3, min_similarity=0.0):
+        import numpy as np
+
+        # 코사인 유사도 상위 top_k개 (유사도, 질문, SQL)
+        grams = _ngrams(question, self.ngram_range)
+        with self._lock:
+            rule_count = len(self.rules)
+            if not rule_count or not grams:
+                return []
+
+            # 단어별 질의 가중치 x idf (문서 쪽 idf까지 곱한 값)
+            query_terms = {}
+            query_norm = 0.0
+            for gram, count in grams.items():
+                term_id = self.vocab.get(gram)
+                idf = math.log((1 + rule_count) / (1 + (self._df[term_id] if term_id is not None else 0))) + 1
+                weight = (1 + math.log(count)) * idf
+                query_norm += weight ** 2
+                if term_id is not None:
+                    query_terms[term_id] = weight * idf
+            if not query_terms:
+                return []
+            query_norm = math.sqrt(query_norm)
+
+            # 희귀한 단어부터 max_postings까지만 합산해 후보를 고르고 (흔한 단어는 후보 선정에서 생략)
+            rule_parts = []
+            weight_parts = []
+            budget = self.max_postings
+            ordered = sorted(query_terms, key=lambda term_id: self._df[term_id])
+            used = 0
+            for term_id in ordered:
+                if rule_parts and budget < self._df[term_id]:
+                    break
+                for posting_rules, posting_weights in self._postings(term_id):
+                    rule_parts.append(posting_rules)
+                    weight_parts.append(posting_weights * query_terms[term_id])
+                budget -= self._df[term_id]
+                used += 1
+
+            scores = np.bincount(np.concatenate(rule_parts), weights=np.concatenate(weight_parts), minlength=rule_count)
+            scores *= self._inv_norms[:rule_count]
+
+            candidate_count = min(rule_count, top_k if used == len(ordered) else max(top_k * 10, 50))
+            candidates = np.argpartition(scores, rule_count - candidate_count)[rule_count - candidate_count:]
+            candidates = candidates[scores[candidates] > 0]
+            if used < len(ordered):
+                # 후보는 질의 전체 단어로 다시 채점
+                scores[candidates] = self._exact_scores(candidates, query_terms) * self._inv_norms[candidates]
+            candidates = candidates[np.argsort(-scores[candidates])][:top_k]
+            return [
+                (float(scores[rule_no] / query_norm), *self.rules[rule_no])
+                for rule_no in candidates
+                if scores[rule_no] / query_norm >= min_similarity
+            ]
+
+
+# ds_id별 색인 (rule_history 로그를 따라 증분 갱신)
+_lock = threading.Lock()
+_indexes = {}
+
+
+def _new_index():
+    return RuleIndex(
+        (config.get_config('rule_index.ngram_min'), config.get_config('rule_index.ngram_max')),
+        config.get_config('rule_index.renormalize_growth'),
+        config.get_config('rule_index.max_delta_rules'),
+        config.get_config('rule_index.max_postings'),
+    )
+
+
+def get_index(ds_id, client=None):
+    with _lock:
+        index = _indexes.get(ds_id)
+        if index is None:
+            index = _indexes[ds_id] = _new_index()
+
+    with index.sync_lock:
+        # 마지막으로 반영한 위치 이후의 룰만 추가 (save_question으로 저장한 룰 포함)
+        log_id, entries, position = rule_history.changes(ds_id, index.log_id, index.position, client)
+        if log_id != index.log_id and index.log_id is not None:
+            # 이력 캐시가 초기화되면 로그 처음부터 색인을 다시 생성
+            rebuilt = _new_index()
+            rebuilt.add_many(entries)
+            rebuilt.log_id, rebuilt.position = log_id, position
+            with _lock:
+                _indexes[ds_id] = rebuilt
+            return rebuilt
+
+        if entries:
+            index.add_many(entries)
+        index.log_id, index.position = log_id, position
+    return index
+
+
+def search(ds_id, question, top_k=None, min_similarity=None, client=None):
+    if top_k is None:
+        top_k = config.get_config('rule_index.top_k')
+    if min_similarity is None:
+        min_similarity = config.get_config('rule_index.min_similarity')
+    return get_index(ds_id, client).search(question, top_k, min_similarity)
+
+
+def _normalize_question(question):
+    # 따옴표 밖의 공백/대소문자와 끝의 문장 부호만 무시 (연산자, 부호, 따옴표 안의 값은 그대로 비교)
+    return generation_cache.normalize_question(question or "").rstrip(TRAILING_PUNCTUATION)
+
+
+def reusable_sql(question, matches):
+    # 정규화한 질문이 같을 때만 저장된 SQL 재사용
+    # n-gram 유사도는 상위/하위, 최대/최소처럼 한 단어만 다른 질문도 높게 나오므로 재사용 기준으로 쓰지 않음
+    if not matches:
+        return None
+
+    similarity, user_question, result_sql = matches[0]
+    if not result_sql or _normalize_question(question) != _normalize_question(user_question):
+        return None
+    return result_sql
+
+
+def invalidate(ds_id=None):
+    with _lock:
+        if ds_id is None:
+            _indexes.clear()
+        else:
+            _indexes.pop(ds_id, None)
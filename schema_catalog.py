@@ -0,0 +1,200 @@
+import hashlib
+import threading
+import time
+import config
+import bq_client
+
+DATASET_ID = "metatron"
+
+CATALOG_QUERY = f"""
+    SELECT
+        C.TABLE_NAME,
+        C.COLUMN_NAME,
+        C.DATA_TYPE,
+        F.DESCRIPTION,
+        T.LAST_MODIFIED_TIME
+    FROM {DATASET_ID}.INFORMATION_SCHEMA.COLUMNS AS C
+      LEFT JOIN {DATASET_ID}.INFORMATION_SCHEMA.COLUMN_FIELD_PATHS AS F
+        ON C.TABLE_NAME = F.TABLE_NAME AND C.COLUMN_NAME = F.FIELD_PATH
+      LEFT JOIN {DATASET_ID}.__TABLES__ AS T
+        ON C.TABLE_NAME = T.TABLE_ID
+    ORDER BY C.TABLE_NAME, C.ORDINAL_POSITION
+    """
+
+DATASET_TABLES_QUERY = f"""
+    SELECT DISTINCT SRC.TABLE_NAME
+    FROM {DATASET_ID}.dataset AS SRC
+    WHERE SRC.TABLE_NAME IS NOT NULL
+      AND (
+        SRC.DS_ID = @ds_id
+        OR (
+          SRC.DS_TYPE = 'Imported'
+          AND SRC.DS_ID IN (
+            SELECT DSDF2.DS_ID
+            FROM {DATASET_ID}.dataset_dataflow AS DSDF1
+              JOIN {DATASET_ID}.dataset_dataflow AS DSDF2
+                ON DSDF1.DF_ID = DSDF2.DF_ID
+            WHERE DSDF1.DS_ID = @ds_id
+          )
+        )
+      )
+    ORDER BY SRC.TABLE_NAME
+    """
+
+
+def estimate_tokens(text):
+    # 한글이 섞인 텍스트 기준 대략적인 토큰 수 (UTF-8 4바이트당 1토큰)
+    return len(text.encode("utf-8")) // 4 + 1
+
+
+def _render_table(table_name, columns, with_description=True):
+    parts = []
+    for column in columns:
+        part = f"{column['name']} {column['type']}"
+        if with_description and column['description']:
+            part += f" -- {column['description']}"
+        parts.append(part)
+    return f"{DATASET_ID}.{table_name}(" + ", ".join(parts) + ")"
+
+
+class SchemaCatalog:
+    # metatron 데이터셋 전체 컬럼 정보를 한 번에 읽어 테이블 수정 시각 기준으로 캐시
+
+    def __init__(self, refresh_interval=60):
+        self.refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        self._tables = {}
+        # ds_id -> (테이블 목록, 조회 시각), 다른 프로세스의 데이터플로우 변경은 refresh_interval 후 반영
+        self._dataset_tables = {}
+        self._checked_at = {}
+
+    def load(self, client=None):
+        if client is None:
+            client = bq_client.get_client()
+
+        print(f"쿼리 실행 : {CATALOG_QUERY}")
+        tables = {}
+        for row in client.query(CATALOG_QUERY).result():
+            table = tables.setdefault(row["TABLE_NAME"], {"last_modified": row["LAST_MODIFIED_TIME"], "columns": []})
+            table["columns"].append({
+                "name": row["COLUMN_NAME"],
+                "type": row["DATA_TYPE"],
+                "description": row["DESCRIPTION"],
+            })
+
+        with self._lock:
+            self._tables = tables
+            self._checked_at = {table_name: time.monotonic() for table_name in tables}
+
+    def _is_stale(self, client, table_name):
+        now = time.monotonic()
+        with self._lock:
+            table = self._tables.get(table_name)
+            checked_at = self._checked_at.get(table_name, 0)
+        if table is None:
+            return True
+        if now - checked_at < self.refresh_interval:
+            return False
+
+        # 테이블 메타데이터 조회(쿼리 작업 아님)로 변경 여부만 확인
+        last_modified = client.get_table(f"{DATASET_ID}.{table_name}").modified
+        last_modified_ms = int(last_modified.timestamp() * 1000) if last_modified else None
+        with self._lock:
+            self._checked_at[table_name] = now
+        return last_modified_ms != table["last_modified"]
+
+    def get_dataset_tables(self, ds_id, client=None):
+        with self._lock:
+            cached = self._dataset_tables.get(ds_id)
+        if cached is not None and time.monotonic() - cached[1] < self.refresh_interval:
+            return cached[0]
+
+        from google.cloud import bigquery
+
+        if client is None:
+            client = bq_client.get_client()
+
+        job_config = bigquery.QueryJobConfig(
+            query_parameters=[
+                bigquery.ScalarQueryParameter("ds_id", "INT64", ds_id)
+            ]
+        )
+        table_names = [row["TABLE_NAME"] for row in client.query(DATASET_TABLES_QUERY, job_config=job_config).result()]
+
+        with self._lock:
+            self._dataset_tables[ds_id] = (table_names, time.monotonic())
+        return table_names
+
+    def table_names(self, client=None):
+        # 캐시된 전체 테이블명 (비어 있으면 한 번 조회)
+        with self._lock:
+            loaded = bool(self._tables)
+        if not loaded:
+            self.load(client)
+        with self._lock:
+            return list(self._tables)
+
+    def get_tables(self, table_names, client=None):
+        if client is None:
+            client = bq_client.get_client()
+
+        if any(self._is_stale(client, table_name) for table_name in table_names):
+            self.load(client)
+
+        with self._lock:
+            return {table_name: self._tables[table_name] for table_name in table_names if table_name in self._tables}
+
+    def render(self, ds_id, token_budget=None, client=None):
+        # ds_id에 연결된 테이블 스키마를 토큰 예산 안에서 압축된 형태로 생성
+        if token_budget is None:
+            token_budget = config.get_config('schema_catalog.token_budget')
+
+        tables = self.get_tables(self.get_dataset_tables(ds_id, client), client)
+        if not tables:
+            return None, None
+
+        lines = [_render_table(table_name, table["columns"]) for table_name, table in tables.items()]
+        if estimate_tokens("\n".join(lines)) > token_budget:
+            # 예산 초과 시 컬럼 설명을 빼고, 그래도 넘치면 뒤쪽 컬럼부터 생략
+            lines = []
+            for table_name, table in tables.items():
+                columns = table["columns"]
+                line = _render_table(table_name, columns, with_description=False)
+                remaining = token_budget - estimate_tokens("\n".join(lines))
+                while columns and estimate_tokens(line) > remaining:
+                    columns = columns[:-1]
+                    line = _render_table(table_name, columns, with_description=False)[:-1] + ", ...)"
+                if columns:
+                    lines.append(line)
+
+        versions = "|".join(f"{table_name}:{table['last_modified']}" for table_name, table in sorted(tables.items()))
+        schema_version = hashlib.sha256(versions.encode("utf-8")).hexdigest()[:16]
+        return "\n".join(lines), schema_version
+
+    def invalidate(self, ds_id=None):
+        with self._lock:
+            if ds_id is None:
+                self._dataset_tables.clear()
+            else:
+                self._dataset_tables.pop(ds_id, None)
+
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+
+def get_catalog():
+    global _catalog
+
+    with _catalog_lock:
+        if _catalog is None:
+            _catalog = SchemaCatalog(config.get_config('schema_catalog.refresh_interval'))
+        return _catalog
+
+
+def get_schema_context(ds_id):
+    try:
+        return get_catalog().render(ds_id)
+    except Exception as e:
+        print(f"Error: {e}")
+        return None, None
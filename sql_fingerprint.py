@@ -0,0 +1,145 @@
+import hashlib
+import re
+
+# sqlglot이 없거나 파싱할 수 없는 SQL에 사용하는 정규식 (기존 방식)
+CTAS_PATTERN = re.compile(r'^\s*CREATE\s+(OR\s+REPLACE\s+)?TABLE\s+(\S+)\s+AS\s+SELECT', re.IGNORECASE)
+TABLE_REF_PATTERN = re.compile(r"\b(?:FROM|JOIN)\s+`?(?:[\w-]+\.)?(\w+)\.(\w+)`?", re.IGNORECASE)
+# 문자열/식별자 리터럴 (정규식 방식에서도 리터럴 안의 공백은 그대로 유지)
+QUOTED_PATTERN = re.compile(
+    r"('''.*?'''"
+    r'|""".*?"""'
+    r"|'(?:[^'\\]|\\.)*'"
+    r'|"(?:[^"\\]|\\.)*"'
+    r"|`[^`]*`)",
+    re.DOTALL,
+)
+WHITESPACE_PATTERN = re.compile(r"\s+")
+
+_available = None
+
+
+def is_available():
+    # sqlglot은 선택 설치 (import 실패는 매번 시도하지 않도록 결과 보관)
+    global _available
+
+    if _available is None:
+        try:
+            import sqlglot  # noqa: F401
+            _available = True
+        except ImportError:
+            _available = False
+    return _available
+
+
+def _parse(sql_query):
+    # BigQuery SQL 1개 문장을 AST로 파싱 (실패 시 None)
+    if not is_available():
+        return None
+
+    import sqlglot
+    from sqlglot.errors import ErrorLevel
+
+    try:
+        expressions = sqlglot.parse(sql_query, read="bigquery", error_level=ErrorLevel.RAISE)
+    except Exception:
+        return None
+    expressions = [expression for expression in expressions if expression is not None]
+    return expressions[0] if len(expressions) == 1 else None
+
+
+def _table_id(table):
+    return f"{table.db}.{table.name}" if table.db else table.name
+
+
+def _is_query(expression):
+    from sqlglot import exp
+
+    return isinstance(expression, exp.Query)
+
+
+def is_query(sql_query):
+    expression = _parse(sql_query)
+    return expression is not None and _is_query(expression)
+
+
+def ctas_target(sql_query):
+    # CREATE [OR REPLACE] TABLE ... AS SELECT 대상 테이블 (dataset.table)
+    expression = _parse(sql_query or "")
+    if expression is None:
+        ctas_match = CTAS_PATTERN.match(sql_query or "")
+        return ".".join(ctas_match.group(2).strip("`").split(".")[-2:]) if ctas_match else None
+
+    from sqlglot import exp
+
+    if isinstance(expression, exp.Create) and str(expression.args.get("kind", "")).upper() == "TABLE" and _is_query(expression.expression):
+        return _table_id(expression.this.find(exp.Table))
+    return None
+
+
+def referenced_tables(sql_query):
+    # SQL이 읽는 테이블 목록 (dataset.table, 소문자) - CTE 이름과 CTAS 대상은 제외
+    expression = _parse(sql_query or "")
+    if expression is None:
+        tables = []
+        for match in TABLE_REF_PATTERN.finditer(sql_query or ""):
+            table_id = f"{match.group(1)}.{match.group(2)}".lower()
+            if table_id not in tables:
+                tables.append(table_id)
+        return tables
+
+    from sqlglot import exp
+
+    target = None
+    if isinstance(expression, exp.Create):
+        target = expression.this.find(exp.Table)
+    cte_names = {cte.alias_or_name.lower() for cte in expression.find_all(exp.CTE)}
+
+    tables = []
+    for table in expression.find_all(exp.Table):
+        if table is target or (not table.db and table.name.lower() in cte_names):
+            continue
+        table_id = _table_id(table).lower()
+        if table_id not in tables:
+            tables.append(table_id)
+    return tables
+
+
+def _canonical_expression(expression):
+    from sqlglot import exp
+    from sqlglot.optimizer.normalize_identifiers import normalize_identifiers
+
+    expression = normalize_identifiers(expression.copy(), dialect="bigquery")
+
+    # 프로젝트명과 백틱 유무는 구분하지 않음
+    for table in expression.find_all(exp.Table):
+        table.set("catalog", None)
+        table.meta.pop("quoted_table", None)
+        for part in ("db", "this"):
+            identifier = table.args.get(part)
+            if isinstance(identifier, exp.Identifier):
+                identifier.set("quoted", False)
+
+    # AND/OR 조건은 순서와 상관없이 같은 조건으로 취급 (안쪽 조건부터 정렬)
+    for connector in reversed(list(expression.find_all(exp.Connector, bfs=False))):
+        if type(connector.parent) is type(connector):
+            continue
+        operands = sorted(connector.flatten(), key=lambda operand: operand.sql(dialect="bigquery"))
+        combine = exp.and_ if isinstance(connector, exp.And) else exp.or_
+        connector.replace(combine(*operands, copy=False))
+
+    return expression
+
+
+def canonicalize(sql_query):
+    # 공백, 주석, 키워드/함수/별칭 대소문자, AND/OR 조건 순서 차이를 없앤 SQL
+    expression = _parse(sql_query or "")
+    if expression is None:
+        parts = QUOTED_PATTERN.split(sql_query or "")
+        collapsed = "".join(part if i % 2 else WHITESPACE_PATTERN.sub(" ", part) for i, part in enumerate(parts))
+        return collapsed.strip().rstrip(";").strip()
+    return _canonical_expression(expression).sql(dialect="bigquery", comments=False, normalize_functions="upper")
+
+
+def fingerprint(sql_query):
+    # 같은 논리 쿼리면 같은 값이 나오는 SQL 지문
+    return hashlib.sha256(canonicalize(sql_query).encode("utf-8")).hexdigest()[:16]
@@ -0,0 +1,163 @@
+import config
+import schema_catalog
+import sql_fingerprint
+
+DATASET_ID = "metatron"
+
+# 스키마에 없지만 BigQuery가 제공하는 의사 컬럼 (수집 시간 파티션, 외부 테이블)
+PSEUDO_COLUMNS = {
+    "_PARTITIONTIME": "TIMESTAMP",
+    "_PARTITIONDATE": "DATE",
+    "_FILE_NAME": "STRING",
+}
+# 와일드카드 테이블(events_*)에서 사용할 수 있는 의사 컬럼
+WILDCARD_PSEUDO_COLUMNS = {
+    "_TABLE_SUFFIX": "STRING",
+}
+
+
+def is_available():
+    # sqlglot은 선택 설치 (없으면 검증 없이 BigQuery dry run에 맡김)
+    return sql_fingerprint.is_available()
+
+
+def _parse_errors(error):
+    messages = []
+    for detail in getattr(error, "errors", None) or []:
+        message = f"SQL 구문 오류 (line {detail.get('line')}, col {detail.get('col')}) : {detail.get('description')}"
+        if detail.get("highlight"):
+            message += f" - '{detail['highlight']}' 부근"
+        messages.append(message)
+    return messages or [f"SQL 구문 오류 : {error}"]
+
+
+def _column_schema(tables):
+    from sqlglot import exp
+
+    mapping = {}
+    for table_name, table in tables.items():
+        columns = {}
+        for column in table["columns"]:
+            try:
+                exp.DataType.build(column["type"], dialect="bigquery")
+                columns[column["name"]] = column["type"]
+            except Exception:
+                # sqlglot이 모르는 타입(RANGE 등)은 컬럼명만 확인
+                columns[column["name"]] = "UNKNOWN"
+        pseudo_columns = dict(PSEUDO_COLUMNS, **WILDCARD_PSEUDO_COLUMNS) if table_name.endswith("*") else PSEUDO_COLUMNS
+        for name, column_type in pseudo_columns.items():
+            columns.setdefault(name, column_type)
+        mapping[table_name] = columns
+    return {DATASET_ID: mapping}
+
+
+def _resolve_wildcard(table_name, catalog, client):
+    # events_* 는 접두어가 같은 테이블 컬럼을 합쳐 하나의 테이블로 확인
+    prefix = table_name[:-1]
+    columns = {}
+    for table in catalog.get_tables([name for name in catalog.table_names(client) if name.startswith(prefix)], client).values():
+        for column in table["columns"]:
+            columns.setdefault(column["name"], column)
+    return {"columns": list(columns.values())} if columns else None
+
+
+def _check_tables(expression, ds_id, catalog, client):
+    # 참조 테이블이 metatron 데이터셋에 있는지 확인, 다른 데이터셋을 읽으면 컬럼 검증은 생략
+    from sqlglot import exp
+
+    target = expression.this.find(exp.Table) if isinstance(expression, exp.Create) else None
+    cte_names = {cte.alias_or_name.lower() for cte in expression.find_all(exp.CTE)}
+
+    errors = []
+    table_names = []
+    external = False
+    for table in expression.find_all(exp.Table):
+        if table is target or not table.name or (not table.db and table.name.lower() in cte_names):
+            continue
+        if not table.db:
+            # UNNEST 별칭 등 FROM 절 밖의 이름은 BigQuery에 맡김
+            if isinstance(table.parent, (exp.From, exp.Join)):
+                errors.append(f"테이블 {table.name} 에 데이터셋을 지정해야 합니다. ({DATASET_ID}.{table.name})")
+            continue
+        if table.db.lower() != DATASET_ID:
+            external = True
+            continue
+        if table.name not in table_names:
+            table_names.append(table.name)
+
+    wildcards = [table_name for table_name in table_names if table_name.endswith("*")]
+    tables = catalog.get_tables([table_name for table_name in table_names if table_name not in wildcards], client) if table_names else {}
+    for table_name in wildcards:
+        table = _resolve_wildcard(table_name, catalog, client)
+        if table is not None:
+            tables[table_name] = table
+    missing = [table_name for table_name in table_names if table_name not in tables]
+    if missing:
+        available = catalog.get_dataset_tables(ds_id, client) if ds_id is not None else []
+        hint = f" 사용 가능한 테이블 : {', '.join(f'{DATASET_ID}.{name}' for name in available)}" if available else ""
+        errors.extend(f"테이블 {DATASET_ID}.{table_name} 이(가) 없습니다.{hint}" for table_name in missing)
+    return errors, tables, external
+
+
+def _check_columns(query, tables):
+    from sqlglot.errors import OptimizeError
+    from sqlglot.optimizer.qualify import qualify
+    from sqlglot.schema import MappingSchema
+
+    try:
+        qualify(
+            query.copy(),
+            schema=MappingSchema(_column_schema(tables), dialect="bigquery"),
+            dialect="bigquery",
+            validate_qualify_columns=True,
+            quote_identifiers=False,
+        )
+    except OptimizeError as e:
+        columns = "; ".join(
+            f"{DATASET_ID}.{table_name}({', '.join(column['name'] for column in table['columns'])})"
+            for table_name, table in tables.items()
+        )
+        return [f"컬럼 오류 : {e}. 사용 가능한 컬럼 : {columns}"]
+    except Exception as e:
+        # sqlglot이 처리하지 못하는 구문은 검증하지 않음 (BigQuery에서 확인)
+        print(f"컬럼 검증 생략 : {e}")
+    return []
+
+
+def validate(sql_query, ds_id=None, client=None):
+    # BigQuery에 보내기 전에 구문, 테이블, 컬럼 참조를 로컬 스키마 캐시로 확인하고 오류 목록을 반환
+    if not config.get_config('validation.enabled') or not is_available():
+        return []
+
+    import sqlglot
+    from sqlglot import exp
+    from sqlglot.errors import ErrorLevel, ParseError, TokenError
+
+    try:
+        expressions = [expression for expression in sqlglot.parse(sql_query, read="bigquery", error_level=ErrorLevel.RAISE) if expression is not None]
+    except ParseError as e:
+        return _parse_errors(e)
+    except TokenError as e:
+        return [f"SQL 구문 오류 : {e}"]
+    if not expressions:
+        return ["SQL 문이 없습니다."]
+
+    catalog = schema_catalog.get_catalog()
+    errors = []
+    for expression in expressions:
+        query = expression
+        if isinstance(expression, exp.Create) and isinstance(expression.expression, exp.Query):
+            query = expression.expression
+        if not isinstance(query, exp.Query):
+            continue
+
+        try:
+            table_errors, tables, external = _check_tables(expression, ds_id, catalog, client)
+        except Exception as e:
+            # 스키마를 조회하지 못하면 검증하지 않음
+            print(f"Error: {e}")
+            return []
+        errors.extend(table_errors)
+        if not table_errors and not external:
+            errors.extend(_check_columns(query, tables))
+    return errors
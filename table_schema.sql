@@ -29,5 +29,6 @@ CREATE TABLE rule (
   result_table_name STRING OPTIONS(description = "result_sql CTAS로 생성된 테이블명"),
   applied_yn STRING OPTIONS(description = "적용 여부"),
   created_at TIMESTAMP,
-  updated_at TIMESTAMP
+  updated_at TIMESTAMP,
+  fingerprint STRING OPTIONS(description = "정규화된 SQL 지문")
 );
\ No newline at end of file
@@ -0,0 +1,295 @@
+import contextlib
+import contextvars
+import json
+import math
+import os
+import threading
+import time
+import uuid
+from collections import deque
+import config
+
+BIGQUERY = "bigquery"
+CLAUDE = "claude"
+VALIDATION = "validation"
+
+# 현재 실행 중인 세션/데이터셋 (Streamlit 스크립트 스레드 단위)
+_labels = contextvars.ContextVar("telemetry_labels", default={})
+
+# Prometheus로 내보내는 누적 값 (종류별, ds_id별)
+COUNTER_FIELDS = {
+    BIGQUERY: ["bytes_processed", "bytes_billed", "slot_ms", "cache_hit", "error"],
+    CLAUDE: ["input_tokens", "output_tokens", "cache_creation_input_tokens", "cache_read_input_tokens", "error"],
+    VALIDATION: ["errors", "repair_attempts", "repaired", "unresolved", "round_trips_saved"],
+}
+
+
+def set_context(**labels):
+    _labels.set({**_labels.get(), **labels})
+
+
+@contextlib.contextmanager
+def context(**labels):
+    token = _labels.set({**_labels.get(), **labels})
+    try:
+        yield
+    finally:
+        _labels.reset(token)
+
+
+def bind_session(session_state, ds_id=None):
+    # 세션 상태에 세션 ID를 만들어 두고 이후 기록에 세션/데이터셋을 붙임
+    if 'telemetry_session_id' not in session_state:
+        session_state['telemetry_session_id'] = uuid.uuid4().hex[:12]
+    set_context(session_id=session_state['telemetry_session_id'], ds_id=ds_id)
+    return session_state['telemetry_session_id']
+
+
+def submit(executor, fn, *args, **kwargs):
+    # 스레드 풀 작업에도 현재 세션/데이터셋 정보를 전달
+    return executor.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+
+def _counter_value(event, field):
+    value = event.get(field)
+    if field in ("error", "cache_hit"):
+        return 1 if value else 0
+    return int(value or 0)
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(math.ceil(q * len(ordered)) - 1, 0)
+    return ordered[rank]
+
+
+class Telemetry:
+    # 최근 기록은 메모리에 보관해 p50/p95를 계산하고, 누적 값은 Prometheus 형식으로 내보냄
+
+    def __init__(self, max_events=10000, events_file=None, prometheus_file=None, prometheus_interval=15):
+        self.events_file = events_file
+        self.prometheus_file = prometheus_file
+        self.prometheus_interval = prometheus_interval
+        self._lock = threading.Lock()
+        self._events = deque(maxlen=max_events)
+        self._totals = {}
+        self._exported_at = 0.0
+
+    def record(self, kind, latency_ms, **fields):
+        # 명시하지 않은 세션/데이터셋은 현재 컨텍스트 값 사용
+        labels = {"session_id": None, "ds_id": None, **_labels.get()}
+        for key in ("session_id", "ds_id"):
+            value = fields.pop(key, None)
+            if value is not None:
+                labels[key] = value
+        event = {"kind": kind, "timestamp": time.time(), **labels, **fields, "latency_ms": round(latency_ms, 3)}
+
+        with self._lock:
+            self._events.append(event)
+            totals = self._totals.setdefault((kind, event["ds_id"]), {"count": 0, "latency_ms": 0.0})
+            totals["count"] += 1
+            totals["latency_ms"] += latency_ms
+            for field in COUNTER_FIELDS[kind]:
+                totals[field] = totals.get(field, 0) + _counter_value(event, field)
+
+        self._export(event)
+        return event
+
+    def _export(self, event):
+        if self.events_file:
+            line = json.dumps(event, ensure_ascii=False, default=str)
+            with self._lock:
+                with open(self.events_file, "a", encoding="utf-8") as events_file:
+                    events_file.write(line + "\n")
+
+        # Prometheus 파일은 일정 주기로만 다시 씀 (textfile collector용)
+        now = time.monotonic()
+        if self.prometheus_file and now - self._exported_at >= self.prometheus_interval:
+            self._exported_at = now
+            self.write_prometheus(self.prometheus_file)
+
+    def events(self, kind=None, session_id=None, ds_id=None):
+        with self._lock:
+            events = list(self._events)
+        return [
+            event for event in events
+            if (kind is None or event["kind"] == kind)
+            and (session_id is None or event["session_id"] == session_id)
+            and (ds_id is None or event["ds_id"] == ds_id)
+        ]
+
+    def summary(self, kind, group_by=None, session_id=None):
+        # group_by(session_id, ds_id 등)별 호출 수, p50/p95 지연 시간과 합계
+        groups = {}
+        for event in self.events(kind, session_id=session_id):
+            groups.setdefault(event.get(group_by) if group_by else "all", []).append(event)
+
+        rows = []
+        for group, events in groups.items():
+            latencies = [event["latency_ms"] for event in events]
+            row = {
+                group_by or "group": group,
+                "count": len(events),
+                "p50_ms": percentile(latencies, 0.5),
+                "p95_ms": percentile(latencies, 0.95),
+                "max_ms": max(latencies),
+            }
+            for field in COUNTER_FIELDS[kind]:
+                row[field] = sum(_counter_value(event, field) for event in events)
+            rows.append(row)
+        return sorted(rows, key=lambda row: row["count"], reverse=True)
+
+    def to_prometheus(self):
+        with self._lock:
+            totals = {key: dict(value) for key, value in self._totals.items()}
+            events = list(self._events)
+
+        lines = []
+        for kind in COUNTER_FIELDS:
+            prefix = f"text2sql_{kind}"
+            keys = sorted((key for key in totals if key[0] == kind), key=lambda key: str(key[1]))
+
+            lines.append(f"# TYPE {prefix}_calls_total counter")
+            for key in keys:
+                lines.append(f'{prefix}_calls_total{{ds_id="{key[1] or ""}"}} {totals[key]["count"]}')
+            for field in COUNTER_FIELDS[kind]:
+                lines.append(f"# TYPE {prefix}_{field}_total counter")
+                for key in keys:
+                    lines.append(f'{prefix}_{field}_total{{ds_id="{key[1] or ""}"}} {totals[key].get(field, 0)}')
+
+            # 지연 시간 분위수는 메모리에 남아 있는 최근 기록 기준
+            latencies = [event["latency_ms"] / 1000 for event in events if event["kind"] == kind]
+            lines.append(f"# TYPE {prefix}_latency_seconds summary")
+            for q in (0.5, 0.95):
+                value = percentile(latencies, q)
+                lines.append(f'{prefix}_latency_seconds{{quantile="{q}"}} {value if value is not None else "NaN"}')
+            lines.append(f"{prefix}_latency_seconds_sum {sum(totals[key]['latency_ms'] for key in keys) / 1000}")
+            lines.append(f"{prefix}_latency_seconds_count {sum(totals[key]['count'] for key in keys)}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as prometheus_file:
+            prometheus_file.write(self.to_prometheus())
+        os.replace(tmp_path, path)
+
+    def events_jsonl(self, kind=None, session_id=None):
+        return "".join(json.dumps(event, ensure_ascii=False, default=str) + "\n" for event in self.events(kind, session_id=session_id))
+
+
+_telemetry = None
+_telemetry_lock = threading.Lock()
+
+
+def get_telemetry():
+    global _telemetry
+
+    with _telemetry_lock:
+        if _telemetry is None:
+            _telemetry = Telemetry(
+                config.get_config('telemetry.max_events'),
+                config.get_config('telemetry.events_file'),
+                config.get_config('telemetry.prometheus_file'),
+                config.get_config('telemetry.prometheus_interval'),
+            )
+        return _telemetry
+
+
+def _record_job(job, started, job_type, error=None):
+    get_telemetry().record(
+        BIGQUERY,
+        (time.perf_counter() - started) * 1000,
+        job_type=job_type,
+        job_id=getattr(job, "job_id", None),
+        statement_type=getattr(job, "statement_type", None),
+        bytes_processed=getattr(job, "total_bytes_processed", None),
+        bytes_billed=getattr(job, "total_bytes_billed", None),
+        slot_ms=getattr(job, "slot_millis", None),
+        cache_hit=bool(getattr(job, "cache_hit", False)),
+        error=error,
+    )
+
+
+def _trace_result(job, started, job_type):
+    # 작업 완료(result 반환) 시점에 처리량/슬롯 사용량 기록
+    result = job.result
+    recorded = []
+
+    def traced_result(*args, **kwargs):
+        try:
+            rows = result(*args, **kwargs)
+        except Exception as e:
+            if not recorded:
+                recorded.append(True)
+                _record_job(job, started, job_type, error=str(e))
+            raise
+        if not recorded:
+            recorded.append(True)
+            _record_job(job, started, job_type)
+        return rows
+
+    job.result = traced_result
+    return job
+
+
+def instrument_bigquery(client):
+    # 클라이언트의 쿼리/로드 작업 생성 함수를 감싸 모든 작업을 기록
+    query = client.query
+
+    def traced_query(sql_query, job_config=None, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            job = query(sql_query, job_config, *args, **kwargs)
+        except Exception as e:
+            _record_job(None, started, "dry_run" if job_config is not None and job_config.dry_run else "query", error=str(e))
+            raise
+        if job_config is not None and job_config.dry_run:
+            _record_job(job, started, "dry_run")
+            return job
+        return _trace_result(job, started, "query")
+
+    def traced_load(load):
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            return _trace_result(load(*args, **kwargs), started, "load")
+        return wrapper
+
+    client.query = traced_query
+    client.load_table_from_json = traced_load(client.load_table_from_json)
+    client.load_table_from_dataframe = traced_load(client.load_table_from_dataframe)
+    return client
+
+
+def record_claude(message, latency_ms, first_token_ms=None, ds_id=None, error=None):
+    usage = getattr(message, "usage", None)
+    return get_telemetry().record(
+        CLAUDE,
+        latency_ms,
+        ds_id=ds_id,
+        message_id=getattr(message, "id", None),
+        model=getattr(message, "model", None),
+        stop_reason=getattr(message, "stop_reason", None),
+        input_tokens=getattr(usage, "input_tokens", None),
+        output_tokens=getattr(usage, "output_tokens", None),
+        cache_creation_input_tokens=getattr(usage, "cache_creation_input_tokens", None),
+        cache_read_input_tokens=getattr(usage, "cache_read_input_tokens", None),
+        first_token_ms=round(first_token_ms, 3) if first_token_ms is not None else None,
+        error=error,
+    )
+
+
+def record_validation(initial_errors, remaining_errors, attempts, round_trips_saved, latency_ms, ds_id=None):
+    # 검증/수정 결과 (round_trips_saved : 로컬에서 걸러내 BigQuery로 보내지 않은 잘못된 SQL 수)
+    return get_telemetry().record(
+        VALIDATION,
+        latency_ms,
+        ds_id=ds_id,
+        errors=len(initial_errors),
+        repair_attempts=attempts,
+        repaired=bool(initial_errors) and not remaining_errors,
+        unresolved=bool(remaining_errors),
+        round_trips_saved=round_trips_saved,
+        first_error=initial_errors[0] if initial_errors else None,
+    )
@@ -0,0 +1,58 @@
+import os
+import sys
+
+import pytest
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT_DIR, "benchmarks"))
+sys.path.insert(0, ROOT_DIR)
+# application.yml은 작업 디렉터리 기준으로 읽음
+os.chdir(ROOT_DIR)
+
+import config
+from fakes import FakeAnthropicClient, FakeBigQueryClient
+
+
+@pytest.fixture
+def settings(tmp_path, monkeypatch):
+    # 캐시/스풀 파일은 테스트별 임시 디렉터리에 생성
+    settings = config.load_config()
+    monkeypatch.setitem(settings["cache"], "dir", str(tmp_path / "cache"))
+    monkeypatch.setitem(settings["write_buffer"], "spool_dir", str(tmp_path / "spool"))
+    monkeypatch.setitem(settings["result_store"], "spill_dir", str(tmp_path))
+    monkeypatch.setitem(settings["local_preview"], "dir", str(tmp_path / "local_preview"))
+
+    # 프로세스 단위 캐시는 테스트마다 새로 생성
+    import generation_cache
+    import result_cache
+    monkeypatch.setattr(generation_cache, "_cache", None)
+    monkeypatch.setattr(result_cache, "_cache", None)
+    monkeypatch.setattr(result_cache, "_modified", {})
+    return settings
+
+
+@pytest.fixture
+def bq(settings, monkeypatch):
+    import bq_client
+
+    client = FakeBigQueryClient()
+    monkeypatch.setattr(bq_client, "get_client", lambda: client)
+    monkeypatch.setattr(bq_client, "get_bqstorage_client", lambda: None)
+    return client
+
+
+@pytest.fixture
+def claude(settings, monkeypatch):
+    import backend as be
+
+    # 요청 파라미터를 기록하고 고정된 SQL로 응답
+    requests = []
+
+    def responder(params):
+        requests.append(params)
+        return "SELECT event_name, COUNT(*) AS event_count FROM metatron.events GROUP BY event_name"
+
+    client = FakeAnthropicClient(responder, latency=0, token_latency=0)
+    client.requests = requests
+    monkeypatch.setattr(be, "_anthropic_client", client)
+    return client
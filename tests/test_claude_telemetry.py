@@ -0,0 +1,49 @@
+import pytest
+
+import backend as be
+import telemetry
+
+CONTEXT = "metatron.events(user_id INTEGER, event_name STRING, event_value FLOAT)"
+
+
+@pytest.fixture
+def failing_claude(claude, monkeypatch):
+    # 두 번째 호출부터 API 오류 발생
+    responder = claude.messages.responder
+
+    def failing(params):
+        if claude.requests:
+            raise RuntimeError("overloaded_error")
+        return responder(params)
+
+    monkeypatch.setattr(claude.messages, "responder", failing)
+    monkeypatch.setattr(telemetry, "_telemetry", telemetry.Telemetry(max_events=100))
+    return claude
+
+
+def claude_summary(ds_id):
+    rows = telemetry.get_telemetry().summary(telemetry.CLAUDE, group_by="ds_id")
+    return next(row for row in rows if row["ds_id"] == ds_id)
+
+
+@pytest.mark.parametrize("generate", [
+    lambda question: be.get_sql_query_from_claude(question, CONTEXT, ds_id=7),
+    lambda question: "".join(be.stream_sql_query_from_claude(question, CONTEXT, ds_id=7)),
+    lambda question: be.repair_sql_query_with_claude(question, "SELECT 1", ["오류"], CONTEXT, ds_id=7),
+])
+def test_failed_call_is_recorded(failing_claude, generate):
+    generate("이벤트별 건수")
+    with pytest.raises(RuntimeError):
+        generate("사용자별 이벤트 값 합계")
+
+    summary = claude_summary(7)
+    assert summary["count"] == 2
+    assert summary["error"] == 1
+    assert summary["p95_ms"] is not None
+
+    failed = [event for event in telemetry.get_telemetry().events(telemetry.CLAUDE) if event.get("error")]
+    assert [event["error"] for event in failed] == ["overloaded_error"]
+
+    exported = telemetry.get_telemetry().to_prometheus()
+    assert 'text2sql_claude_calls_total{ds_id="7"} 2' in exported
+    assert 'text2sql_claude_error_total{ds_id="7"} 1' in exported
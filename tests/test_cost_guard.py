@@ -0,0 +1,67 @@
+import pandas as pd
+import pytest
+
+import cost_guard
+
+
+@pytest.fixture
+def events(bq):
+    # 3개 컬럼 x 1000행 -> 예상 처리량 24,000 바이트
+    bq.load_table_from_dataframe(pd.DataFrame({
+        "user_id": list(range(1000)),
+        "event_name": ["click"] * 1000,
+        "event_value": [1.0] * 1000,
+    }), "metatron.events")
+    return bq
+
+
+def test_estimate_query(events):
+    estimate = cost_guard.estimate_query("SELECT user_id FROM metatron.events", client=events)
+
+    assert estimate["error"] is None
+    assert estimate["bytes_processed"] == 1000 * 3 * 8
+    assert estimate["referenced_tables"] == ["metatron.events"]
+    assert estimate["statement_type"] == "SELECT"
+    # dry run만 실행하고 실제 쿼리는 실행하지 않음
+    assert events.calls == {"load_table_from_dataframe": 1, "dry_run": 1}
+
+
+def test_estimate_error_blocks(events):
+    estimate = cost_guard.estimate_query("SELECT missing_column FROM metatron.events", client=events)
+
+    assert estimate["error"]
+    assert estimate["bytes_processed"] is None
+    assert cost_guard.check_cost(estimate) == cost_guard.BLOCK
+
+
+@pytest.mark.parametrize("bytes_processed, decision", [
+    (0, cost_guard.ALLOW),
+    (100, cost_guard.ALLOW),
+    (101, cost_guard.CONFIRM),
+    (1000, cost_guard.CONFIRM),
+    (1001, cost_guard.BLOCK),
+])
+def test_check_cost_thresholds(settings, monkeypatch, bytes_processed, decision):
+    monkeypatch.setitem(settings["bigquery"]["cost"], "confirm_bytes", 100)
+    monkeypatch.setitem(settings["bigquery"]["cost"], "block_bytes", 1000)
+
+    assert cost_guard.check_cost({"error": None, "bytes_processed": bytes_processed}) == decision
+
+
+def test_estimate_against_thresholds(events, settings, monkeypatch):
+    sql_query = "SELECT user_id FROM metatron.events"
+    monkeypatch.setitem(settings["bigquery"]["cost"], "confirm_bytes", 10000)
+    monkeypatch.setitem(settings["bigquery"]["cost"], "block_bytes", 20000)
+    assert cost_guard.check_cost(cost_guard.estimate_query(sql_query, client=events)) == cost_guard.BLOCK
+
+    monkeypatch.setitem(settings["bigquery"]["cost"], "block_bytes", 30000)
+    assert cost_guard.check_cost(cost_guard.estimate_query(sql_query, client=events)) == cost_guard.CONFIRM
+
+
+def test_apply_limits(settings, monkeypatch):
+    from google.cloud import bigquery
+
+    monkeypatch.setitem(settings["bigquery"]["cost"], "maximum_bytes_billed", 12345)
+    job_config = cost_guard.apply_limits(bigquery.QueryJobConfig())
+
+    assert job_config.maximum_bytes_billed == 12345
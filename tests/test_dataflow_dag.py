@@ -0,0 +1,115 @@
+import threading
+
+import pytest
+
+import dataflow_dag
+from dataflow_dag import DataflowDag, DataflowNode
+
+
+def wrangled(ds_id, sql_query):
+    return DataflowNode(ds_id, f"wrangled_{ds_id}", "Wrangled", result_sql=sql_query)
+
+
+@pytest.fixture
+def dag():
+    # events -> 2 -> 3 -> 5, events -> 4 -> 5, 6은 연결 없음
+    return DataflowDag(1, [
+        DataflowNode(1, "events", "Imported", table_name="events"),
+        wrangled(2, "SELECT user_id, event_value FROM metatron.events WHERE event_value > 10"),
+        wrangled(3, "SELECT user_id, SUM(event_value) AS total FROM metatron.dataset_2 GROUP BY user_id"),
+        wrangled(4, "SELECT event_name, COUNT(*) AS event_count FROM `metatron.events` GROUP BY event_name"),
+        wrangled(5, "SELECT a.user_id FROM metatron.dataset_3 AS a CROSS JOIN metatron.dataset_4 AS b"),
+        wrangled(6, "SELECT 1 AS one"),
+    ])
+
+
+def test_edges_and_levels(dag):
+    assert dag.edges == [(1, 2), (1, 4), (2, 3), (3, 5), (4, 5)]
+    assert dag.levels() == [[1, 6], [2, 4], [3], [5]]
+    assert dag.levels([3, 4, 5]) == [[3, 4], [5]]
+
+
+def test_ctas_target_is_producer():
+    dag = DataflowDag(1, [
+        wrangled(2, "CREATE OR REPLACE TABLE metatron.daily AS SELECT user_id FROM metatron.events"),
+        wrangled(3, "WITH daily AS (SELECT 1 AS x) SELECT * FROM metatron.daily"),
+        wrangled(4, "WITH daily AS (SELECT 1 AS x) SELECT * FROM daily"),
+    ])
+
+    # CTE 이름은 테이블 참조로 보지 않음
+    assert dag.edges == [(2, 3)]
+
+
+def test_downstream(dag):
+    assert dag.downstream([2]) == {2, 3, 5}
+    assert dag.downstream([4, 6]) == {4, 5, 6}
+    assert dag.downstream([99]) == set()
+
+
+def test_execute_runs_levels_in_order(dag):
+    finished = []
+    lock = threading.Lock()
+
+    def run_node(node):
+        with lock:
+            finished.append(node.ds_id)
+
+    status = dag.execute(run_node=run_node, max_workers=4)
+
+    # Imported 노드는 실행하지 않고, 부모가 끝난 뒤에 자식 실행
+    assert status == {2: "success", 3: "success", 4: "success", 5: "success", 6: "success"}
+    assert finished.index(5) > max(finished.index(3), finished.index(4))
+    assert finished.index(3) > finished.index(2)
+
+
+def test_execute_changed_only_downstream(dag):
+    finished = []
+    status = dag.execute(changed=[3], run_node=lambda node: finished.append(node.ds_id), max_workers=1)
+
+    assert finished == [3, 5]
+    assert set(status) == {3, 5}
+
+
+def test_failed_parent_skips_children(dag):
+    def run_node(node):
+        if node.ds_id == 2:
+            raise RuntimeError("query failed")
+
+    status = dag.execute(run_node=run_node, max_workers=2)
+
+    assert status[2] == dataflow_dag.FAILED
+    assert status[3] == status[5] == dataflow_dag.SKIPPED
+    assert status[4] == status[6] == dataflow_dag.SUCCESS
+
+
+@pytest.fixture
+def cyclic():
+    # 2 <-> 3 순환, 4는 순환과 무관
+    return DataflowDag(1, [
+        DataflowNode(1, "events", "Imported", table_name="events"),
+        wrangled(2, "SELECT * FROM metatron.dataset_3"),
+        wrangled(3, "SELECT * FROM metatron.dataset_2"),
+        wrangled(4, "SELECT * FROM metatron.events"),
+    ])
+
+
+def test_cycle_raises(cyclic):
+    with pytest.raises(ValueError, match=r"cycle : \[2, 3\]"):
+        cyclic.levels()
+    with pytest.raises(ValueError):
+        cyclic.execute(run_node=lambda node: None, max_workers=1)
+
+
+def test_cycle_outside_targets_still_runs(cyclic):
+    finished = []
+    status = cyclic.execute(changed=[4], run_node=lambda node: finished.append(node.ds_id), max_workers=1)
+
+    assert finished == [4]
+    assert status == {4: dataflow_dag.SUCCESS}
+
+
+def test_flow_elements_with_cycle(cyclic):
+    nodes, edges = dataflow_dag.to_flow_elements(cyclic)
+
+    assert sorted(node.id for node in nodes) == ["1", "2", "3", "4"]
+    assert sorted((edge.source, edge.target) for edge in edges) == [("1", "4"), ("2", "3"), ("3", "2")]
@@ -0,0 +1,21 @@
+import pytest
+
+import generation_cache
+
+
+def test_same_key_for_whitespace_and_case():
+    assert generation_cache.make_key("이번 달  매출 TOP 10", 1) == generation_cache.make_key(" 이번 달 매출 top 10 ", 1)
+
+
+@pytest.mark.parametrize("question, other", [
+    ("name = 'Kim' 인 고객", "name = 'kim' 인 고객"),
+    ('이름이 "Kim"인 고객', '이름이 "kim"인 고객'),
+    ("이름이 “Kim”인 고객", "이름이 “kim”인 고객"),
+    ("주소가 'Seoul  Gangnam'인 고객", "주소가 'Seoul Gangnam'인 고객"),
+])
+def test_quoted_values_keep_case_and_spaces(question, other):
+    assert generation_cache.make_key(question, 1) != generation_cache.make_key(other, 1)
+
+
+def test_quoted_value_outside_normalized():
+    assert generation_cache.normalize_question("NAME  =  'Kim'") == "name = 'Kim'"
@@ -0,0 +1,59 @@
+import threading
+
+import pytest
+
+import id_generator
+
+
+def test_ids_unique_and_increasing_across_threads():
+    generator = id_generator.IdGenerator(7)
+    results = [[] for _ in range(8)]
+
+    def worker(ids):
+        for _ in range(5000):
+            ids.append(generator.next_id())
+
+    threads = [threading.Thread(target=worker, args=(ids,)) for ids in results]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    all_ids = [new_id for ids in results for new_id in ids]
+    assert len(set(all_ids)) == len(all_ids) == 8 * 5000
+    # 스레드별 발급 순서대로 증가
+    for ids in results:
+        assert ids == sorted(ids)
+
+
+def test_sequence_overflow_waits_for_next_ms(monkeypatch):
+    # 같은 ms에 시퀀스(4096개)를 모두 쓰면 다음 ms의 ID를 발급
+    clock = iter([1704067200000 + 5] * (id_generator.MAX_SEQUENCE + 2) + [1704067200000 + 6] * 10)
+    monkeypatch.setattr(id_generator, "_now_ms", lambda: next(clock))
+    generator = id_generator.IdGenerator(1)
+
+    ids = [generator.next_id() for _ in range(id_generator.MAX_SEQUENCE + 2)]
+
+    assert ids == sorted(ids) and len(set(ids)) == len(ids)
+    assert ids[-1] >> (id_generator.WORKER_ID_BITS + id_generator.SEQUENCE_BITS) == 6
+
+
+def test_clock_moving_backwards(monkeypatch):
+    clock = iter([1704067200010, 1704067200005, 1704067200010, 1704067200011])
+    monkeypatch.setattr(id_generator, "_now_ms", lambda: next(clock))
+    monkeypatch.setattr(id_generator.time, "sleep", lambda seconds: None)
+    generator = id_generator.IdGenerator(1)
+
+    first = generator.next_id()
+    second = generator.next_id()
+
+    assert second > first
+
+
+def test_worker_id_layout():
+    generator = id_generator.IdGenerator(id_generator.MAX_WORKER_ID)
+    worker_id = (generator.next_id() >> id_generator.SEQUENCE_BITS) & id_generator.MAX_WORKER_ID
+
+    assert worker_id == id_generator.MAX_WORKER_ID
+    with pytest.raises(ValueError):
+        id_generator.IdGenerator(id_generator.MAX_WORKER_ID + 1)
@@ -0,0 +1,42 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import list_loader
+
+NOW = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def dataset(ds_id, seconds):
+    updated_at = None if seconds is None else NOW + timedelta(seconds=seconds)
+    return {"DS_ID": ds_id, "DS_NAME": f"dataset_{ds_id}", "DS_TYPE": "Imported", "TABLE_NAME": f"table_{ds_id}", "CREATED_AT": NOW, "UPDATED_AT": updated_at}
+
+
+@pytest.fixture
+def datasets(bq):
+    # 7, 8, 9는 UPDATED_AT이 비어 있는 행
+    bq.load_table_from_json([dataset(1, 10), dataset(2, 20), dataset(3, 20), dataset(4, 30), dataset(7, None), dataset(8, None), dataset(9, None)], "metatron.dataset")
+    return bq
+
+
+def all_pages(page_size, **kwargs):
+    pages = []
+    cursor = None
+    while True:
+        table, cursor = list_loader.load_dataset_page(cursor, page_size=page_size, **kwargs)
+        pages.append(table.column("DS_ID").to_pylist())
+        if cursor is None:
+            return pages
+
+
+def test_pages_in_order(datasets):
+    assert all_pages(2) == [[4, 3], [2, 1], [9, 8], [7]]
+
+
+def test_page_ends_on_empty_updated_at(datasets):
+    # 마지막 행의 UPDATED_AT이 비어 있어도 첫 페이지로 돌아가지 않음
+    assert all_pages(5) == [[4, 3, 2, 1, 9], [8, 7]]
+
+
+def test_search_with_cursor(datasets):
+    assert all_pages(1, search="dataset_8") == [[8]]
@@ -0,0 +1,67 @@
+import pandas as pd
+import pytest
+
+pytest.importorskip("duckdb")
+pytest.importorskip("sqlglot")
+
+import local_preview
+
+
+@pytest.fixture
+def events(bq, settings, monkeypatch):
+    monkeypatch.setattr(local_preview, "_store", None)
+    monkeypatch.setitem(settings["local_preview"], "sample_rows", 100)
+    monkeypatch.setitem(settings["local_preview"], "max_age", 3600)
+    bq.load_table_from_dataframe(pd.DataFrame({
+        "user_id": list(range(50)),
+        "event_name": ["click", "view"] * 25,
+    }), "metatron.events")
+    bq.load_table_from_dataframe(pd.DataFrame({"user_id": list(range(1000))}), "metatron.app_log")
+    bq.calls.clear()
+    return bq
+
+
+def test_preview(events):
+    result = local_preview.preview_query("SELECT event_name, COUNT(*) AS n FROM metatron.events GROUP BY event_name ORDER BY event_name", client=events)
+
+    assert result["error"] is None
+    assert result["table"].to_pylist() == [{"event_name": "click", "n": 25}, {"event_name": "view", "n": 25}]
+    assert result["sample_rows"] == {"events": 50}
+
+
+def test_sample_reused_until_max_age(events):
+    local_preview.preview_query("SELECT user_id FROM metatron.events", client=events)
+    assert events.calls == {"get_table": 1, "list_rows": 1}
+
+    # 원본이 바뀌어도 max_age 전에는 메타데이터 조회 없이 기존 샘플 사용
+    events.insert_rows_json("metatron.events", [{"user_id": 50, "event_name": "click"}])
+    events.calls.clear()
+    result = local_preview.preview_query("SELECT user_id FROM metatron.events", client=events)
+    assert result["table"].num_rows == 50
+    assert events.calls == {}
+
+    # max_age가 지나면 다시 샘플링
+    local_preview.get_store().max_age = 0
+    result = local_preview.preview_query("SELECT user_id FROM metatron.events", client=events)
+    assert result["table"].num_rows == 51
+
+
+def test_large_table_uses_tablesample(events):
+    result = local_preview.preview_query("SELECT user_id FROM metatron.app_log", client=events)
+
+    assert result["error"] is None
+    assert result["sample_rows"] == {"app_log": 100}
+    assert events.calls.get("query") == 1
+    assert events.calls.get("list_rows") is None
+
+
+@pytest.mark.parametrize("sql_query, error", [
+    ("CREATE TABLE metatron.copy AS SELECT * FROM metatron.events", "SQL 변환 실패 : SELECT 문만"),
+    ("SELECT * FROM other_dataset.events", "SQL 변환 실패 : other_dataset.events"),
+    ("SELECT APPROX_TOP_COUNT(event_name, 1) AS top FROM metatron.events", "로컬 실행 실패"),
+])
+def test_fallback_errors(events, sql_query, error):
+    result = local_preview.preview_query(sql_query, client=events)
+
+    assert result["table"] is None
+    assert result["error"].startswith(error)
@@ -0,0 +1,78 @@
+import pandas as pd
+import pytest
+
+import materializer
+
+SQL = "SELECT event_name, COUNT(*) AS event_count FROM metatron.events GROUP BY event_name"
+
+
+@pytest.fixture
+def events(bq, monkeypatch):
+    # 3개 컬럼 x 1000행 -> 예상 처리량 24,000 바이트
+    bq.load_table_from_dataframe(pd.DataFrame({
+        "user_id": list(range(1000)),
+        "event_name": ["click", "view"] * 500,
+        "event_value": [1.0] * 1000,
+    }), "metatron.events")
+
+    query = bq.query
+    bq.job_configs = []
+
+    def recording_query(sql_query, job_config=None, **kwargs):
+        bq.job_configs.append(job_config)
+        return query(sql_query, job_config=job_config, **kwargs)
+
+    monkeypatch.setattr(bq, "query", recording_query)
+    return bq
+
+
+def test_materialize_with_byte_cap(events, settings, monkeypatch):
+    monkeypatch.setitem(settings["bigquery"]["cost"], "maximum_bytes_billed", 50000)
+
+    target = materializer.materialize(2, SQL, client=events)
+
+    assert target == "metatron.dataset_2"
+    assert events.get_table(target).num_rows == 2
+    # dry run으로 확인한 뒤 과금 상한을 설정해 실행
+    dry_run, job = events.job_configs
+    assert dry_run.dry_run
+    assert job.maximum_bytes_billed == 50000
+
+
+def test_materialize_blocked(events, settings, monkeypatch):
+    monkeypatch.setitem(settings["bigquery"]["cost"], "block_bytes", 1000)
+
+    with pytest.raises(ValueError, match="허용 한도"):
+        materializer.materialize(2, SQL, client=events)
+
+    assert [job_config.dry_run for job_config in events.job_configs] == [True]
+    with pytest.raises(LookupError):
+        events.get_table("metatron.dataset_2")
+
+
+def test_materialize_confirm_tier_runs(events, settings, monkeypatch):
+    # 확인 기준은 사용자가 이미 실행을 확인한 룰이므로 차단하지 않음
+    monkeypatch.setitem(settings["bigquery"]["cost"], "confirm_bytes", 1000)
+
+    assert materializer.materialize(2, SQL, client=events) == "metatron.dataset_2"
+
+
+def test_materialize_invalid_sql(events):
+    with pytest.raises(ValueError):
+        materializer.materialize(2, "SELECT missing_column FROM metatron.events", client=events)
+
+
+def test_save_question_does_not_materialize(events, settings, monkeypatch):
+    import backend as be
+    import write_buffer
+
+    rows = []
+    monkeypatch.setattr(write_buffer, "enqueue", lambda table_id, row: rows.append(row))
+    be.save_question(2, "이벤트별 건수", SQL)
+    assert len(rows) == 1
+
+    # 관리 테이블은 미리보기에서 처음 필요할 때 생성
+    with pytest.raises(LookupError):
+        events.get_table("metatron.dataset_2")
+    assert materializer.preview(2, SQL, client=events).num_rows == 2
+    assert events.get_table("metatron.dataset_2").num_rows == 2
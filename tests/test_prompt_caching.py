@@ -0,0 +1,84 @@
+import pytest
+
+import backend as be
+import claude_usage
+
+CONTEXT = "metatron.events(user_id INTEGER, event_name STRING, event_value FLOAT)"
+
+
+def usage_delta(before, after):
+    keys = ["calls", "input_tokens", "cache_creation_input_tokens", "cache_read_input_tokens"]
+    return {key: after[key] - before[key] for key in keys}
+
+
+def test_cache_control_on_last_system_block(settings, monkeypatch):
+    monkeypatch.setitem(settings["anthropic"], "prompt_caching", True)
+    params = be.build_claude_params("이벤트별 건수", CONTEXT, examples=[(0.5, "이전 질문", "SELECT 1")])
+
+    # 시스템 프롬프트 + 스키마 블록 끝에만 캐시 지점 설정, 질문마다 바뀌는 사용자 메시지는 제외
+    assert [block.get("cache_control") for block in params["system"]] == [None, {"type": "ephemeral"}]
+    assert params["system"][1]["text"].endswith(CONTEXT)
+    assert all("cache_control" not in block for message in params["messages"] for block in message["content"])
+    assert "이전 질문" in params["messages"][0]["content"][0]["text"]
+    assert params["extra_headers"] == {"anthropic-beta": be.PROMPT_CACHING_BETA}
+
+
+def test_cache_control_without_schema(settings, monkeypatch):
+    monkeypatch.setitem(settings["anthropic"], "prompt_caching", True)
+    params = be.build_claude_params("SELECT 1")
+
+    assert len(params["system"]) == 1
+    assert params["system"][0]["cache_control"] == {"type": "ephemeral"}
+
+
+def test_prompt_caching_disabled(settings, monkeypatch):
+    monkeypatch.setitem(settings["anthropic"], "prompt_caching", False)
+    params = be.build_claude_params("이벤트별 건수", CONTEXT)
+
+    assert all("cache_control" not in block for block in params["system"])
+    assert "extra_headers" not in params
+
+
+@pytest.mark.parametrize("generate", [
+    be.get_sql_query_from_claude,
+    lambda question, context: "".join(be.stream_sql_query_from_claude(question, context)),
+])
+def test_cache_write_then_read(claude, settings, monkeypatch, generate):
+    monkeypatch.setitem(settings["anthropic"], "prompt_caching", True)
+    # 같은 시스템/스키마 블록이면 첫 호출은 캐시 쓰기, 이후 호출은 캐시 읽기
+    context = f"{CONTEXT} -- {generate}"
+
+    before = claude_usage.get_stats()
+    generate("이벤트별 건수", context)
+    first = claude_usage.get_stats()
+    generate("사용자별 이벤트 값 합계", context)
+    second = claude_usage.get_stats()
+
+    assert len(claude.requests) == 2
+    assert all(params["extra_headers"] == {"anthropic-beta": be.PROMPT_CACHING_BETA} for params in claude.requests)
+
+    written = usage_delta(before, first)
+    assert written["calls"] == 1
+    assert written["cache_creation_input_tokens"] > 0
+    assert written["cache_read_input_tokens"] == 0
+
+    read = usage_delta(first, second)
+    assert read["calls"] == 1
+    assert read["cache_creation_input_tokens"] == 0
+    assert read["cache_read_input_tokens"] == written["cache_creation_input_tokens"]
+    assert second["last_call"]["cache_read_input_tokens"] == read["cache_read_input_tokens"]
+    assert second["saved_input_tokens"] > first["saved_input_tokens"]
+
+
+def test_no_cache_tokens_when_disabled(claude, settings, monkeypatch):
+    monkeypatch.setitem(settings["anthropic"], "prompt_caching", False)
+
+    before = claude_usage.get_stats()
+    be.get_sql_query_from_claude("이벤트별 건수", CONTEXT)
+    be.get_sql_query_from_claude("사용자별 이벤트 값 합계", CONTEXT)
+    delta = usage_delta(before, claude_usage.get_stats())
+
+    assert all("extra_headers" not in params for params in claude.requests)
+    assert delta["calls"] == 2
+    assert delta["cache_creation_input_tokens"] == delta["cache_read_input_tokens"] == 0
+    assert delta["input_tokens"] > 0
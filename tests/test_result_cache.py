@@ -0,0 +1,74 @@
+from datetime import timedelta
+
+import pandas as pd
+import pytest
+
+import cost_guard
+import result_cache
+
+
+def _load(bq, count):
+    for i in range(count):
+        bq.load_table_from_dataframe(pd.DataFrame({"user_id": [i], "event_name": ["click"]}), f"metatron.events_{i}")
+    return " UNION ALL ".join(f"SELECT user_id FROM metatron.events_{i}" for i in range(count))
+
+
+def _lookup(bq, sql_query):
+    return result_cache.lookup_key(bq, sql_query, dry_run_job=cost_guard.dry_run(sql_query, None, bq))
+
+
+@pytest.fixture
+def counted(bq, settings, monkeypatch):
+    monkeypatch.setitem(settings["cache"]["result"], "metadata_ttl", 60)
+    monkeypatch.setitem(settings["cache"]["result"], "metadata_query_min_tables", 4)
+    return bq
+
+
+def test_few_tables_use_table_metadata(counted):
+    sql_query = _load(counted, 2)
+    counted.calls.clear()
+
+    key, tables = _lookup(counted, sql_query)
+
+    assert key and tables == ["metatron.events_0", "metatron.events_1"]
+    assert counted.calls.get("get_table") == 2
+    assert counted.calls.get("query") is None
+
+
+def test_many_tables_use_one_metadata_query(counted):
+    sql_query = _load(counted, 6)
+    counted.calls.clear()
+
+    key, tables = _lookup(counted, sql_query)
+
+    assert len(tables) == 6
+    assert counted.calls.get("get_table") is None
+    assert counted.calls.get("query") == 1
+    assert key == _lookup(counted, sql_query)[0]
+
+
+def test_modified_time_memo(counted):
+    sql_query = _load(counted, 2)
+    key, _ = _lookup(counted, sql_query)
+    counted.calls.clear()
+
+    # TTL 안에서는 메타데이터를 다시 조회하지 않음
+    assert _lookup(counted, sql_query)[0] == key
+    assert counted.calls.get("get_table") is None
+
+    # 앱에서 테이블을 바꾸면 invalidate_table로 바로 반영
+    counted._tables[("metatron", "events_0")]["modified"] += timedelta(seconds=1)
+    result_cache.get_cache().invalidate_table("metatron.events_0")
+    assert _lookup(counted, sql_query)[0] != key
+    assert counted.calls.get("get_table") == 1
+
+
+def test_metadata_query_failure_falls_back(counted, monkeypatch):
+    sql_query = _load(counted, 5)
+    monkeypatch.setattr(result_cache, "_query_modified", lambda *args: (_ for _ in ()).throw(PermissionError("Access Denied")))
+    counted.calls.clear()
+
+    key, tables = _lookup(counted, sql_query)
+
+    assert key and len(tables) == 5
+    assert counted.calls.get("get_table") == 5
@@ -0,0 +1,85 @@
+import gc
+
+import pyarrow as pa
+import pytest
+
+import result_store
+
+MB = 1024 * 1024
+
+
+@pytest.fixture
+def manager(tmp_path):
+    return result_store.ResultStoreManager(64 * MB, str(tmp_path))
+
+
+def make_table(num_rows, start=0):
+    # numpy 배열은 복사 없이 감싸지므로 pyarrow 메모리 풀에서 할당되도록 생성
+    return pa.table({"id": pa.array(range(start, start + num_rows), type=pa.int64())})
+
+
+def test_put_and_get(manager):
+    store = manager.create_store(64 * MB, 64 * MB, 10)
+    table = make_table(100)
+    store.put("a", table)
+
+    assert store.get("a") is table
+    assert store.preview("a").to_pydict() == {"id": list(range(10))}
+    assert store.get("missing") is None
+
+
+def test_session_budget_spills_oldest(manager):
+    store = manager.create_store(12 * MB, 64 * MB, 10)
+    store.put("a", make_table(1_000_000))
+    store.put("b", make_table(1_000_000, start=1))
+
+    # a는 디스크로 내리고 memory map으로 읽음
+    stats = store.stats()
+    assert stats["entries"] == 2
+    assert stats["disk_bytes"] == 8_000_000
+    assert stats["memory_bytes"] < 12 * MB
+    assert store.get("a")["id"][0].as_py() == 0
+    assert store.get("b")["id"][0].as_py() == 1
+
+
+def test_spill_releases_memory(manager):
+    store = manager.create_store(4 * MB, 64 * MB, 1000)
+    gc.collect()
+    allocated = pa.total_allocated_bytes()
+
+    table = make_table(2_000_000)
+    store.put("a", table)
+    del table
+    gc.collect()
+
+    # 미리보기(1000행)만 메모리에 남고 원본 버퍼는 해제됨
+    assert pa.total_allocated_bytes() - allocated < MB
+    assert store.memory_bytes() == store.preview("a").nbytes
+    assert store.preview("a").num_rows == 1000
+    assert store.get("a").num_rows == 2_000_000
+
+    store.remove("a")
+    assert store.memory_bytes() == 0
+    assert store.stats()["disk_bytes"] == 0
+
+
+def test_disk_budget_drops_oldest(manager):
+    store = manager.create_store(MB, 10 * MB, 10)
+    store.put("a", make_table(1_000_000))
+    store.put("b", make_table(1_000_000))
+
+    assert "a" not in store
+    assert store.get("b").num_rows == 1_000_000
+
+
+def test_global_budget_across_sessions(tmp_path):
+    manager = result_store.ResultStoreManager(12 * MB, str(tmp_path))
+    first = manager.create_store(64 * MB, 64 * MB, 10)
+    second = manager.create_store(64 * MB, 64 * MB, 10)
+    first.put("a", make_table(1_000_000))
+    second.put("b", make_table(1_000_000))
+
+    # 전체 예산 초과 시 다른 세션의 더 오래된 결과를 디스크로 내림
+    assert first.stats()["disk_bytes"] == 8_000_000
+    assert second.stats()["disk_bytes"] == 0
+    assert manager.memory_bytes() < 12 * MB
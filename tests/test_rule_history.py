@@ -0,0 +1,100 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import rule_history
+
+NOW = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def rule(rule_id, seconds, sql_query, ds_id=1):
+    updated_at = NOW + timedelta(seconds=seconds)
+    return {
+        "rule_id": rule_id, "ds_id": ds_id, "user_question": f"질문 {rule_id}", "result_sql": sql_query,
+        "result_table_name": "", "applied_yn": "Y", "created_at": updated_at, "updated_at": updated_at, "fingerprint": None,
+    }
+
+
+@pytest.fixture
+def rules(bq, settings, monkeypatch):
+    monkeypatch.setattr(rule_history, "_histories", {})
+    monkeypatch.setitem(settings, "rule_history", {"refresh_interval": 60, "safety_window": 3600})
+    bq.load_table_from_json([rule(1, 0, "SELECT 1"), rule(2, 10, "SELECT 2")], "metatron.rule")
+    return bq
+
+
+def questions(ds_id=1):
+    return [user_question for user_question, _ in rule_history.load(ds_id)]
+
+
+def test_load_and_cache(rules):
+    assert questions() == ["질문 1", "질문 2"]
+
+    # 조회 주기 안에서는 다시 조회하지 않음
+    rules.insert_rows_json("metatron.rule", [rule(3, 20, "SELECT 3")])
+    assert questions() == ["질문 1", "질문 2"]
+    assert rules.calls["query"] == 1
+
+
+def test_late_row_behind_high_water_mark(rules):
+    assert questions() == ["질문 1", "질문 2"]
+
+    # 쓰기 버퍼 재전송 등으로 이미 읽은 룰보다 이전 시각의 룰이 나중에 반영됨
+    rules.insert_rows_json("metatron.rule", [rule(4, 30, "SELECT 4"), rule(3, 5, "SELECT 3")])
+    rule_history.invalidate(1)
+
+    assert questions() == ["질문 1", "질문 3", "질문 2", "질문 4"]
+
+
+def test_refresh_interval_picks_up_other_writers(rules, settings, monkeypatch):
+    assert questions() == ["질문 1", "질문 2"]
+
+    # 다른 프로세스/batch_generate가 저장한 룰은 refresh_interval 이후 반영
+    monkeypatch.setitem(settings["rule_history"], "refresh_interval", 0)
+    rules.insert_rows_json("metatron.rule", [rule(3, 20, "SELECT 3")])
+
+    assert questions() == ["질문 1", "질문 2", "질문 3"]
+
+
+def test_append_then_refresh_dedupes(rules):
+    assert questions() == ["질문 1", "질문 2"]
+
+    # save_question에서 캐시에 바로 추가한 룰은 BigQuery에서 다시 읽어도 한 번만 포함
+    saved = rule(3, 20, "SELECT 3")
+    rule_history.append(1, 3, saved["user_question"], saved["result_sql"], updated_at=saved["updated_at"].replace(tzinfo=None))
+    rules.insert_rows_json("metatron.rule", [saved])
+
+    assert questions() == ["질문 1", "질문 2", "질문 3"]
+
+
+def test_append_out_of_order(rules):
+    assert questions() == ["질문 1", "질문 2"]
+
+    # 이전 시각으로 캐시에 추가된 룰도 시각 순서 위치에 들어감
+    late = rule(3, 5, "SELECT 3")
+    rule_history.append(1, 3, late["user_question"], late["result_sql"], updated_at=late["updated_at"])
+
+    assert rule_history.load(1)[1] == ("질문 3", "SELECT 3")
+
+
+def test_same_fingerprint_keeps_latest(rules):
+    rules.insert_rows_json("metatron.rule", [rule(3, 20, "SELECT  1")])
+    assert questions() == ["질문 2", "질문 3"]
+
+    # 같은 지문의 이전 룰이 늦게 반영되어도 최신 룰 유지
+    rules.insert_rows_json("metatron.rule", [rule(4, 15, "SELECT 1")])
+    rule_history.invalidate(1)
+    assert questions() == ["질문 2", "질문 3"]
+    assert rule_history.latest_fingerprint(1) == next(reversed(rule_history._histories[1].rules))
+
+
+def test_changes_log(rules):
+    log_id, entries, position = rule_history.changes(1)
+    assert [entry[1] for entry in entries] == ["질문 1", "질문 2"]
+
+    rules.insert_rows_json("metatron.rule", [rule(3, 5, "SELECT 3")])
+    rule_history.invalidate(1)
+    same_log_id, entries, position = rule_history.changes(1, log_id, position)
+
+    assert same_log_id == log_id
+    assert [entry[1] for entry in entries] == ["질문 3"]
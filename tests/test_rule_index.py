@@ -0,0 +1,61 @@
+import pytest
+
+import rule_index
+
+RULES = [
+    ("fp1", "매출 상위 10개 상품", "SELECT product_id FROM metatron.sales ORDER BY revenue DESC LIMIT 10"),
+    ("fp2", "이벤트 값이 최대인 사용자", "SELECT user_id FROM metatron.events ORDER BY event_value DESC LIMIT 1"),
+]
+
+
+@pytest.fixture
+def index():
+    index = rule_index.RuleIndex()
+    index.add_many(RULES)
+    return index
+
+
+@pytest.mark.parametrize("question", [
+    "매출 상위 10개 상품",
+    "매출 상위 10개 상품?",
+    "  매출  상위 10개 상품. ",
+])
+def test_reuse_same_question(index, question):
+    matches = index.search(question)
+
+    assert rule_index.reusable_sql(question, matches) == RULES[0][2]
+
+
+@pytest.mark.parametrize("question", [
+    "매출 하위 10개 상품",
+    "매출 상위 20개 상품",
+    "이벤트 값이 최소인 사용자",
+])
+def test_no_reuse_for_different_question(index, question):
+    matches = index.search(question)
+
+    # n-gram 유사도는 높아도 다른 질문
+    assert matches and matches[0][0] > 0.5
+    assert rule_index.reusable_sql(question, matches) is None
+
+
+@pytest.mark.parametrize("question, saved", [
+    ("전환율 105 이상인 캠페인", "전환율 10.5 이상인 캠페인"),
+    ("event_value > 10 인 이벤트", "event_value < 10 인 이벤트"),
+    ("event_name != 'click' 인 이벤트", "event_name = 'click' 인 이벤트"),
+    ("A-1 그룹 사용자", "A1 그룹 사용자"),
+    ("잔액이 -5 미만인 계좌", "잔액이 5 미만인 계좌"),
+    ("이름이 'Kim'인 고객", "이름이 'kim'인 고객"),
+    ("이름이 'Kim Lee'인 고객", "이름이 'Kim  Lee'인 고객"),
+])
+def test_no_reuse_for_near_miss(question, saved):
+    # 연산자, 부호, 따옴표 안의 값이 다르면 뜻이 다른 질문
+    matches = [(1.0, saved, "SELECT 1")]
+
+    assert rule_index.reusable_sql(question, matches) is None
+
+
+def test_reuse_ignores_case_outside_quotes():
+    matches = [(1.0, "Event_Name = 'Click' 인 이벤트?", "SELECT 1")]
+
+    assert rule_index.reusable_sql("event_name = 'Click' 인 이벤트", matches) == "SELECT 1"
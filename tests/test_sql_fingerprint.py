@@ -0,0 +1,50 @@
+import pytest
+
+import sql_fingerprint
+
+
+@pytest.fixture(params=["sqlglot", "fallback"])
+def mode(request, monkeypatch):
+    if request.param == "sqlglot":
+        pytest.importorskip("sqlglot")
+        monkeypatch.setattr(sql_fingerprint, "_available", True)
+    else:
+        # sqlglot이 없을 때의 정규식 방식
+        monkeypatch.setattr(sql_fingerprint, "_available", False)
+    return request.param
+
+
+def test_formatting_gives_same_fingerprint(mode):
+    assert sql_fingerprint.fingerprint("SELECT user_id\nFROM   metatron.events  WHERE event_value > 1;") == \
+        sql_fingerprint.fingerprint("SELECT user_id FROM metatron.events WHERE event_value > 1")
+
+
+@pytest.mark.parametrize("sql_query, other", [
+    ("SELECT * FROM metatron.events WHERE event_name = 'a  b'", "SELECT * FROM metatron.events WHERE event_name = 'a b'"),
+    ("SELECT * FROM metatron.events WHERE event_name = 'Kim'", "SELECT * FROM metatron.events WHERE event_name = 'kim'"),
+    ("SELECT * FROM metatron.events WHERE event_value > 10", "SELECT * FROM metatron.events WHERE event_value > 100"),
+    ("SELECT * FROM metatron.events WHERE event_name = '''a\n  b'''", "SELECT * FROM metatron.events WHERE event_name = '''a\n b'''"),
+])
+def test_literals_give_different_fingerprint(mode, sql_query, other):
+    assert sql_fingerprint.fingerprint(sql_query) != sql_fingerprint.fingerprint(other)
+
+
+def test_sqlglot_ignores_case_and_condition_order():
+    pytest.importorskip("sqlglot")
+
+    assert sql_fingerprint.fingerprint("select a from metatron.events where x = 1 and y = 2") == \
+        sql_fingerprint.fingerprint("SELECT a FROM `project.metatron.events` WHERE y = 2 AND x = 1")
+
+
+def test_fallback_for_unparsable_sql():
+    pytest.importorskip("sqlglot")
+
+    # 파싱할 수 없는 SQL도 리터럴은 그대로 두고 공백만 정리
+    assert sql_fingerprint.canonicalize("SELECT  FROM WHERE  'a  b'") == "SELECT FROM WHERE 'a  b'"
+
+
+def test_ctas_target_and_tables(mode):
+    sql_query = "CREATE OR REPLACE TABLE metatron.result AS SELECT * FROM metatron.events JOIN metatron.users USING (user_id)"
+
+    assert sql_fingerprint.ctas_target(sql_query) == "metatron.result"
+    assert sql_fingerprint.referenced_tables(sql_query) == ["metatron.events", "metatron.users"]
@@ -0,0 +1,49 @@
+import pandas as pd
+import pytest
+
+pytest.importorskip("sqlglot")
+
+import schema_catalog
+import sql_validator
+
+
+@pytest.fixture
+def tables(bq, settings, monkeypatch):
+    monkeypatch.setitem(settings["validation"], "enabled", True)
+    monkeypatch.setattr(schema_catalog, "_catalog", None)
+    for suffix in ("20240101", "20240102"):
+        bq.load_table_from_dataframe(pd.DataFrame({
+            "user_id": [1, 2],
+            "event_name": ["click", "view"],
+        }), f"metatron.events_{suffix}")
+    return bq
+
+
+@pytest.mark.parametrize("sql_query", [
+    "SELECT user_id FROM metatron.events_20240101 WHERE _PARTITIONTIME >= TIMESTAMP('2024-01-01')",
+    "SELECT user_id FROM metatron.events_20240101 WHERE _PARTITIONDATE = DATE '2024-01-01'",
+    "SELECT _FILE_NAME, user_id FROM metatron.events_20240101",
+    "SELECT event_name, COUNT(*) FROM metatron.events_* WHERE _TABLE_SUFFIX BETWEEN '20240101' AND '20240102' GROUP BY event_name",
+])
+def test_pseudo_columns(tables, sql_query):
+    assert sql_validator.validate(sql_query, client=tables) == []
+
+
+def test_unknown_column(tables):
+    errors = sql_validator.validate("SELECT user_name FROM metatron.events_20240101", client=tables)
+
+    assert len(errors) == 1
+    assert "user_name" in errors[0]
+
+
+def test_table_suffix_requires_wildcard(tables):
+    # _TABLE_SUFFIX는 와일드카드 테이블에서만 사용 가능
+    errors = sql_validator.validate("SELECT user_id FROM metatron.events_20240101 WHERE _TABLE_SUFFIX = '1'", client=tables)
+
+    assert len(errors) == 1
+
+
+def test_unknown_table(tables):
+    errors = sql_validator.validate("SELECT user_id FROM metatron.sessions_*", client=tables)
+
+    assert errors == ["테이블 metatron.sessions_* 이(가) 없습니다."]
@@ -0,0 +1,152 @@
+import glob
+import os
+import threading
+from datetime import datetime
+
+import pytest
+
+import write_buffer
+
+
+@pytest.fixture
+def items(bq):
+    bq.load_table_from_json([{"id": 0, "name": "seed"}], "metatron.items")
+    return bq
+
+
+def rows(client):
+    return [tuple(row.values()) for row in client.query("SELECT id, name FROM metatron.items WHERE id > 0 ORDER BY id").result()]
+
+
+def spool_files(buffer, pattern="*"):
+    return glob.glob(os.path.join(buffer.spool_dir, pattern))
+
+
+def test_enqueue_spools_until_flush(items, tmp_path):
+    buffer = write_buffer.WriteBuffer(str(tmp_path / "spool"), max_rows=100)
+    buffer.enqueue("items", {"id": 1, "name": "a"})
+    buffer.enqueue("items", {"id": 2, "name": "b", "created_at": datetime(2024, 1, 1)})
+
+    # flush 전에는 스풀 파일에만 기록
+    assert rows(items) == []
+    assert len(spool_files(buffer, "*.jsonl")) == 1
+    assert buffer.stats()["pending"] == 2
+
+    buffer.flush()
+
+    assert rows(items) == [(1, "a"), (2, "b")]
+    assert spool_files(buffer, "*.jsonl") == spool_files(buffer, "*.flushing") == []
+    assert buffer.stats()["flushed"] == 2 and buffer.stats()["pending"] == 0
+
+
+def test_max_rows_wakes_flush_thread(items, tmp_path):
+    buffer = write_buffer.WriteBuffer(str(tmp_path / "spool"), max_rows=2, flush_interval=60)
+    buffer.start()
+    try:
+        buffer.enqueue("items", {"id": 1, "name": "a"})
+        buffer.enqueue("items", {"id": 2, "name": "b"})
+        for _ in range(100):
+            if buffer.stats()["flushed"] == 2:
+                break
+            threading.Event().wait(0.05)
+    finally:
+        buffer.stop()
+
+    assert rows(items) == [(1, "a"), (2, "b")]
+
+
+def test_failed_flush_is_retried(items, tmp_path, monkeypatch):
+    insert_rows_json = items.insert_rows_json
+    calls = []
+
+    def flaky(table, json_rows, row_ids=None, **kwargs):
+        calls.append(list(row_ids))
+        if len(calls) == 1:
+            raise ConnectionError("connection reset")
+        return insert_rows_json(table, json_rows, row_ids=row_ids, **kwargs)
+
+    monkeypatch.setattr(items, "insert_rows_json", flaky)
+    buffer = write_buffer.WriteBuffer(str(tmp_path / "spool"))
+    buffer.enqueue("items", {"id": 1, "name": "a"})
+
+    buffer.flush()
+    assert rows(items) == []
+    assert len(spool_files(buffer, "*.flushing")) == 1
+    assert buffer.stats()["failed_flushes"] == 1
+
+    # 이후 추가된 행과 함께 다시 전송, 같은 insert ID로 재전송해 중복 제거
+    buffer.enqueue("items", {"id": 2, "name": "b"})
+    buffer.flush()
+
+    assert rows(items) == [(1, "a"), (2, "b")]
+    assert calls[0] in calls[1:]
+    assert spool_files(buffer, "*.flushing") == []
+
+
+def test_spool_survives_restart(items, tmp_path):
+    spool_dir = str(tmp_path / "spool")
+    write_buffer.WriteBuffer(spool_dir).enqueue("items", {"id": 1, "name": "a"})
+
+    # 새 프로세스의 버퍼가 남아 있는 스풀 파일을 전송
+    write_buffer.WriteBuffer(spool_dir).flush()
+
+    assert rows(items) == [(1, "a")]
+
+
+def test_failing_file_is_quarantined(items, tmp_path, monkeypatch):
+    insert_rows_json = items.insert_rows_json
+    monkeypatch.setattr(items, "insert_rows_json", lambda table, json_rows, **kwargs: [{"index": 0, "errors": [{"reason": "invalid"}]}])
+    buffer = write_buffer.WriteBuffer(str(tmp_path / "spool"), max_attempts=3)
+    buffer.enqueue("items", {"id": 1, "name": "a"})
+
+    for _ in range(3):
+        buffer.flush()
+
+    assert spool_files(buffer, "*.flushing") == []
+    assert len(spool_files(buffer, os.path.join(write_buffer.QUARANTINE_DIR, "*.flushing"))) == 1
+    assert buffer.stats()["failed_flushes"] == 3
+    assert buffer.stats()["quarantined"] == 1
+
+    # 격리된 파일은 더 이상 전송하지 않음
+    monkeypatch.setattr(items, "insert_rows_json", insert_rows_json)
+    buffer.enqueue("items", {"id": 2, "name": "b"})
+    buffer.flush()
+    assert rows(items) == [(2, "b")]
+
+
+def test_corrupt_spool_is_quarantined(items, tmp_path):
+    buffer = write_buffer.WriteBuffer(str(tmp_path / "spool"))
+    buffer.enqueue("items", {"id": 1, "name": "a"})
+    with open(spool_files(buffer, "*.jsonl")[0], "a", encoding="utf-8") as spool_file:
+        spool_file.write('{"id": 2, "na')
+
+    buffer.flush()
+
+    assert rows(items) == []
+    assert buffer.stats()["quarantined"] == 1
+
+
+def test_buffers_sharing_spool_dir(items, tmp_path):
+    spool_dir = str(tmp_path / "spool")
+    buffers = [write_buffer.WriteBuffer(spool_dir) for _ in range(2)]
+    errors = []
+
+    def worker(buffer, offset):
+        try:
+            for i in range(50):
+                buffer.enqueue("items", {"id": offset + i, "name": "x"})
+                if i % 10 == 0:
+                    buffer.flush()
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(buffer, 1 + 100 * n)) for n, buffer in enumerate(buffers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for buffer in buffers:
+        buffer.flush()
+
+    assert errors == []
+    assert sorted(row[0] for row in rows(items)) == list(range(1, 51)) + list(range(101, 151))
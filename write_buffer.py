@@ -0,0 +1,179 @@
+import atexit
+import glob
+import json
+import os
+import threading
+import uuid
+from datetime import date, datetime
+from filelock import FileLock
+import config
+import bq_client
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+
+SPOOL_SUFFIX = ".jsonl"
+FLUSHING_SUFFIX = ".flushing"
+QUARANTINE_DIR = "quarantine"
+
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class WriteBuffer:
+    # 메타데이터 행을 로컬 스풀 파일에 먼저 기록하고, 건수/주기 기준으로 스트리밍 insert
+
+    def __init__(self, spool_dir, max_rows=100, flush_interval=5, max_attempts=10, dataset_id="metatron"):
+        self.spool_dir = spool_dir
+        self.max_rows = max_rows
+        self.flush_interval = flush_interval
+        self.max_attempts = max_attempts
+        self.dataset_id = dataset_id
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        # 같은 spool_dir을 쓰는 다른 프로세스와의 파일 교체/전송 경합 방지
+        self._spool_file_lock = FileLock(os.path.join(spool_dir, ".spool.lock"))
+        self._flush_file_lock = FileLock(os.path.join(spool_dir, ".flush.lock"))
+        # 스풀 파일별 연속 전송 실패 횟수
+        self._failures = {}
+        self._flush_event = threading.Event()
+        self._stop_event = threading.Event()
+        self._pending = 0
+        self._thread = None
+        self._stats = {"enqueued": 0, "flushed": 0, "flushes": 0, "failed_flushes": 0, "quarantined": 0}
+
+        os.makedirs(os.path.join(spool_dir, QUARANTINE_DIR), exist_ok=True)
+
+    def enqueue(self, table_id, row):
+        record = dict(row)
+        record["_insert_id"] = uuid.uuid4().hex
+        line = json.dumps(record, ensure_ascii=False, default=_json_default)
+
+        # fsync 후 반환하므로 프로세스가 죽어도 다음 flush 때 재전송됨
+        with self._lock, self._spool_file_lock:
+            with open(os.path.join(self.spool_dir, table_id + SPOOL_SUFFIX), "a", encoding="utf-8") as spool_file:
+                spool_file.write(line + "\n")
+                spool_file.flush()
+                os.fsync(spool_file.fileno())
+            self._pending += 1
+            self._stats["enqueued"] += 1
+            if self._pending >= self.max_rows:
+                self._flush_event.set()
+
+    def flush(self):
+        with self._flush_lock, self._flush_file_lock:
+            # 현재 스풀 파일을 전송 대상으로 전환 (이후 enqueue는 새 파일에 기록)
+            with self._lock, self._spool_file_lock:
+                for spool_path in glob.glob(os.path.join(self.spool_dir, "*" + SPOOL_SUFFIX)):
+                    table_id = os.path.basename(spool_path)[:-len(SPOOL_SUFFIX)]
+                    os.replace(spool_path, os.path.join(self.spool_dir, f"{table_id}.{uuid.uuid4().hex}{FLUSHING_SUFFIX}"))
+                self._pending = 0
+
+            # 이전에 실패했거나 비정상 종료로 남은 파일까지 함께 전송
+            for flushing_path in sorted(glob.glob(os.path.join(self.spool_dir, "*" + FLUSHING_SUFFIX))):
+                table_id = os.path.basename(flushing_path).split(".")[0]
+                try:
+                    with open(flushing_path, "r", encoding="utf-8") as flushing_file:
+                        records = [json.loads(line) for line in flushing_file if line.strip()]
+                except FileNotFoundError:
+                    continue
+                except ValueError as e:
+                    # 깨진 행이 있는 파일은 다시 보내도 실패하므로 바로 격리
+                    print(f"Error: {e}")
+                    self._quarantine(flushing_path, "JSON 오류")
+                    continue
+
+                if records and not self._insert(table_id, records):
+                    self._stats["failed_flushes"] += 1
+                    failures = self._failures.get(flushing_path, 0) + 1
+                    self._failures[flushing_path] = failures
+                    if failures >= self.max_attempts:
+                        # 스키마/행 오류 등으로 계속 실패하는 파일은 격리하고 다음 flush부터 제외
+                        self._quarantine(flushing_path, f"{failures}회 실패")
+                    continue
+
+                self._failures.pop(flushing_path, None)
+                os.remove(flushing_path)
+                self._stats["flushed"] += len(records)
+
+            self._stats["flushes"] += 1
+
+    def _quarantine(self, flushing_path, reason):
+        self._failures.pop(flushing_path, None)
+        quarantine_path = os.path.join(self.spool_dir, QUARANTINE_DIR, os.path.basename(flushing_path))
+        os.replace(flushing_path, quarantine_path)
+        self._stats["quarantined"] += 1
+        print(f"스풀 파일 격리 ({reason}) : {quarantine_path}")
+
+    def _insert(self, table_id, records):
+        row_ids = [record.pop("_insert_id") for record in records]
+        try:
+            client = bq_client.get_client()
+            errors = client.insert_rows_json(f"{self.dataset_id}.{table_id}", records, row_ids=row_ids)
+        except Exception as e:
+            print(f"Error: {e}")
+            return False
+
+        if errors:
+            print(f"Error: {errors}")
+            return False
+        return True
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="write-buffer", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        self._flush_event.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.flush()
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            self._flush_event.wait(self.flush_interval)
+            self._flush_event.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Error: {e}")
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["pending"] = self._pending
+            return stats
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_buffer():
+    global _buffer
+
+    with _buffer_lock:
+        if _buffer is None:
+            _buffer = WriteBuffer(
+                os.path.join(current_dir, config.get_config('write_buffer.spool_dir')),
+                max_rows=config.get_config('write_buffer.max_rows'),
+                flush_interval=config.get_config('write_buffer.flush_interval'),
+                max_attempts=config.get_config('write_buffer.max_attempts'),
+            )
+            _buffer.start()
+            atexit.register(_buffer.stop)
+        return _buffer
+
+
+def enqueue(table_id, row):
+    get_buffer().enqueue(table_id, row)
+
+
+def flush():
+    get_buffer().flush()